@@ -0,0 +1,407 @@
+'''
+Benchmarks for the weight code in openrig.maya.weights, openrig.maya.weightObject and
+openrig.maya.data.weight_data. It runs outside of Maya against the in-memory stand-in the tests
+use, tests/maya_stand_in.py, on synthetic meshes and weights of the sizes you ask for.
+
+Each run is appended to a json history file along with the git commit, so you can see how the
+timings change between commits.
+
+..example ::
+     python benchmarks/weights_benchmark.py --points 10000 100000 --maps 1 50
+     python benchmarks/weights_benchmark.py --only getWeights setWeights --compare
+'''
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+import timeit
+from collections import OrderedDict
+import numpy
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIRECTORY = os.path.dirname(BENCHMARK_DIRECTORY)
+sys.path.insert(0, ROOT_DIRECTORY)
+sys.path.insert(0, os.path.join(ROOT_DIRECTORY, 'tests'))
+
+import maya_stand_in
+maya_stand_in.install()
+
+import openrig.maya.weights as rig_weights
+import openrig.maya.weightObject as weightObject
+import openrig.maya.skinCluster as rig_skincluster
+import openrig.maya.symmetry as rig_symmetry
+import openrig.maya.data.weight_data as weight_data
+from openrig.shared import topology
+
+HISTORY_FILE = os.path.join(BENCHMARK_DIRECTORY, 'history.json')
+DEFAULT_POINTS = [10000, 100000]
+DEFAULT_MAPS = [1, 50]
+# number of influences each point gets in the synthetic skinCluster
+INFLUENCES_PER_POINT = 4
+GEOMETRY = 'bench_geo'
+SKINCLUSTER = 'bench_skinCluster'
+CLUSTER = 'bench_cluster'
+BLENDSHAPE = 'bench_blendShape'
+
+
+def buildMesh(pointCount):
+    '''
+    Build a grid that is symmetrical across x with roughly pointCount points and a bit of
+    noise in z so it isn't flat.
+
+    :return: points, polygonCounts, polygonConnects
+    :rtype: tuple
+    '''
+    columns = max(int(numpy.sqrt(pointCount)), 2)
+    rows = max(pointCount // columns, 2)
+    x, y = numpy.meshgrid(numpy.linspace(-1.0, 1.0, columns), numpy.linspace(0.0, 2.0, rows))
+    z = numpy.cos(x * 3.0) * numpy.sin(y * 2.0) * .1
+    points = numpy.column_stack([x.ravel(), y.ravel(), z.ravel()])
+
+    corner = (numpy.arange(rows - 1)[:, None] * columns + numpy.arange(columns - 1)[None, :]).ravel()
+    connects = numpy.column_stack([corner, corner + 1, corner + columns + 1, corner + columns]).ravel()
+    counts = numpy.full(len(corner), 4)
+
+    return points, counts, connects
+
+
+def buildSkinWeights(points, influenceCount, seed=0):
+    '''
+    Give every point weights for its closest influences, which are scattered over the mesh.
+    '''
+    random = numpy.random.RandomState(seed)
+    influence_points = points[random.randint(0, len(points), influenceCount)]
+    weightArray = numpy.zeros((len(points), influenceCount))
+    keep = min(INFLUENCES_PER_POINT, influenceCount)
+    for start in range(0, len(points), 20000):
+        chunk = points[start:start + 20000]
+        distances = numpy.linalg.norm(chunk[:, None, :] - influence_points[None, :, :], axis=2)
+        closest = numpy.argpartition(distances, keep - 1, axis=1)[:, :keep]
+        rows = numpy.arange(len(chunk))[:, None]
+        weightArray[start + rows, closest] = 1.0 / (distances[rows, closest] + 1e-3)
+    weightArray /= weightArray.sum(axis=1)[:, None]
+
+    return weightArray
+
+
+def buildScene(pointCount, mapCount):
+    '''
+    Build a mesh with a skinCluster that has mapCount influences, a cluster and a blendShape
+    with mapCount painted targets.
+    '''
+    maya_stand_in.clear()
+    rig_symmetry.clearCache()
+    rig_skincluster.clearInfluenceIndexCache()
+    topology._ADJACENCY_CACHE.clear()
+
+    points, counts, connects = buildMesh(pointCount)
+    maya_stand_in.createMesh(GEOMETRY, points, counts, connects)
+    shape = '{}Shape'.format(GEOMETRY)
+
+    influences = ['bench_{}_jnt'.format(index) for index in range(mapCount)]
+    for inf in influences:
+        maya_stand_in.Joint(inf)
+    maya_stand_in.SkinCluster(SKINCLUSTER, shape, influences, buildSkinWeights(points, mapCount))
+
+    # right side only so the mirror has something to do
+    cluster_weights = numpy.clip(1.0 - numpy.linalg.norm(points - [.5, 1.0, 0.0], axis=1), 0.0, 1.0)
+    maya_stand_in.Cluster(CLUSTER, shape, cluster_weights)
+
+    blendshape = maya_stand_in.BlendShape(BLENDSHAPE, shape, ['target{}'.format(index) for index in range(mapCount)])
+    random = numpy.random.RandomState(1)
+    for index in blendshape.targets:
+        blendshape.targetWeights[index] = numpy.clip(points[:, 1] - random.rand(), 0.0, 1.0)
+
+    return {'pointCount': len(points),
+            'mapCount': mapCount,
+            'influences': influences,
+            'targets': [blendshape.targets[index] for index in sorted(blendshape.targets)]}
+
+
+# ------------------------------------------------------------------------------------------------
+# benchmarks. Each one takes the scene info and a temp directory and returns a function to time.
+# ------------------------------------------------------------------------------------------------
+def benchGetWeightsSkinCluster(scene, directory):
+    return lambda: rig_weights.getWeights(SKINCLUSTER, geometry=GEOMETRY)
+
+
+def benchSetWeightsSkinCluster(scene, directory):
+    weight_object = rig_weights.getWeights(SKINCLUSTER, geometry=GEOMETRY)
+    return lambda: rig_weights.setWeights(SKINCLUSTER, weight_object, geometry=GEOMETRY)
+
+
+def benchGetWeightsCluster(scene, directory):
+    return lambda: rig_weights.getWeights(CLUSTER, geometry=GEOMETRY)
+
+
+def benchSetWeightsCluster(scene, directory):
+    weight_object = rig_weights.getWeights(CLUSTER, geometry=GEOMETRY)
+    return lambda: rig_weights.setWeights(CLUSTER, weight_object, geometry=GEOMETRY)
+
+
+def benchGetWeightsBlendShape(scene, directory):
+    return lambda: rig_weights.getWeights(BLENDSHAPE, mapList=scene['targets'], geometry=GEOMETRY)
+
+
+def benchSetWeightsBlendShape(scene, directory):
+    weight_object = rig_weights.getWeights(BLENDSHAPE, mapList=scene['targets'], geometry=GEOMETRY)
+    return lambda: rig_weights.setWeights(BLENDSHAPE, weight_object, mapList=scene['targets'], geometry=GEOMETRY)
+
+
+def benchMirrorWeightsCluster(scene, directory):
+    return lambda: rig_weights.mirrorWeights(CLUSTER, GEOMETRY)
+
+
+def benchFlipWeightsSkinCluster(scene, directory):
+    return lambda: rig_weights.flipWeights(SKINCLUSTER, mapList=scene['influences'], geometry=GEOMETRY)
+
+
+def benchPruneWeightsSkinCluster(scene, directory):
+    return lambda: rig_weights.pruneWeights(SKINCLUSTER, GEOMETRY, maxInfluences=3)
+
+
+def benchSmoothWeightsSkinCluster(scene, directory):
+    weight_object = rig_weights.getWeights(SKINCLUSTER, geometry=GEOMETRY)
+    return lambda: rig_weights.smoothWeights(weight_object, geometry=GEOMETRY, iterations=5)
+
+
+def benchNormalizeWeightObject(scene, directory):
+    weight_object = rig_weights.getWeights(SKINCLUSTER, geometry=GEOMETRY)
+    return lambda: weight_object.normalize()
+
+
+def benchExportWeightsSkinCluster(scene, directory):
+    return lambda: rig_weights.exportWeights(GEOMETRY, SKINCLUSTER, directory)
+
+
+def benchImportWeightsSkinCluster(scene, directory):
+    rig_weights.exportWeights(GEOMETRY, SKINCLUSTER, directory)
+    filepath = os.path.join(directory, '{}__{}.xml'.format(GEOMETRY, SKINCLUSTER))
+    return lambda: rig_weights.importWeights(GEOMETRY, SKINCLUSTER, filepath)
+
+
+def benchGatherWeightData(scene, directory):
+    def gather():
+        data = weight_data.WeightData()
+        data.gatherDataIterate([SKINCLUSTER, CLUSTER])
+        return data
+    return gather
+
+
+def _writeWeightData(directory, extension):
+    data = weight_data.WeightData()
+    data.gatherDataIterate([SKINCLUSTER, CLUSTER])
+    filepath = os.path.join(directory, 'weights{}'.format(extension))
+    return data, filepath
+
+
+def benchWriteWeightDataJson(scene, directory):
+    data, filepath = _writeWeightData(directory, '.json')
+    return lambda: data.write(filepath)
+
+
+def benchWriteWeightDataBinary(scene, directory):
+    data, filepath = _writeWeightData(directory, weight_data.BINARY_EXTENSION)
+    return lambda: data.write(filepath)
+
+
+def benchReadWeightDataJson(scene, directory):
+    data, filepath = _writeWeightData(directory, '.json')
+    data.write(filepath)
+    return lambda: weight_data.WeightData().read(filepath)
+
+
+def benchReadWeightDataBinary(scene, directory):
+    data, filepath = _writeWeightData(directory, weight_data.BINARY_EXTENSION)
+    data.write(filepath)
+    return lambda: weight_data.WeightData().read(filepath)
+
+
+def benchApplyWeightDataBinary(scene, directory):
+    data, filepath = _writeWeightData(directory, weight_data.BINARY_EXTENSION)
+    data.write(filepath)
+    def apply():
+        new_data = weight_data.WeightData()
+        new_data.read(filepath)
+        new_data.applyData([SKINCLUSTER, CLUSTER])
+    return apply
+
+
+BENCHMARKS = OrderedDict([('weights.getWeights.skinCluster', benchGetWeightsSkinCluster),
+                          ('weights.setWeights.skinCluster', benchSetWeightsSkinCluster),
+                          ('weights.getWeights.cluster', benchGetWeightsCluster),
+                          ('weights.setWeights.cluster', benchSetWeightsCluster),
+                          ('weights.getWeights.blendShape', benchGetWeightsBlendShape),
+                          ('weights.setWeights.blendShape', benchSetWeightsBlendShape),
+                          ('weights.mirrorWeights.cluster', benchMirrorWeightsCluster),
+                          ('weights.flipWeights.skinCluster', benchFlipWeightsSkinCluster),
+                          ('weights.pruneWeights.skinCluster', benchPruneWeightsSkinCluster),
+                          ('weights.smoothWeights.skinCluster', benchSmoothWeightsSkinCluster),
+                          ('weights.exportWeights.skinCluster', benchExportWeightsSkinCluster),
+                          ('weights.importWeights.skinCluster', benchImportWeightsSkinCluster),
+                          ('weightObject.normalize', benchNormalizeWeightObject),
+                          ('weight_data.gatherData', benchGatherWeightData),
+                          ('weight_data.write.json', benchWriteWeightDataJson),
+                          ('weight_data.write.binary', benchWriteWeightDataBinary),
+                          ('weight_data.read.json', benchReadWeightDataJson),
+                          ('weight_data.read.binary', benchReadWeightDataBinary),
+                          ('weight_data.applyData.binary', benchApplyWeightDataBinary)])
+
+
+def timeFunction(function, repeat=3):
+    '''
+    Time a function. The first call is run as a warm up so caches like the symmetry map are
+    built before we start timing.
+
+    :return: best, mean in seconds
+    :rtype: tuple
+    '''
+    function()
+    times = list()
+    for _ in range(repeat):
+        start = timeit.default_timer()
+        function()
+        times.append(timeit.default_timer() - start)
+
+    return min(times), sum(times) / len(times)
+
+
+def getCommit():
+    '''
+    Get the commit we're on and whether the tree has changes.
+    '''
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIRECTORY).strip()
+        status = subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                         cwd=ROOT_DIRECTORY).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+    return commit.decode('utf-8'), bool(status)
+
+
+def run(pointList=None, mapList=None, only=None, repeat=3, verbose=True):
+    '''
+    Run the benchmarks for every combination of point count and map count.
+
+    :param pointList: Point counts to build meshes for.
+    :type pointList: list
+
+    :param mapList: Number of influences and blendShape targets.
+    :type mapList: list
+
+    :param only: Only run the benchmarks with one of these strings in their name.
+    :type only: list
+
+    :param repeat: Number of times to time each benchmark.
+    :type repeat: int
+
+    :return: List of results
+    :rtype: list
+    '''
+    results = list()
+    for point_count in pointList or DEFAULT_POINTS:
+        for map_count in mapList or DEFAULT_MAPS:
+            scene = buildScene(point_count, map_count)
+            directory = tempfile.mkdtemp(prefix='openrig_weights_benchmark_')
+            try:
+                for name, benchmark in BENCHMARKS.items():
+                    if only and not any(text in name for text in only):
+                        continue
+                    best, mean = timeFunction(benchmark(scene, directory), repeat)
+                    result = OrderedDict([('name', name),
+                                          ('points', scene['pointCount']),
+                                          ('maps', map_count),
+                                          ('best', best),
+                                          ('mean', mean)])
+                    results.append(result)
+                    if verbose:
+                        print('{:<36} points {:>7} maps {:>4}  best {:9.4f}s  mean {:9.4f}s'.format(
+                            name, scene['pointCount'], map_count, best, mean))
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    return results
+
+
+def readHistory(filepath=HISTORY_FILE):
+    '''
+    Read the benchmark history. Returns an empty list if there isn't one yet.
+    '''
+    if not os.path.isfile(filepath):
+        return list()
+    with open(filepath, 'r') as f:
+        return json.load(f, object_pairs_hook=OrderedDict)
+
+
+def writeHistory(results, filepath=HISTORY_FILE, label=None):
+    '''
+    Append the results of a run to the history.
+
+    :return: The entry that was added
+    :rtype: OrderedDict
+    '''
+    commit, dirty = getCommit()
+    entry = OrderedDict([('time', time.strftime('%Y-%m-%d %H:%M:%S')),
+                         ('commit', commit),
+                         ('dirty', dirty),
+                         ('label', label),
+                         ('python', platform.python_version()),
+                         ('numpy', numpy.__version__),
+                         ('machine', platform.node()),
+                         ('results', results)])
+    history = readHistory(filepath)
+    history.append(entry)
+    with open(filepath, 'w') as f:
+        json.dump(history, f, indent=2)
+
+    return entry
+
+
+def compare(entry, history):
+    '''
+    Print how the results compare to the last run in the history that has any of the same benchmarks.
+    '''
+    key = lambda result: (result['name'], result['points'], result['maps'])
+    for previous in reversed(history):
+        previous_results = dict((key(result), result) for result in previous['results'])
+        matches = [(result, previous_results[key(result)]) for result in entry['results']
+                   if key(result) in previous_results]
+        if not matches:
+            continue
+        print('\ncompared to {} ({})'.format(previous['commit'], previous['time']))
+        for result, previous_result in matches:
+            ratio = result['best'] / previous_result['best'] if previous_result['best'] else 0.0
+            print('{:<36} points {:>7} maps {:>4}  {:9.4f}s -> {:9.4f}s  x{:.2f}'.format(
+                result['name'], result['points'], result['maps'], previous_result['best'], result['best'], ratio))
+        return
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the openrig weight code outside of Maya.')
+    parser.add_argument('--points', type=int, nargs='+', default=DEFAULT_POINTS,
+                        help='Point counts to build meshes for.')
+    parser.add_argument('--maps', type=int, nargs='+', default=DEFAULT_MAPS,
+                        help='Number of influences and blendShape targets.')
+    parser.add_argument('--only', nargs='+', help='Only run benchmarks with one of these in their name.')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of times to time each benchmark.')
+    parser.add_argument('--history', default=HISTORY_FILE, help='Json file to add the results to.')
+    parser.add_argument('--label', help='Label to store with the results.')
+    parser.add_argument('--no-history', action='store_true', help="Don't write the results to the history.")
+    parser.add_argument('--compare', action='store_true', help='Compare to the last run in the history.')
+    args = parser.parse_args(argv)
+
+    results = run(args.points, args.maps, args.only, args.repeat)
+    if args.no_history:
+        return
+    entry = writeHistory(results, args.history, args.label)
+    if args.compare:
+        compare(entry, readHistory(args.history)[:-1])
+
+
+if __name__ == '__main__':
+    main()
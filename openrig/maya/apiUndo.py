@@ -0,0 +1,89 @@
+'''
+This module lets edits made through the API be undone. Maya only puts commands on the undo queue,
+so the edit is handed to a small command that is registered by this same file when it's loaded
+as a plugin. The command runs the edit and calls the undo function on Ctrl+Z.
+
+..example ::
+     modifier = om2.MDGModifier()
+     modifier.newPlugValue(plug, data)
+     apiUndo.commit(modifier.doIt, modifier.undoIt)
+'''
+import os
+import maya.cmds as mc
+import maya.api.OpenMaya as om2
+
+# name of the command that puts the edits on the undo queue
+COMMAND_NAME = 'openrigApiUndo'
+# this file is also the plugin that registers the command
+PLUGIN_PATH = os.path.splitext(os.path.abspath(__file__))[0] + '.py'
+
+# (doIt, undoIt) waiting for the command to pick them up
+_PENDING = list()
+
+
+def maya_useNewAPI():
+    '''
+    Tells Maya the plugin uses maya.api.OpenMaya.
+    '''
+    pass
+
+
+def commit(doIt, undoIt):
+    '''
+    Run an edit so it can be undone. If the undo queue is off we just run the edit.
+
+    :param doIt: Makes the edit. It's called again on redo.
+    :type doIt: function
+
+    :param undoIt: Puts back what doIt changed.
+    :type undoIt: function
+    '''
+    if not mc.undoInfo(q=True, state=True):
+        doIt()
+        return
+
+    if not mc.pluginInfo(PLUGIN_PATH, q=True, loaded=True):
+        mc.loadPlugin(PLUGIN_PATH, qt=True)
+    _PENDING.append((doIt, undoIt))
+    try:
+        getattr(mc, COMMAND_NAME)()
+    finally:
+        # the command takes the edit, this only clears it if the command failed before it could
+        del _PENDING[:]
+
+
+class ApiUndoCommand(om2.MPxCommand):
+    '''
+    Runs the edit passed to commit and keeps it for undo and redo.
+    '''
+    def __init__(self):
+        super(ApiUndoCommand, self).__init__()
+        self._doIt = None
+        self._undoIt = None
+
+    @staticmethod
+    def creator():
+        return ApiUndoCommand()
+
+    def doIt(self, args):
+        # Maya loads the plugin as its own module, the edits are kept on the openrig module
+        import openrig.maya.apiUndo as apiUndo
+        self._doIt, self._undoIt = apiUndo._PENDING.pop()
+        self._doIt()
+
+    def redoIt(self):
+        self._doIt()
+
+    def undoIt(self):
+        self._undoIt()
+
+    def isUndoable(self):
+        return True
+
+
+def initializePlugin(plugin):
+    om2.MFnPlugin(plugin).registerCommand(COMMAND_NAME, ApiUndoCommand.creator)
+
+
+def uninitializePlugin(plugin):
+    om2.MFnPlugin(plugin).deregisterCommand(COMMAND_NAME)
@@ -3,11 +3,34 @@ This module is for dealing with blendShapes inside Maya
 """
 import maya.cmds as mc
 import maya.mel as mm
+import maya.api.OpenMaya as om2
 import openrig.shared.common
+import openrig.shared.components as components
 import openrig.maya.wrap
 import openrig.maya.shape as shape
 import openrig.maya.skinCluster
+import openrig.maya.apiUndo as apiUndo
 import os
+import re
+import io
+import gzip
+import numpy
+from collections import OrderedDict
+
+# index of the inputTargetItem maya stores a target's full (1.0 weight) shape on
+TARGET_ITEM = 6000
+# ways getDeformationMatrices can get the deformation of each point
+DEFORMATION_METHODS = ('finiteDifference', 'skinCluster')
+# deformation matrices with a determinant smaller than this, relative to the cube of their norm,
+# are treated as flattening the point
+SINGULAR_TOLERANCE = 1e-8
+# columns of a delta array
+AXES = 'xyz'
+# matches the weight plug in an alias query, like "weight[3]"
+WEIGHT_ALIAS_RE = re.compile(r'^(?:weight|w)\[(\d+)\]$')
+
+# blendShape name -> (OrderedDict {target name: index} sorted by index, {index: target name})
+_TARGET_ALIAS_CACHE = dict()
 
 def transferBlendShape(source, target, deformer, differentTopology=0, connections=1):
     """
@@ -125,21 +148,19 @@ def transferBlendShape(source, target, deformer, differentTopology=0, connection
                 setTargetWeight(wrap_target_bs, target, 0)
 
             # ------------------------------------------------------------------------
-            # Weights - Copy blendshape target weights using a skinCluster to project
+            # Weights - Copy blendshape target weights from the closest point on the source
             # ------------------------------------------------------------------------
             # BlendShape to copy from
             source_bs = deformer
-            # Add blendshape node name into the maps names
-            source_maps = []
-            for target in targets:
-                if openrig.maya.weights.isDefault(source_bs, target):
-                    continue
+            # only copy the targets that have been painted, all in one go
+            source_maps = [target for target in targets if not openrig.maya.weights.isDefault(source_bs, target)]
+            if source_maps:
                 openrig.maya.weights.copyDeformerWeight(source_mesh=source,
                                                         target_mesh=targetMesh,
                                                         source_deformer=source_bs,
                                                         target_deformer=target_bs,
-                                                        source_map=target,
-                                                        target_map=target)
+                                                        source_map=source_maps,
+                                                        target_map=source_maps)
 
             # Hook up target connections
             if connections:
@@ -163,10 +184,25 @@ def addTarget(bs, name=None):
     """
     shapeIndex = mm.eval('doBlendShapeAddTarget("{bs}", 1, 1, "", 0, 0, {{}})'.format(bs=bs))[0]
     mc.aliasAttr(name, bs+'.w[{index}]'.format(index=shapeIndex))
+    clearTargetAliasCache(bs)
     targetName = mc.aliasAttr(bs+'.w[{index}]'.format(index=shapeIndex), q=1)
-    geo = mc.deformer(bs, q=1, g=1)[0]
     return targetName
 
+def renameTarget(bs, target, name):
+    """
+    Rename a blendShape target
+    :param bs: BlendShape node
+    :param target: String name of target or the target's index
+    :param name: New name for the target
+    :return: New name of the target
+    """
+    targetIndex = getTargetIndex(bs, target)
+    if targetIndex == -1:
+        raise RuntimeError('[ {} ] missing target [ {} ]'.format(bs, target))
+    mc.aliasAttr(name, bs+'.w[{index}]'.format(index=targetIndex))
+    clearTargetAliasCache(bs)
+    return mc.aliasAttr(bs+'.w[{index}]'.format(index=targetIndex), q=1)
+
 def getBlendShapes(geometry):
     """
     This will check the geometry to see if it has a blendShape in it's history stack
@@ -178,6 +214,44 @@ def getBlendShapes(geometry):
     hist = [node for node in hist if mc.nodeType(node) == "blendShape"]
     return hist
 
+def getTargetAliasTable(bs, refresh=False):
+    """
+    Get the target names and indices of a blendShape from a single alias query. The table is
+    cached per blendShape and rebuilt when refresh is True or clearTargetAliasCache is called.
+    :param bs: blendShape
+    :param refresh: Query the aliases again instead of using the cached table
+    :return: OrderedDict of {target name: index} sorted by index, dict of {index: target name}
+    """
+    if not refresh and bs in _TARGET_ALIAS_CACHE:
+        return _TARGET_ALIAS_CACHE[bs]
+
+    # the query returns a flat list of alias, plug pairs for every alias on the node
+    aliases = mc.aliasAttr(bs, q=1) or list()
+    targets = list()
+    for alias, plug in zip(aliases[::2], aliases[1::2]):
+        match = WEIGHT_ALIAS_RE.match(plug)
+        if match:
+            targets.append((int(match.group(1)), alias))
+    targets.sort()
+
+    nameTable = OrderedDict((name, index) for index, name in targets)
+    indexTable = dict(targets)
+    _TARGET_ALIAS_CACHE[bs] = (nameTable, indexTable)
+
+    return nameTable, indexTable
+
+def clearTargetAliasCache(bs=None):
+    """
+    Remove the cached alias table for the blendShape so it gets rebuilt the next time it's used.
+    If no blendShape is passed we clear the whole cache.
+    :param bs: blendShape
+    :return: None
+    """
+    if bs is None:
+        _TARGET_ALIAS_CACHE.clear()
+    else:
+        _TARGET_ALIAS_CACHE.pop(bs, None)
+
 def getTargetIndex(bs, targetName):
     """
     Finds index for the target name.
@@ -190,15 +264,14 @@ def getTargetIndex(bs, targetName):
     if isinstance(targetName, (int, long)):
         return targetName
 
-    targetCount = mc.blendShape(bs, q=1, target=1, wc=1)
-    n = i = 0
-    while n < targetCount:
-        alias = mc.aliasAttr(bs + '.w[{}]'.format(i), q=1)
-        if alias == targetName:
-            return i
-        if alias:
-            n += 1
-        i += 1
+    # check the cached index still has this name, targets can be renamed or removed outside of this module
+    targetIndex = getTargetAliasTable(bs)[0].get(targetName)
+    if targetIndex is not None and mc.aliasAttr(bs + '.w[{}]'.format(targetIndex), q=1) == targetName:
+        return targetIndex
+
+    targetIndex = getTargetAliasTable(bs, refresh=True)[0].get(targetName)
+    if targetIndex is not None:
+        return targetIndex
 
     # Return -1 if the target can not be found
     return -1
@@ -221,16 +294,7 @@ def getTargetNames(bs):
     :param bs:  blendShape
     :return: list
     """
-    targetCount = mc.blendShape(bs, q=1, target=1, wc=1)
-    targetNames = list()
-    n = i = 0
-    while n < targetCount:
-        alias = mc.aliasAttr(bs + '.w[{}]'.format(i), q=1)
-        if alias:
-            targetNames.append(alias)
-            n += 1
-        i += 1
-    return targetNames
+    return list(getTargetAliasTable(bs, refresh=True)[0])
 
 
 def getTargetIds(bs):
@@ -239,16 +303,7 @@ def getTargetIds(bs):
     :param bs:  blendShape
     :return: list of ints
     """
-    targetCount = mc.blendShape(bs, q=1, target=1, wc=1)
-    targetIds = list()
-    n = i = 0
-    while n < targetCount:
-        alias = mc.aliasAttr(bs + '.w[{}]'.format(i), q=1)
-        if alias:
-            targetIds.append(i)
-            n += 1
-        i += 1
-    return targetIds
+    return list(getTargetAliasTable(bs, refresh=True)[0].values())
 
 
 def getTargetDeltas(bs, target):
@@ -260,7 +315,7 @@ def getTargetDeltas(bs, target):
     """
     # If string name is passed get the index
     targetIndex = getTargetIndex(bs, target)
-    indexedAttr = bs+'.it[0].itg[{}].iti[6000]'.format(targetIndex)
+    indexedAttr = bs+'.it[0].itg[{}].iti[{}]'.format(targetIndex, TARGET_ITEM)
     delta_list = mc.getAttr(indexedAttr+'.ipt') or []
     index_list = mc.getAttr(indexedAttr+'.ict') or []
 
@@ -280,7 +335,7 @@ def setTargetDeltas(bs, deltas=None, indices=None, target=None):
     if not deltas:
         return
     targetIndex = getTargetIndex(bs, target)
-    indexedAttr = bs+'.it[0].itg[{}].iti[6000]'.format(targetIndex)
+    indexedAttr = bs+'.it[0].itg[{}].iti[{}]'.format(targetIndex, TARGET_ITEM)
     deltas.insert(0, len(deltas))
     indices.insert(0, len(indices))
     mc.setAttr(indexedAttr+'.ict', *indices, type='componentList')
@@ -304,18 +359,143 @@ def clearTargetDeltasByAxis(bs, target, axis='x'):
     :param axis: Axis to clear, defaults to x axis.
     :return: None
     """
+    scaleTargetDeltas(bs, [target], 0.0, axis=axis)
+
+def getTargetDeltaArray(bs, target):
+    """
+    Get the deltas for the given target as numpy arrays
+    :param bs: BlendShape
+    :param target: String name of target or the target's index
+    :return: (N, 3) array of deltas, array of the N point indices
+    """
     deltas, indices = getTargetDeltas(bs, target)
-    if axis == 'x':
-        for i in range(len(deltas)):
-            deltas[i] = (0.0, deltas[i][1], deltas[i][2], deltas[i][3])
-    if axis == 'y':
-        for i in range(len(deltas)):
-            deltas[i] = (deltas[i][0], 0.0, deltas[i][2], deltas[i][3])
-    if axis == 'z':
-        for i in range(len(deltas)):
-            deltas[i] = (deltas[i][0], deltas[i][1], 0.0, deltas[i][3])
-
-    setTargetDeltas(bs, deltas, indices, target)
+    if not deltas:
+        return numpy.zeros((0, 3)), numpy.zeros(0, dtype=numpy.int64)
+    return numpy.array(deltas, dtype=numpy.float64)[:, :3], components.expandIndices(indices)
+
+def setTargetDeltaArray(bs, target, deltas, indices):
+    """
+    Set the deltas for a blendShape target from numpy arrays. The plugs are set with one
+    MDGModifier that is committed through apiUndo so it can be undone.
+    :param bs: BlendShape node
+    :param target: String name of target or the target's index
+    :param deltas: (N, 3) array of deltas
+    :param indices: Array of the N point indices
+    :return: None
+    """
+    indices = numpy.asarray(indices)
+    if not len(indices):
+        clearTargetDeltas(bs, target)
+        return
+
+    targetIndex = getTargetIndex(bs, target)
+    if targetIndex == -1:
+        raise RuntimeError('[ {} ] missing target [ {} ]'.format(bs, target))
+
+    # the component sorts the indices and drops duplicates, so keep the first delta for each
+    # index in the same order to keep the points and components the same length
+    indices, first = numpy.unique(indices, return_index=True)
+    # the points need the w as well
+    points = numpy.ones((len(indices), 4), dtype=numpy.float64)
+    points[:, :3] = numpy.asarray(deltas, dtype=numpy.float64)[first]
+
+    indexedAttr = bs+'.it[0].itg[{}].iti[{}]'.format(targetIndex, TARGET_ITEM)
+    selList = om2.MSelectionList()
+    selList.add(indexedAttr+'.ipt')
+    selList.add(indexedAttr+'.ict')
+
+    # build the data objects directly, the same way getTargetDeltasBatch reads them
+    pointData = om2.MFnPointArrayData().create(om2.MPointArray(points.tolist()))
+    componentFn = om2.MFnSingleIndexedComponent()
+    component = componentFn.create(om2.MFn.kMeshVertComponent)
+    componentFn.addElements(indices.tolist())
+    componentListFn = om2.MFnComponentListData()
+    componentData = componentListFn.create()
+    componentListFn.add(component)
+
+    modifier = om2.MDGModifier()
+    modifier.newPlugValue(selList.getPlug(0), pointData)
+    modifier.newPlugValue(selList.getPlug(1), componentData)
+    apiUndo.commit(modifier.doIt, modifier.undoIt)
+
+def _getAxisIndices(axis):
+    """
+    Convert an axis string like 'x' or 'xz' into the columns of a delta array
+    :param axis: Any combination of x, y and z
+    :return: list of ints
+    """
+    if not axis or not set(axis) <= set(AXES):
+        raise ValueError('{} is not a combination of x, y and z.'.format(axis))
+    return sorted(set([AXES.index(a) for a in axis]))
+
+def _editTargetDeltas(bs, targets, factors, axis):
+    """
+    Multiply the deltas of each target by a per point factor on the given axes. Each target is
+    read and written once.
+    :param bs: BlendShape node
+    :param targets: Target names or indices. If None we edit every target.
+    :param factors: Single factor or array with a factor for every point on the geometry
+    :param axis: Any combination of x, y and z
+    :return: List of the targets that were edited
+    """
+    columns = _getAxisIndices(axis)
+    if targets is None:
+        targets = getTargetIds(bs)
+    targets = openrig.shared.common.toList(targets)
+    factors = numpy.asarray(factors, dtype=numpy.float64)
+
+    # one undo for every target
+    mc.undoInfo(openChunk=1)
+    try:
+        for target in targets:
+            deltas, indices = getTargetDeltaArray(bs, target)
+            if not len(indices):
+                continue
+            if factors.ndim:
+                if indices.max() >= len(factors):
+                    raise ValueError('{} target {} has deltas on point {} but there are only {} factors.'.format(
+                        bs, target, indices.max(), len(factors)))
+                deltas[:, columns] *= factors[indices][:, None]
+            else:
+                deltas[:, columns] *= factors
+            setTargetDeltaArray(bs, target, deltas, indices)
+    finally:
+        mc.undoInfo(closeChunk=1)
+
+    return targets
+
+def scaleTargetDeltas(bs, targets=None, value=0.0, mask=None, axis='xyz'):
+    """
+    Scale the deltas of targets on the given axes. A value of 0 clears the deltas. With a mask
+    each point is blended between its current delta (mask 0) and the scaled delta (mask 1).
+
+    ..example ::
+         # clear the left side of the smile target in y
+         scaleTargetDeltas('face_bs', ['smile'], 0.0, mask=leftSideWeights, axis='y')
+
+    :param bs: BlendShape node
+    :param targets: Target names or indices. If None we scale every target.
+    :param value: Amount to scale the deltas by
+    :param mask: Weight between 0 and 1 for every point on the geometry. If None every point is scaled.
+    :param axis: Any combination of x, y and z
+    :return: List of the targets that were scaled
+    """
+    if mask is None:
+        factors = value
+    else:
+        factors = 1.0 + numpy.asarray(mask, dtype=numpy.float64) * (value - 1.0)
+    return _editTargetDeltas(bs, targets, factors, axis)
+
+def multiplyTargetDeltas(bs, weights, targets=None, axis='xyz'):
+    """
+    Multiply the deltas of targets by a weight for every point, like baking a weight map into them.
+    :param bs: BlendShape node
+    :param weights: Weight for every point on the geometry
+    :param targets: Target names or indices. If None we multiply every target.
+    :param axis: Any combination of x, y and z
+    :return: List of the targets that were multiplied
+    """
+    return _editTargetDeltas(bs, targets, weights, axis)
 
 def getAllTargetDeltas(bs):
     """
@@ -343,6 +523,190 @@ def setAllTargetDeltas(bs, deltas):
         setTargetDeltas(bs, delta[0], delta[1], target)
 
 
+def getTargetDeltasBatch(bs, targets=None):
+    """
+    Get the deltas for many targets at once as one sparse structure. The deltas for target i are
+    deltas[offsets[i]:offsets[i+1]] on the points in indices[offsets[i]:offsets[i+1]].
+    :param bs: BlendShape node
+    :param targets: Target names or indices. If None we get every target.
+    :return: OrderedDict with targets, targetIds, offsets, indices and float32 (N, 3) deltas
+    """
+    nameTable, indexTable = getTargetAliasTable(bs, refresh=True)
+    if targets is None:
+        targetIds = list(nameTable.values())
+    else:
+        targetIds = [getTargetIndex(bs, target) for target in targets]
+        for target, targetIndex in zip(targets, targetIds):
+            if targetIndex == -1:
+                raise RuntimeError('[ {} ] missing target [ {} ]'.format(bs, target))
+    targetNames = [indexTable.get(targetIndex) for targetIndex in targetIds]
+
+    # one selection list for every plug so we only look the node up once
+    selList = om2.MSelectionList()
+    for targetIndex in targetIds:
+        indexedAttr = bs+'.it[0].itg[{}].iti[{}]'.format(targetIndex, TARGET_ITEM)
+        selList.add(indexedAttr+'.ipt')
+        selList.add(indexedAttr+'.ict')
+
+    deltaList = list()
+    indexList = list()
+    for i in range(len(targetIds)):
+        pointData = _getPlugData(selList.getPlug(i * 2))
+        componentData = _getPlugData(selList.getPlug(i * 2 + 1))
+        deltas = numpy.zeros((0, 3), dtype=numpy.float32)
+        indices = numpy.zeros(0, dtype=numpy.int32)
+        if pointData is not None and componentData is not None:
+            points = om2.MFnPointArrayData(pointData).array()
+            if len(points):
+                deltas = numpy.array(points, dtype=numpy.float32)[:, :3]
+            componentListData = om2.MFnComponentListData(componentData)
+            elements = [om2.MFnSingleIndexedComponent(componentListData.get(c)).getElements()
+                        for c in range(componentListData.length())]
+            if elements:
+                indices = numpy.concatenate([numpy.array(e, dtype=numpy.int32) for e in elements])
+        if len(deltas) != len(indices):
+            raise RuntimeError('{} target {} has {} deltas for {} points.'.format(bs, targetNames[i],
+                                                                                 len(deltas), len(indices)))
+        deltaList.append(deltas)
+        indexList.append(indices)
+
+    offsets = numpy.zeros(len(targetIds) + 1, dtype=numpy.int64)
+    offsets[1:] = numpy.cumsum([len(indices) for indices in indexList])
+
+    data = OrderedDict()
+    data['targets'] = targetNames
+    data['targetIds'] = numpy.array(targetIds, dtype=numpy.int32)
+    data['offsets'] = offsets
+    data['indices'] = numpy.concatenate(indexList) if indexList else numpy.zeros(0, dtype=numpy.int32)
+    data['deltas'] = numpy.concatenate(deltaList) if deltaList else numpy.zeros((0, 3), dtype=numpy.float32)
+    return data
+
+
+def _getPlugData(plug):
+    """
+    Get the data object on a plug, or None if it has never been set.
+    :param plug: Plug holding typed data
+    :return: MObject or None
+    """
+    try:
+        data = plug.asMObject()
+    except RuntimeError:
+        return None
+    if data.isNull():
+        return None
+    return data
+
+
+def setTargetDeltasBatch(bs, data, targets=None):
+    """
+    Set the deltas from getTargetDeltasBatch or readTargetDeltas. Targets are matched by name and
+    missing targets are added.
+    :param bs: BlendShape node
+    :param data: Sparse deltas with targets, offsets, indices and deltas
+    :param targets: Names of the targets in the data to set. If None we set every target.
+    :return: List of the target names that were set
+    """
+    offsets = data['offsets']
+    setTargets = list()
+    # one undo for every target
+    mc.undoInfo(openChunk=1)
+    try:
+        for i, target in enumerate(data['targets']):
+            if targets is not None and target not in targets:
+                continue
+            targetIndex = getTargetIndex(bs, target)
+            if targetIndex == -1:
+                addTarget(bs, target)
+                targetIndex = getTargetIndex(bs, target)
+
+            setTargetDeltaArray(bs, targetIndex,
+                                data['deltas'][offsets[i]:offsets[i + 1]],
+                                data['indices'][offsets[i]:offsets[i + 1]])
+            setTargets.append(target)
+    finally:
+        mc.undoInfo(closeChunk=1)
+
+    return setTargets
+
+
+def exportTargetDeltas(bs, filepath, targets=None):
+    """
+    Write the deltas for every target to a binary numpy (.npz) file.
+    :param bs: BlendShape node
+    :param filepath: File to write. If it ends with .gz the file is zipped.
+    :param targets: Target names or indices. If None we write every target.
+    :return: filepath
+    """
+    data = getTargetDeltasBatch(bs, targets)
+    directory = os.path.dirname(filepath)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    # pass a file so numpy doesn't add .npz to the name
+    with _openDeltaFile(filepath, 'wb') as f:
+        # the archive has to be seekable while it's written, gzip files aren't
+        stream = io.BytesIO() if filepath.endswith('.gz') else f
+        numpy.savez(stream,
+                    targets=numpy.array(data['targets']),
+                    targetIds=data['targetIds'],
+                    offsets=data['offsets'],
+                    indices=data['indices'],
+                    deltas=data['deltas'])
+        if stream is not f:
+            f.write(stream.getvalue())
+    return filepath
+
+
+def _openDeltaFile(filepath, mode='rb'):
+    """
+    Open a delta file, zipped files (.gz) are compressed and decompressed as they're written and read.
+    :param filepath: File to open
+    :param mode: Mode to open the file with
+    :return: File object
+    """
+    if filepath.endswith('.gz'):
+        return gzip.open(filepath, mode)
+    return open(filepath, mode)
+
+
+def isTargetDeltaFile(filepath):
+    """
+    Check if a file has deltas written by exportTargetDeltas, and not by the blendShape command.
+    :param filepath: File to check
+    :return: True if it's a file we can read with readTargetDeltas
+    """
+    with _openDeltaFile(filepath) as f:
+        # .npz files are zip archives
+        return f.read(4) == b'PK\x03\x04'
+
+
+def readTargetDeltas(filepath):
+    """
+    Read the deltas written by exportTargetDeltas. Zipped files (.gz) are decompressed into memory.
+    :param filepath: File to read
+    :return: OrderedDict with targets, targetIds, offsets, indices and deltas
+    """
+    data = OrderedDict()
+    with _openDeltaFile(filepath) as f:
+        # the archive has to be seekable, gzip files aren't
+        stream = io.BytesIO(f.read()) if filepath.endswith('.gz') else f
+        with numpy.load(stream) as npz:
+            data['targets'] = [str(target) for target in npz['targets'].tolist()]
+            for key in ('targetIds', 'offsets', 'indices', 'deltas'):
+                data[key] = npz[key]
+    return data
+
+
+def importTargetDeltas(bs, filepath, targets=None):
+    """
+    Set the deltas written by exportTargetDeltas on a blendShape.
+    :param bs: BlendShape node
+    :param filepath: File to read
+    :param targets: Names of the targets in the file to set. If None we set every target.
+    :return: List of the target names that were set
+    """
+    return setTargetDeltasBatch(bs, readTargetDeltas(filepath), targets)
+
+
 def setTargetWeight(bs, target, value):
     """
     Set target values by index
@@ -416,41 +780,143 @@ def setTargetMapWeights(bs, target, values):
     # Set weights
     mc.setAttr(attr, *values)
 
-def invertShape(bs, target, geo):
-
-    melInvert = os.path.dirname(shape.__file__).replace('\\', '/') + '/invertShape.mel'
-    mm.eval('source "' + melInvert + '"')
+def getDeformationMatrices(bs, target, indices, method='finiteDifference'):
+    """
+    Get a 3x3 matrix for each point that maps a delta on the target to the offset it makes on the
+    deformed geometry, so offset = delta * matrix with the delta as a row vector.
+    finiteDifference moves the points one unit along each axis through the target and measures the
+    geometry, which works for any deformer stack after the blendShape. skinCluster builds the
+    matrices from the influence matrices and weights, which only accounts for a linear skinCluster.
+    :param bs: BlendShape node
+    :param target: String name of target or the target's index. Its deltas are cleared.
+    :param indices: Indices of the points to get matrices for
+    :param method: finiteDifference or skinCluster
+    :return: (N, 3, 3) array of matrices
+    """
+    if method not in DEFORMATION_METHODS:
+        raise ValueError('{} is not one of {}'.format(method, ', '.join(DEFORMATION_METHODS)))
+    base = mc.deformer(bs, q=1, geometry=1)[0]
+    indices = numpy.asarray(indices)
+
+    if method == 'skinCluster':
+        sc = openrig.maya.skinCluster.getSkinCluster(base)
+        if not sc:
+            raise RuntimeError('No skinCluster deforming [ {} ]'.format(base))
+        return getSkinClusterMatrices(sc, indices, base)
 
-    # Indices of points with different positions of two meshes
+    targetIndex = getTargetIndex(bs, target)
+    if targetIndex == -1:
+        raise RuntimeError('[ {} ] missing target [ {} ]'.format(bs, target))
+
+    # the target and the envelope have to be fully on while we sample or every matrix is zero.
+    # anything driving them is disconnected and hooked back up when we're done.
+    restoreList = list()
+    try:
+        for attr in [bs+'.w[{}]'.format(targetIndex), bs+'.envelope']:
+            source = openrig.shared.common.getFirstIndex(mc.listConnections(attr, s=True, d=False, p=True))
+            restoreList.append((attr, mc.getAttr(attr), source))
+            if source:
+                mc.disconnectAttr(source, attr)
+            mc.setAttr(attr, 1.0)
+
+        clearTargetDeltas(bs, target)
+        restPoints = shape.getPoints(base)[indices]
+        matrices = numpy.zeros((len(indices), 3, 3))
+        for axis in range(3):
+            deltas = numpy.zeros((len(indices), 3))
+            deltas[:, axis] = 1.0
+            setTargetDeltaArray(bs, target, deltas, indices)
+            matrices[:, axis] = shape.getPoints(base)[indices] - restPoints
+        clearTargetDeltas(bs, target)
+    finally:
+        for attr, value, source in reversed(restoreList):
+            mc.setAttr(attr, value)
+            if source:
+                mc.connectAttr(source, attr, f=True)
+
+    return matrices
+
+def getSkinClusterMatrices(sc, indices, geometry=None):
+    """
+    Get the 3x3 linear skinning matrix for each point from the influence matrices and weights.
+    :param sc: skinCluster
+    :param indices: Indices of the points to get matrices for
+    :param geometry: Geometry deformed by the skinCluster. If None we use the first one.
+    :return: (N, 3, 3) array of matrices
+    """
+    weightArray, influenceList = openrig.maya.skinCluster.getWeightArray(sc, geometry)
+    indexMap = openrig.maya.skinCluster.getInfluenceIndexMap(sc)
+    logicalIndices = [indexMap[influence] if influence in indexMap else indexMap[mc.ls(influence)[0]]
+                      for influence in influenceList]
+
+    selList = om2.MSelectionList()
+    selList.add(sc)
+    nodeFn = om2.MFnDependencyNode(selList.getDependNode(0))
+    geomMatrix = _getMatrixArray(nodeFn.findPlug('geomMatrix', False))[0]
+    bindPreMatrices = _getMatrixArray(nodeFn.findPlug('bindPreMatrix', False), logicalIndices)
+    matrices = _getMatrixArray(nodeFn.findPlug('matrix', False), logicalIndices)
+
+    # points go from object space into world with the geomMatrix, get skinned in world space and
+    # come back into object space with its inverse
+    influenceMatrices = numpy.einsum('ij,njk,nkl,lm->nim', geomMatrix, bindPreMatrices, matrices,
+                                     numpy.linalg.inv(geomMatrix))[:, :3, :3]
+
+    return numpy.einsum('pi,ijk->pjk', weightArray[numpy.asarray(indices)], influenceMatrices)
+
+def _getMatrixArray(plug, logicalIndices=None):
+    """
+    Read matrices from a matrix plug, or from the elements of an array plug.
+    :param plug: Matrix plug
+    :param logicalIndices: Elements to read from an array plug. If None the plug is read itself.
+    :return: (N, 4, 4) array of matrices
+    """
+    plugs = [plug] if logicalIndices is None else [plug.elementByLogicalIndex(i) for i in logicalIndices]
+    return numpy.array([list(om2.MFnMatrixData(p.asMObject()).matrix()) for p in plugs],
+                       dtype=numpy.float64).reshape(-1, 4, 4)
+
+def invertShape(bs, target, geo, method='finiteDifference'):
+    """
+    Set the deltas on the target so the deformed blendShape geometry matches geo, like a
+    corrective sculpted on top of a posed skin.
+    :param bs: BlendShape node
+    :param target: String name of target or the target's index
+    :param geo: Sculpted geometry to match
+    :param method: How to get the deformation of each point. finiteDifference or skinCluster,
+                   see getDeformationMatrices.
+    :return: Indices of the points that were inverted
+    """
     base = mc.deformer(bs, q=1, geometry=1)
     if not base:
         raise Exception("No geo associated with blendShape [ " + bs + " ] ")
-        return
     else:
         base = mc.listRelatives(base, path=1, p=1)[0]
 
-    if getTargetIndex(bs, target) is None:
+    if getTargetIndex(bs, target) == -1:
         raise Exception(
             '[ ' + bs + ' ] missing target [ ' + target + ' ] The duplicate shape must be named the same as the blendShape target.')
 
-    sel = mc.ls(sl=1)
-    clearTargetDeltas(bs, target)
-
-    indices = shape.getDeltaIndices(base, geo)
-    indicesStr = ['vtx[' + str(x) + ']' for x in indices]
-    vertices = [geo + '.vtx[' + str(x) + ']' for x in indices]
-
-    mc.select(vertices)
-    cmd = 'absRelMovePolySel `ls -l -fl -sl` ' + base + ' ' + geo + ' .001'
-    melDeltas = mm.eval(cmd)
-
-    deltas = list()
-    for d in melDeltas:
-        x, y, z = d.split()
-        deltas.append((float(x), float(y), float(z), 1.0))
-
-    setTargetDeltas(bs, deltas, indicesStr, target)
-
-    if sel:
-        mc.select(sel)
+    # the sampling edits and the new deltas are undone together
+    mc.undoInfo(openChunk=1)
+    try:
+        clearTargetDeltas(bs, target)
+        offsets, indices = shape.getPointDeltas(base, geo, deformed=True)
+        if not len(indices):
+            return indices
+
+        matrices = getDeformationMatrices(bs, target, indices, method)
+        # points the deformers flatten can't be inverted, keep their offset as it is
+        # the determinant scales with the cube of the matrix so compare it relative to its size
+        scale = numpy.linalg.norm(matrices.reshape(-1, 9), axis=1) ** 3
+        singular = numpy.abs(numpy.linalg.det(matrices)) <= SINGULAR_TOLERANCE * scale
+        if singular.any():
+            matrices[singular] = numpy.eye(3)
+            mc.warning('{} points on [ {} ] could not be inverted'.format(int(singular.sum()), base))
+
+        # offset = delta * matrix, so solve matrix^T * delta = offset for every point at once
+        deltas = numpy.linalg.solve(matrices.transpose(0, 2, 1), offsets[:, :, None])[:, :, 0]
+        setTargetDeltaArray(bs, target, deltas, indices)
+    finally:
+        mc.undoInfo(closeChunk=1)
+
+    return indices
 
@@ -3,6 +3,7 @@ This is the module that will house functions and classes that have to do with cl
 '''
 import maya.cmds as mc
 import openrig.shared.common
+import openrig.maya.shape as shape
 import openrig.maya.weights
 import openrig.maya.skinCluster
 import numpy
@@ -258,10 +259,8 @@ def convertClustersToSkinCluster(newSkinName, targetGeometry, clusterDeformerLis
             influenceList.append(joint)
             preMatrixNodeList.extend(preMatrixNode)
 
-            # Add jnt as influnce
-            mc.skinCluster(targetSkinCluster, e=True, ai=joint)
-            # Get index
-            index = openrig.maya.skinCluster.getInfIndex(targetSkinCluster, joint)
+            # Add jnt as influnce and get its index
+            index = openrig.maya.skinCluster.addInfluence(targetSkinCluster, joint)
             # Connect bindPreMatrixNode
             mc.connectAttr("{}.worldInverseMatrix[0]".format(preMatrixNode),
                            "{}.bindPreMatrix[{}]".format(targetSkinCluster, index), f=True)
@@ -280,10 +279,9 @@ def convertClustersToSkinCluster(newSkinName, targetGeometry, clusterDeformerLis
                 mc.connectAttr(sc + '.outputGeometry[0]', sc_out, f=1)
 
         # make sure we have the correct weights for the baseJnt
-        # Create a numpy array the length of the number of verts and assigning
+        # Create a numpy array the length of the number of points and assigning
         # a value of 1.0 to each index
-        # TODO: This can be simplified to baseJntArray = numpy.ones(mc.polyEvaluate(target, v=1))
-        baseJntArray = numpy.array([1.0 for id in mc.ls("{}.cp[*]".format(target), fl=True)])
+        baseJntArray = numpy.ones(len(shape.getPoints(target)))
 
         # Update the base joints weights by subtracting the curve joint weights
         for weights in weightList:
@@ -3,8 +3,31 @@ This is going to work on Maya sets in the scene.
 '''
 from collections import OrderedDict
 import maya.cmds as mc
+import openrig.shared.components as components
 import openrig.maya.data.maya_data as maya_data
 
+
+def flattenMembers(node):
+    '''
+    Returns the members of the set flattened the same way mc.ls(fl=True) does. Explicit index
+    ranges are expanded without Maya, components with "*" are still flattened by Maya.
+
+    :param node: objectSet you want the members of.
+    :type node: str
+
+    :return: Every member of the set.
+    :rtype: list
+    '''
+    member_list = list()
+    for member in mc.sets(node, q=True) or list():
+        if components.isComponent(member) and not components.isExpandable(member):
+            member_list.extend(mc.ls(member, fl=True))
+        else:
+            member_list.extend(components.flattenComponents(member))
+
+    return member_list
+
+
 class SetsData(maya_data.MayaData):
     '''
     This class is created to store and apply data for Maya sets.
@@ -31,7 +54,7 @@ class SetsData(maya_data.MayaData):
             raise RuntimeError("{} is not an objectSet that is used for sets.".format(node))
 
         # get the members of a set
-        member_list = mc.ls(mc.sets(node, q=True),fl=True)
+        member_list = flattenMembers(node)
         sets_type = mc.nodeType(node)
 
         # if no parent is passed, see if node is a member of another set.
@@ -76,7 +99,7 @@ class SetsData(maya_data.MayaData):
                 if not mc.objExists(node):
                     mc.sets(mc.ls(self._data[node]['members']), name=node)
                 else:
-                    member_list = mc.ls(mc.sets(node, q=True), fl=True)
+                    member_list = flattenMembers(node)
                     new_member_list = [member for member in mc.ls(self._data[node]['members']) if member not in member_list]
                     if new_member_list:
                         mc.sets(mc.ls(new_member_list), e=True, add=node)
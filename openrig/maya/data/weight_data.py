@@ -1,18 +1,78 @@
 '''
 This is going to work on Maya sets in the scene.
+
+Weight data can be written as json or as a binary file. The binary file is a small json header
+followed by the raw bytes of each array, so reading it only maps the file into memory and the
+bytes for a deformer aren't touched until that deformer's weights are applied.
+
+Binary layout:
+    magic (4 bytes) | version (uint32) | header size (uint64) | json header | padding | arrays
 '''
 from collections import OrderedDict
 import maya.cmds as mc
 import openrig.maya.data.maya_data as maya_data
 import openrig.maya.weights as weights
 import openrig.maya.weightObject as weightObject
-import openrig.maya.transform as tansform
 import openrig.shared.common as common
 import numpy
 import getpass
 from time import gmtime, strftime
 import json
 import os
+import struct
+
+# extension we write the binary format for by default
+BINARY_EXTENSION = '.wtsb'
+BINARY_MAGIC = 'ORWD'
+BINARY_VERSION = 1
+# arrays start on a multiple of this many bytes so they can be viewed straight from the map
+BINARY_ALIGNMENT = 64
+# keys in the header that stand in for an array stored in the data block
+BINARY_BLOCK_KEY = '__block__'
+
+
+def _isSameFile(filepath, otherPath):
+    '''
+    Check if two paths are the same file, no matter how the paths are written.
+    '''
+    if not filepath or not otherPath:
+        return False
+    return os.path.normcase(os.path.realpath(filepath)) == os.path.normcase(os.path.realpath(otherPath))
+
+
+def _toJson(value):
+    '''
+    Default for json.dumps so numpy arrays and numbers can be written out.
+    '''
+    if isinstance(value, numpy.ndarray):
+        return value.tolist()
+    if isinstance(value, numpy.generic):
+        return value.item()
+    raise TypeError('{} is not JSON serializable'.format(value))
+
+
+def _alignOffset(offset):
+    '''
+    Round the offset up to the next BINARY_ALIGNMENT bytes.
+    '''
+    return (offset + BINARY_ALIGNMENT - 1) // BINARY_ALIGNMENT * BINARY_ALIGNMENT
+
+
+def isBinary(filepath):
+    '''
+    Check if the file is a binary weight data file.
+
+    :param filepath: The path to the file you want to check.
+    :type filepath: str
+
+    :return: True if the file is in the binary format
+    :rtype: bool
+    '''
+    if not os.path.isfile(filepath):
+        return False
+    with open(filepath, 'rb') as f:
+        return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
 
 class WeightData(maya_data.MayaData):
     '''
@@ -24,7 +84,7 @@ class WeightData(maya_data.MayaData):
         '''
         super(WeightData, self).__init__()
 
-    def gatherData(self, node, geometry=None):
+    def gatherData(self, node, geometry=None, sparse=False):
         '''
         This will gather the data for a given deformer. If the geometry argument is used, then we will only
         get the data for that geometry
@@ -33,61 +93,124 @@ class WeightData(maya_data.MayaData):
         :type node: str
         :param geometry: The geometry you want to gather deformer information for.
         :type geometry: str
+        :param sparse: Store only the non zero weights. Files written this way can't be read by
+                       versions that don't know about sparse weights.
+        :type sparse: bool
         '''
-        super(WeightData, self).gatherData(node)
-
-        weight_object = weights.getWeights(node, geometry=geometry)
-        data = OrderedDict()
-        # get the geometry
-        if geometry:
-            if not mc.objExists(geometry):
-                raise RuntimeError("{} doesn't exists in the current Maya session!".format(geometry))
-            # make sure we have the shape of the geometry for all deformers except the skinCluster
-            geoDagPath = tansform.getDagPath(geometry)
-            geoDagPath.extendToShape()
-            geometryFullPath = geoDagPath.fullPathName()
-        else:
-            # get the geometry and the iterator to use for looping through the mesh points for wts.
-            geometry = mc.deformer(node, q=True, g=True)[0]
-            geoDagPath = tansform.getDagPath(geometry)
-            geoDagPath.extendToShape()
+        self.gatherDataIterate([(node, geometry)], sparse=sparse)
 
-        data['shape'] = geoDagPath.partialPathName()
-        data['maps'] = weight_object.getMaps() or ['envelope']
-        data['weights'] = numpy.array(weight_object.getWeights()).tolist()#[list(wts) for wts in ]
-        self._data[node].update(data)
+    def gatherDataIterate(self, items, sparse=False):
+        '''
+        This will gather the data for a list of deformers. The weights are queried in one batch so
+        each geometry is only resolved once.
+
+        :param items: Deformer names or (deformer, geometry) pairs.
+        :type items: list | tuple
+        :param sparse: Store only the non zero weights. Files written this way can't be read by
+                       versions that don't know about sparse weights.
+        :type sparse: bool
+        '''
+        geometry_cache = dict()
+        weight_object_list = weights.getWeightsBatch(items, cache=geometry_cache)
+        for item, weight_object in zip(items, weight_object_list):
+            node, geometry = (item, None) if isinstance(item, basestring) else item
+            super(WeightData, self).gatherData(node)
 
+            data = OrderedDict()
+            data['shape'] = weights.getGeometryInfo(node, geometry, geometry_cache)[1]
+            data['maps'] = weight_object.getMaps() or ['envelope']
+            if sparse:
+                sparse_object = weightObject.SparseWeightObject(weights=weight_object.getArray())
+                data['pointCount'] = sparse_object.getPointCount()
+                data['indptr'] = sparse_object.getIndptr()
+                data['indices'] = sparse_object.getIndices()
+                data['values'] = sparse_object.getValues()
+            else:
+                # a row per map, getArray pads maps that are shorter than the others
+                data['weights'] = numpy.array(weight_object.getArray().T)
+            self._data[node].update(data)
 
     def read(self, filepath):
         '''
         This is overloading the default bahavior of load since we need to convert data after we load it.
+        Binary files are memory mapped so the arrays are read from disk only when they're used.
 
         :param filepath: The path to the file you're trying to load
         :type filepath: str
         '''
+        if isBinary(filepath):
+            return self._readBinary(filepath)
+
         super(WeightData, self).read(filepath)
 
         for node in self._data:
+            if 'indptr' in self._data[node]:
+                for key, dtype in [('indptr', numpy.int64), ('indices', numpy.int32), ('values', numpy.float64)]:
+                    self._data[node][key] = numpy.array(self._data[node][key], dtype=dtype)
+                continue
             self._data[node]['weights'] = weightObject.WeightObject(weights=self._data[node]['weights']).getWeights()
 
-    def write(self, filepath, createDirectory=True):
+        return self._data
+
+    def _readBinary(self, filepath):
         '''
-        This will write a dictionary of information out to disc in .json format.
+        Read the header of a binary weight file and map the arrays from the file.
+
+        :param filepath: The path to the file you're trying to load
+        :type filepath: str
+        '''
+        with open(filepath, 'rb') as f:
+            f.read(len(BINARY_MAGIC))
+            version, header_size = struct.unpack('<IQ', f.read(12))
+            if version > BINARY_VERSION:
+                raise RuntimeError('{} was written with a newer version ({}) of the weight format.'.format(filepath,
+                                                                                                        version))
+            header = json.loads(f.read(header_size).decode('utf-8'), object_pairs_hook=OrderedDict)
+
+        # one map for the whole file, every array is a view into it
+        file_map = numpy.memmap(filepath, dtype=numpy.uint8, mode='r')
+        data_start = header['dataStart']
+        data = common.convertDictKeys(header['data'])
+        for node in data:
+            for key, value in data[node].items():
+                if not isinstance(value, dict) or BINARY_BLOCK_KEY not in value:
+                    continue
+                dtype, shape, offset = value[BINARY_BLOCK_KEY]
+                dtype = numpy.dtype(str(dtype))
+                start = data_start + offset
+                end = start + int(numpy.prod(shape)) * dtype.itemsize
+                array = file_map[start:end].view(dtype).reshape(shape)
+                # dense weights are stored as (maps, points), we keep a list with an array per map
+                data[node][key] = list(array) if key == 'weights' else array
+
+        self._filepath = filepath
+        self._data = data
+        return self._data
+
+    def write(self, filepath, createDirectory=True, binary=None, dtype=None):
+        '''
+        This will write a dictionary of information out to disc in .json format or in the binary format.
 
         :param data: This is the dictionary of info you want to write out.
         :type data: dict | orderedDict
 
         :param filepath: The path to the file you wish to write.
+
+        :param binary: Write the binary format. If None, we write binary when the file ends with BINARY_EXTENSION.
+        :type binary: bool
+
+        :param dtype: Type to write the weights as in the binary format. numpy.float32 halves the file size.
+                      If None we keep the type of the data.
+        :type dtype: numpy.dtype
         '''
         if not isinstance(self._data, (dict, OrderedDict)):
             raise TypeError("The data must be passed in as a dictionary.")
+        if binary is None:
+            binary = filepath.endswith(BINARY_EXTENSION)
         # writeData is user specific just on export
         writeData = OrderedDict(user=getpass.getuser(),
                                 type= self.__class__.__name__,
                                 time=strftime("%Y-%m-%d %H:%M:%S", gmtime()))
-        writeData['data'] = self._data
-        # dump data to json format and write it out to disk.
-        data = json.dumps(writeData)
 
         # Create directory if needed
         directory = os.path.dirname(filepath)
@@ -96,14 +219,86 @@ class WeightData(maya_data.MayaData):
                 print('making directory', directory)
                 os.makedirs(directory, 755)
 
-        # Write
-        f = open(filepath, 'w')
-        f.write(data)
-        f.close()
+        if binary:
+            self._writeBinary(filepath, writeData, dtype)
+        else:
+            writeData['data'] = self._data
+            # dump data to json format and write it out to disk.
+            data = json.dumps(writeData, default=_toJson)
+
+            # Write
+            f = open(filepath, 'w')
+            f.write(data)
+            f.close()
 
         # set a new filepath on the class.
         self._filepath = filepath
 
+    def _writeBinary(self, filepath, writeData, dtype=None):
+        '''
+        Write the data as a json header followed by the raw bytes of every array.
+
+        :param filepath: The path to the file you wish to write.
+        :type filepath: str
+
+        :param writeData: The header information without the data.
+        :type writeData: OrderedDict
+
+        :param dtype: Type to write the float arrays as. If None we keep the type of the data.
+        :type dtype: numpy.dtype
+        '''
+        header_data = OrderedDict()
+        array_list = list()
+        offset = 0
+        for node in self._data:
+            header_data[node] = OrderedDict()
+            for key, value in self._data[node].items():
+                if key in ('weights', 'indptr', 'indices', 'values'):
+                    value = numpy.asarray(value)
+                if not isinstance(value, numpy.ndarray):
+                    header_data[node][key] = value
+                    continue
+                # object arrays would be written as pointers
+                if value.dtype.kind not in 'biuf':
+                    raise TypeError('{}.{} is a {} array, only numeric arrays can be written to a binary file.'.format(
+                        node, key, value.dtype))
+                if dtype is not None and value.dtype.kind == 'f':
+                    value = value.astype(dtype)
+                # copy the array if it's mapped from the file we're about to overwrite so the map can be released
+                if _isSameFile(filepath, self._filepath):
+                    value = numpy.array(value)
+                    self._data[node][key] = list(value) if key == 'weights' else value
+                offset = _alignOffset(offset)
+                header_data[node][key] = {BINARY_BLOCK_KEY: [value.dtype.str, list(value.shape), offset]}
+                array_list.append((offset, value))
+                offset += value.nbytes
+        writeData['data'] = header_data
+
+        # the data starts after the header so we need to know how big the header is first
+        prefix_size = len(BINARY_MAGIC) + 12
+        writeData['dataStart'] = 0
+        header_size = len(json.dumps(writeData, default=_toJson))
+        while True:
+            writeData['dataStart'] = _alignOffset(prefix_size + header_size)
+            header = json.dumps(writeData, default=_toJson)
+            if len(header) == header_size:
+                break
+            header_size = len(header)
+
+        # write next to the file and move it into place so a file that is still mapped is never truncated
+        temp_path = filepath + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(BINARY_MAGIC)
+            f.write(struct.pack('<IQ', BINARY_VERSION, len(header)))
+            f.write(header)
+            for array_offset, array in array_list:
+                f.write('\0' * (writeData['dataStart'] + array_offset - f.tell()))
+                f.write(numpy.ascontiguousarray(array).tostring())
+        # rename won't replace a file on Windows
+        if os.name == 'nt' and os.path.isfile(filepath):
+            os.remove(filepath)
+        os.rename(temp_path, filepath)
+
     def applyData(self, nodes):
         '''
         Applies the data for the given nodes.
@@ -117,5 +312,12 @@ class WeightData(maya_data.MayaData):
             # check to make sure the node we're looking for exist in the data
             if self._data.has_key(node):
                 map_list = [map for map in self._data[node]['maps'] if map !='envelope']
-                weight_object = weightObject.WeightObject(maps=map_list, weights=self._data[node]['weights'])
+                if 'indptr' in self._data[node]:
+                    weight_object = weightObject.SparseWeightObject(maps=map_list)
+                    weight_object.setSparseWeights(self._data[node]['indptr'],
+                                                   self._data[node]['indices'],
+                                                   self._data[node]['values'],
+                                                   len(self._data[node]['maps']))
+                else:
+                    weight_object = weightObject.WeightObject(maps=map_list, weights=self._data[node]['weights'])
                 weights.setWeights(node, weights=weight_object, geometry=self._data[node]['shape'])
\ No newline at end of file
@@ -14,6 +14,7 @@ poseControl - Attributes whose values are stored for a giving pose. (Maya=driver
 
 import maya.cmds as mc
 import maya.mel as mm
+import maya.api.OpenMaya as om2
 import math
 
 '''     Logging levels
@@ -27,6 +28,7 @@ import math
 import openrig.maya.deformer as rig_deformer
 import openrig.shared.common as rig_common
 import openrig.maya.blendShape as rig_blendShape
+import openrig.maya.symmetry as rig_symmetry
 import logging
 import numpy
 logger_level = logging.DEBUG
@@ -290,16 +292,9 @@ def getPoseShapeIndex(interp, pose):
         return(index)
 
 def getTargetShapeIndex(target, bs):
-    targetCount = mc.blendShape(bs, q=1, target=1, wc=1)
-    i = 0
-    n = 0
-    while n < targetCount:
-        alias = mc.aliasAttr(bs + '.w[{}]'.format(i), q=1)
-        if alias == target:
-            return i
-        if alias:
-            n += 1
-        i += 1
+    index = rig_blendShape.getTargetIndex(bs, target)
+    if index != -1:
+        return index
 
 def getDrivers(interp):
     drivers = mc.poseInterpolator(interp, q=1, drivers=1) or list()
@@ -679,6 +674,7 @@ def addShape(interp, pose, bs=None):
 
     shapeIndex = mm.eval('doBlendShapeAddTarget("{bs}", 1, 1, "", 0, 0, {{}})'.format(bs=bs))[0]
     mc.aliasAttr(pose, bs+'.w[{index}]'.format(index=shapeIndex))
+    rig_blendShape.clearTargetAliasCache(bs)
 
     poseIndex = getPoseIndex(interp, pose)
     mc.connectAttr(interp+'.output[{}]'.format(poseIndex), bs+'.w[{}]'.format(shapeIndex))
@@ -693,6 +689,7 @@ def remShape(interp, pose, bs=None):
 
     shapeIndex = mm.eval('doBlendShapeAddTarget("{bs}", 1, 1, "", 0, 0, {{}})'.format(bs=bs))[0]
     mc.aliasAttr(pose, bs+'.w[{index}]'.format(index=shapeIndex))
+    rig_blendShape.clearTargetAliasCache(bs)
 
     poseIndex = getPoseIndex(interp, pose)
     mc.connectAttr(interp+'.output[{}]'.format(poseIndex), bs+'.w[{}]'.format(shapeIndex))
@@ -1221,35 +1218,93 @@ def getInterpNiceName(interp):
 def getPoseNiceName(pose):
     pass
 
-def mirrorDelta(interp, pose):
-    # Get Deltas
-    bs = getDeformer(interp)
-    index = getPoseShapeIndex(interp, pose)
-    mirror_pose = rig_common.getMirrorName(pose) or pose
-    mirror_interp = rig_common.getMirrorName(interp) or interp
-    mirror_index = getPoseShapeIndex(mirror_interp, mirror_pose)
+def mirrorDelta(interp, pose, posVector=(-1, 1, 1), centerEdge=None):
+    '''
+    Mirror the deltas of a pose's shape to its mirror pose with the symmetry map of the geometry.
+    A center pose is mirrored onto itself from the positive side, any other pose is flipped into
+    its mirror pose. A pose on a left or right interpolator also takes its map weights across.
 
-    deltas, indices = rig_blendShape.getTargetDeltas(bs, index)
-    if not deltas:
-        return
+    :param interp: Interpolator
+    :param pose: pose
+    :param posVector: Direction you want to mirror.
+    :param centerEdge: Edge on the line of symmetry to build the symmetry map from the topology.
+                       If None the map is built by position.
+    :return: None
+    '''
+    mirrorDeltas([(interp, pose)], posVector, centerEdge=centerEdge)
+
+def mirrorDeltas(interp_pose_list, posVector=(-1, 1, 1), centerEdge=None):
+    '''
+    Mirror the deltas of many poses. The symmetry map and rest points are looked up once for each
+    blendShape and every target is read and written once.
+
+    ..example ::
+         mirrorDeltas([(interp, pose) for pose in getPoseNames(interp)])
+
+    :param interp_pose_list: List of (interp, pose) tuples
+    :param posVector: Direction you want to mirror.
+    :param centerEdge: Edge on the line of symmetry to build the symmetry map from the topology.
+                       If None the map is built by position.
+    :return: None
+    '''
+    axis_list = [i for i, value in enumerate(posVector) if value < 0]
+    if not axis_list:
+        raise ValueError('posVector {} has no negative axis to mirror across.'.format(posVector))
+    axis = axis_list[0]
+    symmetry_data = dict()
+    # one undo for every pose
+    mc.undoInfo(openChunk=1)
+    try:
+        for interp, pose in interp_pose_list:
+            bs = getDeformer(interp)
+            index = getPoseShapeIndex(interp, pose)
+            mirror_pose = rig_common.getMirrorName(pose) or pose
+            mirror_interp = rig_common.getMirrorName(interp) or interp
+            mirror_index = getPoseShapeIndex(mirror_interp, mirror_pose)
+            if not bs or index is None:
+                continue
+            if mirror_index is None:
+                mc.warning('mirror pose [ {} ] [ {} ] does not exist, skipping [ {} ] [ {} ]'.format(mirror_interp,
+                                                                                                      mirror_pose,
+                                                                                                      interp, pose))
+                continue
+
+            deltas, indices = rig_blendShape.getTargetDeltaArray(bs, index)
+            if not len(indices):
+                continue
+
+            # the map is cached by rig_symmetry but hashing the mesh every pose adds up on big rigs.
+            # deltas are in object space so we mirror across the object space rest points.
+            if bs not in symmetry_data:
+                geo = mc.deformer(bs, q=1, geometry=1)[0]
+                mirror_map = rig_symmetry.getSymmetryMap(geo, posVector, centerEdge=centerEdge,
+                                                         space=om2.MSpace.kObject)[0]
+                points = rig_symmetry.getMeshData(geo, om2.MSpace.kObject)[0]
+                symmetry_data[bs] = (mirror_map, points[:, axis] > 0)
+            mirror_map, source_mask = symmetry_data[bs]
+
+            # Center interp mirror
+            if interp == mirror_interp and pose == mirror_pose:
+                deltas, indices = rig_symmetry.mirrorDeltas(deltas, indices, len(mirror_map), mirror_map,
+                                                            posVector, sourceMask=source_mask)
+                rig_blendShape.setTargetDeltaArray(bs, mirror_index, deltas, indices)
+                print('Center mirror deltas: [ {} ] [ {} ]'.format(interp, pose))
+                continue
+
+            # Flip to the mirror pose, on a center interp or from left to right
+            deltas, indices = rig_symmetry.mirrorDeltas(deltas, indices, len(mirror_map), mirror_map, posVector)
+            rig_blendShape.setTargetDeltaArray(bs, mirror_index, deltas, indices)
+            if interp == mirror_interp:
+                # the map weights of a flipped center pose are left as they are
+                print('Flipped deltas: [ {} ] [ {} ]'.format(interp, mirror_pose))
+                continue
 
-    # Center interp mirror
-    if interp == mirror_interp and pose == mirror_pose:
-        rig_blendShape.setTargetDeltas(bs, deltas, indices, mirror_index)
-        mc.blendShape(bs, e=True, mt=(0, mirror_index), ss=1, sa='x')
-        print('Center mirror deltas: [ {} ] [ {} ]'.format(interp, pose))
-
-    # Center interp flip
-    if interp == mirror_interp and pose != mirror_pose:
-        rig_blendShape.setTargetDeltas(bs, deltas, indices, mirror_index)
-        mc.blendShape(bs, e=True, ft=(0, mirror_index), ss=1, sa='x')
-        print('Flipped deltas: [ {} ] [ {} ]'.format(interp, mirror_pose))
-
-    # Left to right interp mirror
-    if interp != mirror_interp and pose != mirror_pose:
-        rig_blendShape.clearTargetDeltas(bs, mirror_index)
-        rig_blendShape.setTargetDeltas(bs, deltas, indices, mirror_index)
-        values = rig_blendShape.getTargetMapWeights(bs, mirror_pose)
-        mc.blendShape(bs, e=True, ft=(0, mirror_index), ss=1, sa='x')
-        rig_blendShape.setTargetMapWeights(bs, mirror_pose, values)
-        print('Left/Right mirrored deltas: [ {} ] [ {} ]'.format(mirror_interp, mirror_pose))
+            weights = rig_blendShape.getTargetMapWeights(bs, index, default_value=1)
+            if weights != -1:
+                rig_blendShape.setTargetMapWeights(bs, mirror_index, numpy.asarray(weights)[mirror_map].tolist())
+            elif rig_blendShape.getTargetMapWeights(bs, mirror_index, default_value=1) != -1:
+                # the source was never painted so the mirror goes back to the default weights
+                rig_blendShape.setTargetMapWeights(bs, mirror_index, [1.0] * len(mirror_map))
+            print('Left/Right mirrored deltas: [ {} ] [ {} ]'.format(mirror_interp, mirror_pose))
+    finally:
+        mc.undoInfo(closeChunk=1)
@@ -166,18 +166,10 @@ def convertWiresToSkinCluster(newSkinName, targetGeometry, wireDeformerList, kee
             for jnt, preMatrixNode in zip(curveSkinInfluenceList, curveSkinPreMatrixNodes):
                 # create a temp influence we will use to connect the curveSkin to
                 tempInf = mc.duplicate(jnt, po=1)[0]
-                # get the connections through the worldMatrix connection
-                matrixCon = mc.listConnections(jnt+'.worldMatrix[0]', p=1, d=1, s=0)
                 # Get inf index
-                # TODO: This should just use
-                # TODO: openrig.maya.skinCluster.getInfIndex(targetSkinCluster, jnt)
-                infIndex = None
-                for con in matrixCon:
-                    node = con.split('.')[0]
-                    if node == curveSkin:
-                        infIndex = con.split('[')[1].split(']')[0]
+                infIndex = openrig.maya.skinCluster.getInfIndex(curveSkin, jnt)
                 # Yank
-                if infIndex:
+                if infIndex is not None:
                     # connect the temp influence
                     mc.connectAttr(tempInf+'.worldMatrix[0]', curveSkin+'.matrix[{}]'.format(infIndex), f=1)
                     # move the influence
@@ -242,10 +234,8 @@ def convertWiresToSkinCluster(newSkinName, targetGeometry, wireDeformerList, kee
 
         # Add curve joints as influces to targetSkinCluster and hook up bindPreMatrix nuls
         for jnt, preMatrixNode in zip(influenceList,preMatrixNodeList):
-            # Add jnt as influnce
-            mc.skinCluster(targetSkinCluster, e=1, ai=jnt)
-            # Get index
-            index = openrig.maya.skinCluster.getInfIndex(targetSkinCluster, jnt)
+            # Add jnt as influnce and get its index
+            index = openrig.maya.skinCluster.addInfluence(targetSkinCluster, jnt)
             # Connect bindPreMatrixNode
             mc.connectAttr("{}.worldInverseMatrix[0]".format(preMatrixNode), "{}.bindPreMatrix[{}]".format(targetSkinCluster, index), f=True)
 
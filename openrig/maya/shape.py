@@ -3,6 +3,7 @@ This module is for dealing with shape nodes in Maya
 '''
 import maya.cmds as mc
 import maya.mel as mm
+import maya.api.OpenMaya as om2
 import numpy
 from openrig.maya import attr
 from openrig.maya import hierarchy
@@ -240,7 +241,92 @@ def nukeHistory(objects, keepTransforms=False, keepAttrs=False, keepUVs=False):
     mc.select(objects)
 
 
-def getDeltas(base, target): 
+# points that move less than this are not counted as changed
+DELTA_TOLERANCE = 1e-5
+# component used to name a single point for each shape type
+POINT_COMPONENTS = {'mesh': 'vtx', 'nurbsCurve': 'cv', 'lattice': 'pt'}
+
+
+def getPoints(geometry, space=om2.MSpace.kObject):
+    '''
+    Get the points of the geometry in one call.
+
+    :param geometry: Geometry you want the points for. Can be the transform or the shape.
+    :type geometry: str
+
+    :param space: Space to get the points in.
+    :type space: int
+
+    :returns: Array with a row of x, y, z for each point
+    :rtype: numpy.ndarray
+    '''
+    selList = om2.MSelectionList()
+    selList.add(geometry)
+    dagPath = selList.getDagPath(0)
+    dagPath.extendToShape()
+    points = om2.MItGeometry(dagPath).allPositions(space)
+
+    return numpy.array(points, dtype=numpy.float64).reshape(-1, 4)[:, :3]
+
+
+def getOrigShape(geometry):
+    '''
+    Get the rest shape for the geometry. This will be the Orig shape if it has one,
+    otherwise it's the shape of the geometry.
+
+    :param geometry: Name of the geometry
+    :type geometry: str
+
+    :return: Full path to the shape we should use for the rest points.
+    :rtype: str
+    '''
+    selList = om2.MSelectionList()
+    selList.add(geometry)
+    dagPath = selList.getDagPath(0)
+    dagPath.extendToShape()
+    geometryFullPath = dagPath.fullPathName()
+    if mc.objExists('{}Orig'.format(geometryFullPath)):
+        return mc.ls('{}Orig'.format(geometryFullPath), l=True)[0]
+
+    return geometryFullPath
+
+
+def getPointDeltas(base, target, tolerance=DELTA_TOLERANCE, deformed=False):
+    '''
+    Get the object space deltas from base to target for the points that have moved. The deltas
+    are from the rest (Orig) shape of the base, the shape a blendShape added to the base would
+    deform, unless you ask for the deformed points.
+
+    :param base: Base object
+    :type base: str
+
+    :param target: Target object
+    :type target: str
+
+    :param tolerance: Points that move less than this on every axis are treated as unchanged.
+    :type tolerance: float
+
+    :param deformed: Measure from the deformed points of the base instead of its rest shape.
+    :type deformed: bool
+
+    :returns: deltas with a row of x, y, z for each changed point, indices of the changed points
+    :rtype: tuple
+    '''
+    if not mc.objExists(base) or not mc.objExists(target):
+        raise RuntimeError("Either {} or {} doesn't exist in the current Maya session".format(base, target))
+
+    base_points = getPoints(base if deformed else getOrigShape(base))
+    target_points = getPoints(target)
+    if len(base_points) != len(target_points):
+        raise RuntimeError("{} and {} don't have the same number of points".format(base, target))
+
+    deltas = target_points - base_points
+    indices = numpy.flatnonzero(numpy.any(numpy.abs(deltas) > tolerance, axis=1))
+
+    return deltas[indices], indices
+
+
+def getDeltas(base, target):
     '''
     Get deltas between two shapes. This will return the magnitude which will be the difference
     between the two points.
@@ -254,38 +340,12 @@ def getDeltas(base, target):
     :returns: List of deltas in the order of point index
     :rtype: list
     '''
-    if not mc.objExists(base) or not mc.objExists(target):
-        raise RuntimeError("Either {} or {} doesn't exist in the current Maya session".format(base, target))
-     
-    bs = mc.blendShape(target, base, w=[0, 1])[0] 
-    mc.pointPosition(base+'.vtx[0]') # Enforce refresh
-    delta_list = mc.getAttr(bs+'.it[0].itg[0].iti[6000].ipt')
-    index_list = mc.getAttr(bs+'.it[0].itg[0].iti[6000].ict')                                
-    mc.delete(bs)
-    if not index_list:
+    deltas, indices = getPointDeltas(base, target)
+    if not len(indices):
         return([])
- 
-    # =============================================== 
-    # Point array 
-    # =============================================== 
-
-    count = len(index_list) 
-    index_flat_list = list() 
-    for n in index_list: 
-        index_flat_list.append(target+'.'+n) 
-     
-    index_flat_list = mc.ls(index_flat_list, fl=1) 
-    index_only_list = list() 
-     
-    for n in index_flat_list: 
-        index_only_list.append(int(n.split('[')[1][:-1])) 
-     
-    # =============================================== 
-    # Weight array 
-    # ===============================================     
-    weight_list = numpy.zeros(len(mc.ls("{}.cp[*]".format(target),fl=True)), dtype=float)                      
-    for n in range(len(index_flat_list)): 
-        weight_list[index_only_list[n]] = round(delta_list[n][0], 4)
+
+    weight_list = numpy.zeros(len(getPoints(target)), dtype=float)
+    weight_list[indices] = numpy.round(deltas[:, 0], 4)
 
     return weight_list
 
@@ -307,24 +367,9 @@ def getDeltaIndices(base, target, objName=False):
     :returns: List of indices
     :rtype: list
     '''
-    if not mc.objExists(base) or not mc.objExists(target):
-        raise RuntimeError("Either {} or {} doesn't exist in the current Maya session".format(base, target))
-
-    bs = mc.blendShape(target, base, w=[0, 1])[0]
-    mc.pointPosition(base+'.vtx[0]')  # Enforce refresh
-    index_list = mc.getAttr(bs+'.it[0].itg[0].iti[6000].ict')
-    mc.delete(bs)
-
-    # ===============================================
-    # Flatten and return only indices
-    # ===============================================
-
-    if not index_list:
-        return []
-    index_flat_list = [target+'.'+x for x in index_list]
-    index_flat_list = mc.ls(index_flat_list, fl=1)
+    indices = getPointDeltas(base, target)[1].tolist()
     if objName:
-        return index_flat_list
-    index_only_list = [int(x.split('[')[1][:-1]) for x in index_flat_list]
+        component = POINT_COMPONENTS.get(getType(target), 'cp')
+        return ['{}.{}[{}]'.format(target, component, index) for index in indices]
 
-    return index_only_list
+    return indices
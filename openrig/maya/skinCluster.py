@@ -2,8 +2,19 @@
 This module is for dealing with skinClusters inside Maya
 '''
 import maya.cmds as mc
+import maya.api.OpenMaya as om2
+import maya.api.OpenMayaAnim as oma2
+import numpy
 from openrig.shared import common
+import openrig.maya.shape as rig_shape
+import openrig.maya.apiUndo as apiUndo
 
+# skinCluster name -> (MObjectHandle, matrix indices, {influence: index}). Cleared by
+# clearInfluenceIndexCache, addInfluence and removeInfluence.
+_INFLUENCE_INDEX_CACHE = dict()
+# number of weights copied between numpy and the API arrays at a time, so the whole weight
+# matrix is never turned into one python list
+WEIGHT_CHUNK_SIZE = 2 ** 18
 
 def localize(skinClusters, transform):
     """
@@ -28,33 +39,34 @@ def localize(skinClusters, transform):
             transform = geoTransform
         if not infs:
             return()
+        indexMap = getInfluenceIndexMap(skinCluster)
         for inf in infs:
-            connection = mc.listConnections(inf+'.worldMatrix[0]', p=1, type='skinCluster')
-            for con in connection:
-                if skinCluster == con.split('.')[0]:
-                    index = con.split('[')[1].split(']')[0]
-
-                    # Handle bind pre matrix
-                    preMatrixAttr = '{0}.bindPreMatrix[{1}]'.format(skinCluster, index)
-                    preMatrixCon = mc.listConnections(preMatrixAttr, p=1)
-
-                    # If a bind preMatrix connections is found just make
-                    # sure the geom matrix is connected to the main transform and continue
-                    if preMatrixCon:
-                        if not mc.isConnected(transform+'.worldMatrix[0]', skinCluster+'.geomMatrix'):
-                            mc.connectAttr(transform+'.worldMatrix[0]', skinCluster+'.geomMatrix', f=1)
-                        continue
-
-                    multMatrix = '{}__{}_localizeMatrix'.format(inf, skinCluster)
-                    if not mc.objExists(multMatrix):
-                        multMatrix = mc.createNode('multMatrix', n=multMatrix)
-                        mc.setAttr(multMatrix+'.isHistoricallyInteresting', 0)
-                    if not mc.isConnected(inf+'.worldMatrix[0]', multMatrix+'.matrixIn[1]'):
-                        mc.connectAttr(inf+'.worldMatrix[0]', multMatrix+'.matrixIn[1]', f=1)
-                    if not mc.isConnected(transform+'.worldInverseMatrix[0]', multMatrix+'.matrixIn[2]'):
-                        mc.connectAttr(transform+'.worldInverseMatrix[0]', multMatrix+'.matrixIn[2]', f=1)
-                    if not mc.isConnected(multMatrix+'.matrixSum', con):
-                        mc.connectAttr(multMatrix+'.matrixSum', con, f=1)
+            index = indexMap.get(inf)
+            if index is None:
+                continue
+            con = '{0}.matrix[{1}]'.format(skinCluster, index)
+
+            # Handle bind pre matrix
+            preMatrixAttr = '{0}.bindPreMatrix[{1}]'.format(skinCluster, index)
+            preMatrixCon = mc.listConnections(preMatrixAttr, p=1)
+
+            # If a bind preMatrix connections is found just make
+            # sure the geom matrix is connected to the main transform and continue
+            if preMatrixCon:
+                if not mc.isConnected(transform+'.worldMatrix[0]', skinCluster+'.geomMatrix'):
+                    mc.connectAttr(transform+'.worldMatrix[0]', skinCluster+'.geomMatrix', f=1)
+                continue
+
+            multMatrix = '{}__{}_localizeMatrix'.format(inf, skinCluster)
+            if not mc.objExists(multMatrix):
+                multMatrix = mc.createNode('multMatrix', n=multMatrix)
+                mc.setAttr(multMatrix+'.isHistoricallyInteresting', 0)
+            if not mc.isConnected(inf+'.worldMatrix[0]', multMatrix+'.matrixIn[1]'):
+                mc.connectAttr(inf+'.worldMatrix[0]', multMatrix+'.matrixIn[1]', f=1)
+            if not mc.isConnected(transform+'.worldInverseMatrix[0]', multMatrix+'.matrixIn[2]'):
+                mc.connectAttr(transform+'.worldInverseMatrix[0]', multMatrix+'.matrixIn[2]', f=1)
+            if not mc.isConnected(multMatrix+'.matrixSum', con):
+                mc.connectAttr(multMatrix+'.matrixSum', con, f=1)
 
 def removeLocalize(skinClusters):
     """
@@ -172,7 +184,7 @@ def transferSkinCluster(source, target, surfaceAssociation="closestPoint", norma
             # make sure that both skinClusters have the same influences
             if not meshInfs == sourceInfs:
                 for inf in set(sourceInfs).difference(set(meshInfs)):
-                    mc.skinCluster(hist[0], e=True, ai=inf)
+                    addInfluence(hist[0], inf)
             # add the influences that are missing from the skinCluster
             skinClusterList.append(hist[0])
 
@@ -186,18 +198,483 @@ def transferSkinCluster(source, target, surfaceAssociation="closestPoint", norma
 
     return skinClusterList
 
-def getInfIndex(sc, inf):
-    con = mc.listConnections(inf+'.worldMatrix[0]')
-    con_attr = mc.listConnections(inf+'.worldMatrix[0]', type='skinCluster', p=1)
-    if not con:
-        return
-    for c, attr in zip(con, con_attr):
-        if c == sc:
-            index = common.getIndex(attr)
+def getInfluenceIndexMap(sc):
+    """
+    This will return a dictionary of influence names and their logical index in the matrix
+    attribute of the skinCluster. The map is cached and only rebuilt when the node is deleted or
+    renamed, or the indices in the matrix attribute change, like when influences are added or
+    removed with the skinCluster tools or by undo. If you swap the influence connected to an
+    existing index, call clearInfluenceIndexCache afterwards.
+
+    :param sc: The skinCluster you want the influence indices for.
+    :type sc: str
+
+    :returns: Dictionary of {influence: index}
+    :rtype: dict
+    """
+    # the handle tells us if the node was deleted or renamed without touching the DG and the
+    # matrix indices tell us if influences were added or removed without listing the connections
+    if sc in _INFLUENCE_INDEX_CACHE:
+        handle, matrixIndices, indexMap = _INFLUENCE_INDEX_CACHE[sc]
+        if (handle.isValid() and om2.MFnDependencyNode(handle.object()).name() == sc and
+                _getMatrixIndices(sc) == matrixIndices):
+            return dict(indexMap)
+
+    if not mc.objExists(sc):
+        raise RuntimeError("{} doesn't exist in the current Maya session.".format(sc))
+
+    selList = om2.MSelectionList()
+    selList.add(sc)
+    node = selList.getDependNode(0)
+    connections = mc.listConnections('{}.matrix'.format(sc), s=True, d=False, c=True) or list()
+
+    indexMap = dict()
+    # every influence is connected to lockWeights as well as matrix. When the skinCluster is
+    # localized the matrix comes from a multMatrix, so for those indices we use the influence
+    # connected to lockWeights instead.
+    localized = set(mc.ls(connections[1::2], type='multMatrix') or list())
+    if localized:
+        lockConnections = mc.listConnections('{}.lockWeights'.format(sc), s=True, d=False, c=True) or list()
+        for plug, inf in zip(lockConnections[::2], lockConnections[1::2]):
+            indexMap[inf] = int(common.getIndex(plug))
+    for plug, inf in zip(connections[::2], connections[1::2]):
+        if inf in localized:
+            continue
+        indexMap[inf] = int(common.getIndex(plug))
+
+    _INFLUENCE_INDEX_CACHE[sc] = (om2.MObjectHandle(node), _getMatrixIndices(sc), indexMap)
+
+    return dict(indexMap)
+
+def _getMatrixIndices(sc):
+    """
+    The logical indices in the matrix attribute of the skinCluster. This is what we check the
+    cached influence index map against.
+    """
+    return tuple(mc.getAttr('{}.matrix'.format(sc), mi=True) or list())
+
+def clearInfluenceIndexCache(sc=None):
+    """
+    This will remove the cached influence index map for the skinCluster so it gets rebuilt
+    the next time it's used. If no skinCluster is passed we clear the whole cache.
+
+    :param sc: The skinCluster you want to clear the cache for.
+    :type sc: str
+    """
+    if sc is None:
+        _INFLUENCE_INDEX_CACHE.clear()
+    else:
+        _INFLUENCE_INDEX_CACHE.pop(sc, None)
+
+def addInfluence(sc, influence, **kwargs):
+    """
+    This will add the influence to the skinCluster and return the index it was connected to.
+    The index comes from the new matrix connection and is added to the cached influence index
+    map, so adding influences in a loop doesn't rebuild the map after every one.
+
+    :param sc: The skinCluster you want to add the influence to.
+    :type sc: str
+
+    :param influence: The influence you want to add.
+    :type influence: str
+
+    :param kwargs: Any other flags to pass to mc.skinCluster, like wt or lw.
+
+    :returns: The index of the influence in the matrix attribute of the skinCluster.
+    :rtype: int
+    """
+    mc.skinCluster(sc, e=True, ai=influence, **kwargs)
+
+    plugs = mc.listConnections('{}.worldMatrix'.format(influence), s=False, d=True, p=True,
+                               type='skinCluster') or list()
+    for plug in plugs:
+        if plug.startswith('{}.matrix['.format(sc)):
+            index = int(common.getIndex(plug))
+            if sc in _INFLUENCE_INDEX_CACHE:
+                handle, matrixIndices, indexMap = _INFLUENCE_INDEX_CACHE[sc]
+                indexMap[mc.ls(influence)[0]] = index
+                _INFLUENCE_INDEX_CACHE[sc] = (handle, _getMatrixIndices(sc), indexMap)
             return index
 
+    clearInfluenceIndexCache(sc)
+    return getInfIndex(sc, influence)
+
+def removeInfluence(sc, influences):
+    """
+    This will remove the influences from the skinCluster and clear the cached influence index map.
+
+    :param sc: The skinCluster you want to remove the influences from.
+    :type sc: str
+
+    :param influences: The influences you want to remove.
+    :type influences: str | list
+    """
+    mc.skinCluster(sc, e=True, removeInfluence=influences)
+    clearInfluenceIndexCache(sc)
+
+def getInfIndex(sc, inf):
+    """
+    This will return the logical index of the influence in the matrix attribute of the skinCluster.
+
+    :param sc: The skinCluster the influence is connected to.
+    :type sc: str
+
+    :param inf: The influence you want the index for.
+    :type inf: str
+
+    :returns: The index or None if the influence isn't connected to the skinCluster.
+    :rtype: int
+    """
+    indexMap = getInfluenceIndexMap(sc)
+    if inf not in indexMap and mc.objExists(inf):
+        inf = mc.ls(inf)[0]
+    return indexMap.get(inf)
+
 def remove_unused_influences(sc):
     all = mc.skinCluster(sc, q=True, inf=True)
     weighted = mc.skinCluster(sc, q=True, wi=True)
     unused = [inf for inf in all if inf not in weighted]
-    mc.skinCluster(sc, e=True, removeInfluence=unused)
+    removeInfluence(sc, unused)
+
+def getSkinClusterFn(sc, geometry=None, shapeDagPath=None, pointCount=None):
+    '''
+    This will return the function set for the skinCluster along with the shape dagPath
+    and a component that covers every point of the shape. These are the three things the
+    API needs to get or set the whole weight matrix in one call.
+
+    :param sc: The skinCluster you want the function set for.
+    :type sc: str
+
+    :param geometry: The geometry deformed by the skinCluster. If None we use the first one.
+    :type geometry: str
+
+    :param shapeDagPath: The dagPath of the shape if you already have it. Skips resolving geometry.
+    :type shapeDagPath: om2.MDagPath
+
+    :param pointCount: The number of points on the shape if you already have it.
+    :type pointCount: int
+
+    :returns: MFnSkinCluster, MDagPath of the shape, MObject of the components
+    :rtype: tuple
+    '''
+    if not mc.objExists(sc):
+        raise RuntimeError("{} doesn't exist in the current Maya session.".format(sc))
+
+    selList = om2.MSelectionList()
+    selList.add(sc)
+    skinFn = oma2.MFnSkinCluster(selList.getDependNode(0))
+
+    if shapeDagPath is None:
+        if not geometry:
+            geometry = mc.skinCluster(sc, q=True, geometry=True)[0]
+        selList.add(geometry)
+        shapeDagPath = selList.getDagPath(1)
+        shapeDagPath.extendToShape()
+
+    # build a component that has every point on the shape
+    if pointCount is None:
+        pointCount = rig_shape.getPointCount(shapeDagPath.fullPathName())
+    if shapeDagPath.apiType() == om2.MFn.kNurbsCurve:
+        componentType = om2.MFn.kCurveCVComponent
+    else:
+        componentType = om2.MFn.kMeshVertComponent
+    componentFn = om2.MFnSingleIndexedComponent()
+    components = componentFn.create(componentType)
+    componentFn.setCompleteData(pointCount)
+
+    return skinFn, shapeDagPath, components
+
+def getWeightArray(sc, geometry=None, shapeDagPath=None, pointCount=None):
+    '''
+    This will get the full weight matrix of the skinCluster with one API call.
+
+    :param sc: The skinCluster you want to get the weights from.
+    :type sc: str
+
+    :param geometry: The geometry deformed by the skinCluster. If None we use the first one.
+    :type geometry: str
+
+    :param shapeDagPath: The dagPath of the shape if you already have it. Skips resolving geometry.
+    :type shapeDagPath: om2.MDagPath
+
+    :param pointCount: The number of points on the shape if you already have it.
+    :type pointCount: int
+
+    :returns: numpy array of shape (points, influences) and the influences in column order.
+    :rtype: tuple
+    '''
+    skinFn, shapeDagPath, components = getSkinClusterFn(sc, geometry, shapeDagPath, pointCount)
+    weights, influenceCount = skinFn.getWeights(shapeDagPath, components)
+    influenceList = [dagPath.partialPathName() for dagPath in skinFn.influenceObjects()]
+
+    return _fromDoubleArray(weights).reshape(-1, influenceCount), influenceList
+
+def _fromDoubleArray(doubleArray):
+    '''
+    Copy an MDoubleArray into a numpy array a chunk at a time.
+    '''
+    count = len(doubleArray)
+    array = numpy.empty(count, dtype=numpy.float64)
+    for start in range(0, count, WEIGHT_CHUNK_SIZE):
+        end = min(start + WEIGHT_CHUNK_SIZE, count)
+        array[start:end] = doubleArray[start:end]
+
+    return array
+
+def _toDoubleArray(array):
+    '''
+    Copy a numpy array into an MDoubleArray a chunk at a time. API 2.0 arrays can only be built
+    from python sequences, there is no way to fill one from the numpy buffer (MScriptUtil is only
+    in API 1.0 and sets one value at a time too), so each chunk still goes through a list. The
+    chunks keep that list small.
+    '''
+    array = numpy.ascontiguousarray(array, dtype=numpy.float64).ravel()
+    doubleArray = om2.MDoubleArray()
+    for start in range(0, array.size, WEIGHT_CHUNK_SIZE):
+        doubleArray += om2.MDoubleArray(array[start:start + WEIGHT_CHUNK_SIZE].tolist())
+
+    return doubleArray
+
+def setWeightArray(sc, weightArray, influenceList=None, geometry=None, normalize=False, shapeDagPath=None,
+                   pointCount=None):
+    '''
+    This will set the weight matrix on the skinCluster with one API call. The old weights are
+    kept so it can be undone.
+
+    :param sc: The skinCluster you want to set the weights on.
+    :type sc: str
+
+    :param weightArray: Weights with a row per point and a column per influence.
+    :type weightArray: numpy.ndarray
+
+    :param influenceList: Influences in the order of the columns. If None we use all of the
+                          influences on the skinCluster.
+    :type influenceList: list
+
+    :param geometry: The geometry deformed by the skinCluster. If None we use the first one.
+    :type geometry: str
+
+    :param normalize: Whether or not Maya should normalize the weights as they are set.
+    :type normalize: bool
+
+    :param shapeDagPath: The dagPath of the shape if you already have it. Skips resolving geometry.
+    :type shapeDagPath: om2.MDagPath
+
+    :param pointCount: The number of points on the shape if you already have it.
+    :type pointCount: int
+    '''
+    skinFn, shapeDagPath, components = getSkinClusterFn(sc, geometry, shapeDagPath, pointCount)
+    skinInfluenceList = [dagPath.partialPathName() for dagPath in skinFn.influenceObjects()]
+    if not influenceList:
+        influenceList = skinInfluenceList
+    influenceList = common.toList(influenceList)
+
+    weightArray = numpy.asarray(weightArray, dtype=numpy.float64)
+    if weightArray.ndim == 1:
+        weightArray = weightArray.reshape(-1, 1)
+
+    # the API takes the position of the influence in the influence objects array
+    columnList = list()
+    indexList = list()
+    for column, inf in enumerate(influenceList):
+        if inf not in skinInfluenceList:
+            mc.warning('{} is not an influence of {}'.format(inf, sc))
+            continue
+        columnList.append(column)
+        indexList.append(skinInfluenceList.index(inf))
+
+    if not indexList:
+        return
+
+    if len(columnList) != weightArray.shape[1]:
+        weightArray = weightArray[:, columnList]
+
+    # make sure we don't give it more points than the shape has
+    pointCount = om2.MFnSingleIndexedComponent(components).elementCount
+    if weightArray.shape[0] > pointCount:
+        weightArray = weightArray[:pointCount]
+    elif weightArray.shape[0] < pointCount:
+        componentFn = om2.MFnSingleIndexedComponent()
+        components = componentFn.create(om2.MFnComponent(components).componentType)
+        componentFn.setCompleteData(weightArray.shape[0])
+
+    influenceIndices = om2.MIntArray(indexList)
+    weights = _toDoubleArray(weightArray)
+    oldWeights = list()
+
+    def doIt():
+        oldWeights[:] = [skinFn.setWeights(shapeDagPath, components, influenceIndices, weights, normalize, True)]
+
+    def undoIt():
+        skinFn.setWeights(shapeDagPath, components, influenceIndices, oldWeights[0], False, False)
+
+    apiUndo.commit(doIt, undoIt)
+
+def setBlendWeightArray(sc, blendWeights, geometry=None, shapeDagPath=None, pointCount=None):
+    '''
+    This will set the dual quaternion blend weight of every point on the skinCluster with one API call.
+    The old blend weights are kept so it can be undone.
+
+    :param sc: The skinCluster you want to set the blend weights on.
+    :type sc: str
+
+    :param blendWeights: Blend weight for each point.
+    :type blendWeights: numpy.ndarray
+
+    :param geometry: The geometry deformed by the skinCluster. If None we use the first one.
+    :type geometry: str
+
+    :param shapeDagPath: The dagPath of the shape if you already have it. Skips resolving geometry.
+    :type shapeDagPath: om2.MDagPath
+
+    :param pointCount: The number of points on the shape if you already have it.
+    :type pointCount: int
+    '''
+    skinFn, shapeDagPath, components = getSkinClusterFn(sc, geometry, shapeDagPath, pointCount)
+    blendWeights = numpy.asarray(blendWeights, dtype=numpy.float64).ravel()
+
+    # make sure we don't give it more points than the shape has
+    pointCount = om2.MFnSingleIndexedComponent(components).elementCount
+    if blendWeights.size > pointCount:
+        blendWeights = blendWeights[:pointCount]
+    elif blendWeights.size < pointCount:
+        componentFn = om2.MFnSingleIndexedComponent()
+        components = componentFn.create(om2.MFnComponent(components).componentType)
+        componentFn.setCompleteData(blendWeights.size)
+
+    weights = _toDoubleArray(blendWeights)
+    oldWeights = skinFn.getBlendWeights(shapeDagPath, components)
+    apiUndo.commit(lambda: skinFn.setBlendWeights(shapeDagPath, components, weights),
+                   lambda: skinFn.setBlendWeights(shapeDagPath, components, oldWeights))
+
+def getLockedInfluences(sc):
+    '''
+    Get the influences on the skinCluster that have their weights locked.
+
+    :param sc: The skinCluster you want the locked influences for.
+    :type sc: str
+
+    :returns: Locked influences
+    :rtype: list
+    '''
+    lockedList = list()
+    for inf in mc.skinCluster(sc, q=True, inf=True) or list():
+        if mc.attributeQuery('liw', node=inf, exists=True) and mc.getAttr('{}.liw'.format(inf)):
+            lockedList.append(inf)
+
+    return lockedList
+
+def pruneWeightArray(weightArray, threshold=0.0, maxInfluences=None, lockedColumns=None, normalize=True):
+    '''
+    Prune a weight matrix. Weights under the threshold are removed, then only the largest
+    maxInfluences weights are kept for each point and the rows are renormalized. Locked
+    columns are never changed, they count towards maxInfluences and the unlocked weights are
+    scaled to fill whatever the locked weights leave. A point whose unlocked weights are all
+    under the threshold keeps its largest one so it never ends up with no weight at all.
+
+    :param weightArray: Weights with a row per point and a column per influence.
+    :type weightArray: numpy.ndarray
+
+    :param threshold: Weights below this are set to zero.
+    :type threshold: float
+
+    :param maxInfluences: Max number of influences per point. None means no limit.
+    :type maxInfluences: int
+
+    :param lockedColumns: Indices of the columns that are locked.
+    :type lockedColumns: list
+
+    :param normalize: Whether or not to renormalize the rows after pruning.
+    :type normalize: bool
+
+    :returns: The pruned weights as a new array.
+    :rtype: numpy.ndarray
+    '''
+    weightArray = numpy.array(weightArray, dtype=numpy.float64)
+    pointCount, influenceCount = weightArray.shape
+
+    locked = numpy.zeros(influenceCount, dtype=bool)
+    if lockedColumns is not None and len(lockedColumns):
+        locked[numpy.asarray(lockedColumns, dtype=numpy.int64)] = True
+    unlocked = ~locked
+
+    original_weights = weightArray[:, unlocked]
+    original_sum = original_weights.sum(axis=1)
+    unlocked_weights = numpy.where(original_weights < threshold, 0.0, original_weights)
+
+    # rows that lost all of their unlocked weights keep the largest one
+    emptied = numpy.flatnonzero((original_sum > 0) & ~numpy.any(unlocked_weights > 0.0, axis=1))
+    if emptied.size:
+        largest = numpy.argmax(original_weights[emptied], axis=1)
+        unlocked_weights[emptied, largest] = original_weights[emptied, largest]
+
+    if maxInfluences is not None:
+        # locked weights that are on use up some of the influences we're allowed
+        allowed = maxInfluences - numpy.count_nonzero(weightArray[:, locked] > 0.0, axis=1)
+        allowed = numpy.clip(allowed, 0, maxInfluences)
+        over_limit = allowed < numpy.count_nonzero(unlocked_weights > 0.0, axis=1)
+    else:
+        over_limit = numpy.zeros(pointCount, dtype=bool)
+
+    if over_limit.any():
+        # partial sort for the largest weights any row is allowed, then order just those
+        keep = min(max(int(allowed.max()), 1), unlocked_weights.shape[1])
+        top_columns = numpy.argpartition(-unlocked_weights, keep - 1, axis=1)[:, :keep]
+        rows = numpy.arange(pointCount)[:, None]
+        top_values = unlocked_weights[rows, top_columns]
+        order = numpy.argsort(-top_values, axis=1, kind='mergesort')
+        top_columns = top_columns[rows, order]
+
+        keep_mask = numpy.arange(keep)[None, :] < allowed[:, None]
+        pruned = numpy.zeros_like(unlocked_weights)
+        pruned[rows, top_columns] = numpy.where(keep_mask, unlocked_weights[rows, top_columns], 0.0)
+        unlocked_weights = pruned
+
+    if normalize:
+        # unlocked weights fill whatever the locked weights leave. Rows that had no unlocked
+        # weight to begin with are left alone.
+        locked_sum = weightArray[:, locked].sum(axis=1)
+        target = numpy.clip(1.0 - locked_sum, 0.0, None) if locked.any() else numpy.ones(pointCount)
+        target = numpy.where(original_sum > 0, target, 0.0)
+        pruned_sum = unlocked_weights.sum(axis=1)
+        scale = numpy.divide(target, pruned_sum, out=numpy.zeros(pointCount), where=pruned_sum > 0)
+        unlocked_weights *= scale[:, None]
+
+    weightArray[:, unlocked] = unlocked_weights
+
+    return weightArray
+
+def pruneWeights(sc, threshold=.0001, maxInfluences=None, respectLocks=True, normalize=True, geometry=None):
+    '''
+    Prune the weights on a skinCluster. The whole weight matrix is pruned in numpy and written
+    back with one call. See pruneWeightArray.
+
+    ..example ::
+         pruneWeights('body_geo_skinCluster', threshold=.001, maxInfluences=4)
+
+    :param sc: The skinCluster you want to prune.
+    :type sc: str
+
+    :param threshold: Weights below this are set to zero.
+    :type threshold: float
+
+    :param maxInfluences: Max number of influences per point. None means no limit.
+    :type maxInfluences: int
+
+    :param respectLocks: Leave the weights of locked influences alone.
+    :type respectLocks: bool
+
+    :param normalize: Whether or not to renormalize the rows after pruning.
+    :type normalize: bool
+
+    :param geometry: The geometry deformed by the skinCluster. If None we use the first one.
+    :type geometry: str
+    '''
+    weightArray, influenceList = getWeightArray(sc, geometry)
+    lockedColumns = list()
+    if respectLocks:
+        lockedList = getLockedInfluences(sc)
+        lockedColumns = [influenceList.index(inf) for inf in lockedList if inf in influenceList]
+
+    weightArray = pruneWeightArray(weightArray, threshold, maxInfluences, lockedColumns, normalize)
+    setWeightArray(sc, weightArray, influenceList=influenceList, geometry=geometry)
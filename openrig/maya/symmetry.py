@@ -0,0 +1,348 @@
+'''
+This module is for building and caching symmetry maps for meshes.
+
+A symmetry map is an array with the mirrored vertex index for every vertex on the mesh and a
+mask of the vertices that sit on the center line. Maps are keyed by a hash of the mesh topology
+and the rest (Orig) points so they are rebuilt automatically when either of those change. They
+are kept in memory for the session and, if a cache directory is set, saved to disk as .npz files
+so the next build can load them instead of searching for the closest points again. The rig
+builds set the cache directory to a symmetry folder next to the build data when they start.
+
+Within a session the map for a shape is found without reading or hashing the mesh again, as
+long as the shape still exists and has the same number of vertices and faces. Use clearCache if
+you move the rest points of a shape without changing its topology.
+
+Maps are built from the closest mirrored point by default. For meshes that aren't symmetrical
+in their rest position you can give a center edge and the map is built by walking the topology
+out from that edge instead.
+'''
+import os
+import re
+import hashlib
+import numpy
+import maya.cmds as mc
+import maya.api.OpenMaya as om2
+
+import openrig.maya.transform as rig_transform
+import openrig.maya.shape as rig_shape
+from openrig.shared import spatial
+from openrig.shared import topology
+
+# directory the symmetry maps are saved to. If None we only keep them in memory.
+CACHE_DIRECTORY = os.environ.get('OPENRIG_SYMMETRY_CACHE')
+# decimal places we round the points to before we hash them
+PRECISION = 4
+
+_SYMMETRY_MAP_CACHE = dict()
+# (shape hash code, posVector, centerEdge, space) -> (MObjectHandle, mesh counts, symmetry map key)
+_SHAPE_CACHE = dict()
+
+
+def setCacheDirectory(directory):
+    '''
+    Set the directory symmetry maps are saved to. This is usually next to the build data.
+
+    :param directory: Directory to save the maps to. Pass None to only cache in memory.
+    :type directory: str
+    '''
+    global CACHE_DIRECTORY
+    CACHE_DIRECTORY = directory
+
+
+def clearCache(directory=None):
+    '''
+    Clear the symmetry maps we have in memory, and on disk if you give a directory.
+
+    :param directory: Directory to remove the symmetry map files from.
+    :type directory: str
+    '''
+    _SYMMETRY_MAP_CACHE.clear()
+    _SHAPE_CACHE.clear()
+    if directory and os.path.isdir(directory):
+        for filename in os.listdir(directory):
+            if filename.startswith('symmetry_') and filename.endswith('.npz'):
+                os.remove(os.path.join(directory, filename))
+
+
+def getMeshData(geometry, space=om2.MSpace.kWorld):
+    '''
+    Get the rest points and the topology for the mesh.
+
+    :param geometry: Name of the mesh
+    :type geometry: str
+
+    :param space: Space to get the points in. Weights mirror in world space, deltas in object space.
+    :type space: int
+
+    :return: points, polygonCounts, polygonConnects
+    :rtype: tuple
+    '''
+    meshFn = om2.MFnMesh(rig_transform.getDagPath(rig_shape.getOrigShape(geometry)))
+    points = numpy.array(meshFn.getPoints(space), dtype=numpy.float64)[:, :3]
+    counts, connects = meshFn.getVertices()
+
+    return points, numpy.array(counts, dtype=numpy.int32), numpy.array(connects, dtype=numpy.int32)
+
+
+def getMeshTopology(geometry):
+    '''
+    Get the topology for the mesh without reading the points.
+
+    :param geometry: Name of the mesh
+    :type geometry: str
+
+    :return: polygonCounts, polygonConnects, pointCount
+    :rtype: tuple
+    '''
+    meshFn = om2.MFnMesh(rig_transform.getDagPath(rig_shape.getOrigShape(geometry)))
+    counts, connects = meshFn.getVertices()
+
+    return numpy.array(counts, dtype=numpy.int32), numpy.array(connects, dtype=numpy.int32), meshFn.numVertices
+
+
+def getMeshHash(points, polygonCounts, polygonConnects):
+    '''
+    Hash the topology and the rest points of a mesh. The points are hashed on top of
+    topology.getTopologyHash.
+
+    :param points: Rest points of the mesh
+    :type points: numpy.ndarray
+
+    :param polygonCounts: Number of vertices for each face
+    :type polygonCounts: numpy.ndarray
+
+    :param polygonConnects: Vertex ids for each face
+    :type polygonConnects: numpy.ndarray
+
+    :return: Hex digest of the hash
+    :rtype: str
+    '''
+    sha = hashlib.sha1()
+    sha.update(topology.getTopologyHash(polygonCounts, polygonConnects))
+    # adding zero gets rid of -0.0 so it hashes the same as 0.0
+    rounded = numpy.round(numpy.asarray(points, dtype=numpy.float64)[:, :3], PRECISION) + 0.0
+    sha.update(numpy.ascontiguousarray(rounded).tostring())
+
+    return sha.hexdigest()
+
+
+def buildSymmetryMap(points, posVector=(-1, 1, 1)):
+    '''
+    Build the symmetry map for the points by finding the closest point to each mirrored point.
+
+    :param points: Rest points of the mesh
+    :type points: numpy.ndarray
+
+    :param posVector: Direction you want to mirror.
+    :type posVector: tuple
+
+    :return: mirrorMap, centerMask
+    :rtype: tuple
+    '''
+    points = numpy.asarray(points, dtype=numpy.float64)[:, :3]
+    mirrored_points = points * numpy.asarray(posVector, dtype=numpy.float64)
+    mirror_map = spatial.closestPoints(points, mirrored_points)[0]
+    center_mask = mirror_map == numpy.arange(len(points))
+
+    return mirror_map, center_mask
+
+
+def buildTopologySymmetryMap(points, polygonCounts, polygonConnects, centerEdge, posVector=(-1, 1, 1)):
+    '''
+    Build the symmetry map by walking the topology out from an edge on the center line. This
+    works on meshes that have been sculpted so they aren't symmetrical in their rest position.
+    Any vertices we can't reach from the center edge, like other shells, fall back to the
+    closest mirrored point.
+
+    :param points: Rest points of the mesh
+    :type points: numpy.ndarray
+
+    :param polygonCounts: Number of vertices for each face
+    :type polygonCounts: numpy.ndarray
+
+    :param polygonConnects: Vertex ids for each face
+    :type polygonConnects: numpy.ndarray
+
+    :param centerEdge: The two vertex ids of an edge on the line of symmetry.
+    :type centerEdge: tuple
+
+    :param posVector: Direction you want to mirror. Only used for unreached vertices.
+    :type posVector: tuple
+
+    :return: mirrorMap, centerMask
+    :rtype: tuple
+    '''
+    mirror_map = topology.getTopologicalMirrorMap(polygonCounts, polygonConnects, centerEdge, len(points))
+    unreached = mirror_map == -1
+    if unreached.any():
+        mirror_map[unreached] = buildSymmetryMap(points, posVector)[0][unreached]
+    center_mask = mirror_map == numpy.arange(len(points))
+
+    return mirror_map, center_mask
+
+
+def getEdgeVertices(geometry, edge):
+    '''
+    Get the vertex ids for an edge.
+
+    :param geometry: Name of the mesh
+    :type geometry: str
+
+    :param edge: Edge id, edge name like "body_geo.e[120]" or a tuple of the two vertex ids.
+    :type edge: int | str | tuple
+
+    :return: The two vertex ids of the edge
+    :rtype: tuple
+    '''
+    if isinstance(edge, (list, tuple)):
+        return tuple([int(vertex) for vertex in edge])
+    if isinstance(edge, basestring):
+        match = re.search(r'\.e\[(\d+)\]$', edge)
+        if not match:
+            raise RuntimeError('{} is not an edge.'.format(edge))
+        edge = int(match.group(1))
+
+    meshFn = om2.MFnMesh(rig_transform.getDagPath(rig_shape.getOrigShape(geometry)))
+    return tuple(meshFn.getEdgeVertices(edge))
+
+
+def _getCacheKey(meshHash, posVector, centerEdge=None):
+    '''
+    Key for the symmetry map. This is also used for the file name.
+    '''
+    axis_string = ''.join(['n' if value < 0 else 'p' for value in posVector])
+    if centerEdge:
+        axis_string += '_e{}_{}'.format(*sorted(centerEdge))
+    return 'symmetry_{}_{}'.format(meshHash, axis_string)
+
+
+def getSymmetryMap(geometry, posVector=(-1, 1, 1), cacheDirectory=None, centerEdge=None, space=om2.MSpace.kWorld):
+    '''
+    Get the symmetry map for the geometry. This will load it from the cache if we have
+    already built it for the same topology and rest points, otherwise it's built and cached.
+    If you give a centerEdge the map is built by walking the topology instead of by position.
+
+    ..example ::
+         mirror_map, center_mask = getSymmetryMap('body_geo')
+         mirrored_weights = weights[mirror_map]
+
+    :param geometry: Name of the mesh
+    :type geometry: str
+
+    :param posVector: Direction you want to mirror.
+    :type posVector: tuple
+
+    :param cacheDirectory: Directory to look for and save the map in. Default is CACHE_DIRECTORY
+    :type cacheDirectory: str
+
+    :param centerEdge: Edge on the line of symmetry to walk the topology from.
+    :type centerEdge: int | str | tuple
+
+    :param space: Space of the rest points we mirror across. Use object space for blendShape deltas.
+                  The points are part of the hash so each space gets its own map.
+    :type space: int
+
+    :return: mirrorMap, centerMask
+    :rtype: tuple
+    '''
+    if not mc.objExists(geometry):
+        raise RuntimeError("{} doesn't exists in the current Maya session!".format(geometry))
+
+    cacheDirectory = cacheDirectory or CACHE_DIRECTORY
+    if centerEdge is not None:
+        centerEdge = getEdgeVertices(geometry, centerEdge)
+
+    # check the shape we built the map for last time before we read and hash the whole mesh
+    shapeDagPath = rig_transform.getDagPath(rig_shape.getOrigShape(geometry))
+    handle = om2.MObjectHandle(shapeDagPath.node())
+    meshFn = om2.MFnMesh(shapeDagPath)
+    mesh_counts = (meshFn.numVertices, meshFn.numPolygons, meshFn.numFaceVertices)
+    shape_key = (handle.hashCode(), tuple(posVector), centerEdge, space)
+    if shape_key in _SHAPE_CACHE:
+        cached_handle, cached_counts, key = _SHAPE_CACHE[shape_key]
+        if (cached_handle.isValid() and cached_handle.object() == handle.object() and
+                cached_counts == mesh_counts and key in _SYMMETRY_MAP_CACHE):
+            return _SYMMETRY_MAP_CACHE[key]
+
+    points, polygon_counts, polygon_connects = getMeshData(geometry, space)
+    key = _getCacheKey(getMeshHash(points, polygon_counts, polygon_connects), posVector, centerEdge)
+    _SHAPE_CACHE[shape_key] = (handle, mesh_counts, key)
+
+    if key in _SYMMETRY_MAP_CACHE:
+        return _SYMMETRY_MAP_CACHE[key]
+
+    filepath = os.path.join(cacheDirectory, '{}.npz'.format(key)) if cacheDirectory else None
+    if filepath and os.path.isfile(filepath):
+        with numpy.load(filepath) as data:
+            symmetry_map = (data['mirrorMap'], data['centerMask'])
+    else:
+        if centerEdge is not None:
+            symmetry_map = buildTopologySymmetryMap(points, polygon_counts, polygon_connects, centerEdge,
+                                                    posVector)
+        else:
+            symmetry_map = buildSymmetryMap(points, posVector)
+        if filepath:
+            if not os.path.isdir(cacheDirectory):
+                os.makedirs(cacheDirectory)
+            numpy.savez(filepath, mirrorMap=symmetry_map[0], centerMask=symmetry_map[1])
+
+    _SYMMETRY_MAP_CACHE[key] = symmetry_map
+
+    return symmetry_map
+
+
+def mirrorDeltas(deltas, indices, pointCount, mirrorMap, posVector=(-1, 1, 1), sourceMask=None):
+    '''
+    Mirror or flip point deltas with a symmetry map. If you give a sourceMask the deltas on the
+    source side are kept and mirrored across to the other side, and points on the center line
+    get the average of their delta and the mirrored delta so they stay on the center line.
+    Otherwise every delta is flipped.
+
+    ..example ::
+         mirror_map, center_mask = getSymmetryMap('body_geo')
+         deltas, indices = mirrorDeltas(deltas, indices, len(mirror_map), mirror_map,
+                                        sourceMask=points[:, 0] > 0)
+
+    :param deltas: Deltas with a row per index.
+    :type deltas: numpy.ndarray
+
+    :param indices: Point index for each delta.
+    :type indices: numpy.ndarray | list
+
+    :param pointCount: Number of points on the mesh
+    :type pointCount: int
+
+    :param mirrorMap: Mirrored point index for every point.
+    :type mirrorMap: numpy.ndarray
+
+    :param posVector: Direction you want to mirror.
+    :type posVector: tuple
+
+    :param sourceMask: Mask of the points you're mirroring from. None flips all of the deltas.
+    :type sourceMask: numpy.ndarray
+
+    :return: deltas, indices for the points that have a non zero delta
+    :rtype: tuple
+    '''
+    mirrorMap = numpy.asarray(mirrorMap)
+    indices = numpy.asarray(indices, dtype=numpy.int64)
+    deltas = numpy.asarray(deltas, dtype=numpy.float64)
+    pos_vector = numpy.asarray(posVector, dtype=numpy.float64)
+
+    full_deltas = numpy.zeros((pointCount, deltas.shape[1]))
+    full_deltas[indices] = deltas
+
+    mirrored_deltas = numpy.zeros_like(full_deltas)
+    mirrored_deltas[mirrorMap] = full_deltas * pos_vector[:deltas.shape[1]]
+    center_mask = mirrorMap == numpy.arange(pointCount)
+
+    if sourceMask is None:
+        new_deltas = mirrored_deltas
+    else:
+        source_mask = numpy.asarray(sourceMask, dtype=bool)
+        new_deltas = numpy.where(source_mask[:, None], full_deltas, mirrored_deltas)
+        new_deltas[center_mask] = (full_deltas[center_mask] + mirrored_deltas[center_mask]) * .5
+
+    new_indices = numpy.flatnonzero(numpy.any(new_deltas != 0, axis=1))
+
+    return new_deltas[new_indices], new_indices
@@ -9,6 +9,7 @@ import maya.cmds as mc
 import maya.api.OpenMaya as om2
 
 from openrig.maya.modlib import mesh
+from openrig.shared import components
 
 
 def space(uvList, axis, useSelectionOrder=False, spacing=0.2):
@@ -507,11 +508,17 @@ def getShells(uvList, orderOnAxis=None, uvSet='map1'):
     :returns: a list of UV lists for each shell.
     :rtype: list
     """
-    # flatten UV list
-    uvList = set(mc.ls(uvList, fl=True))
+    # "*" and object names need Maya to expand them, explicit index ranges don't
+    uvList = [uvList] if isinstance(uvList, basestring) else list(uvList)
+    expandList = [uv for uv in uvList if not components.isExpandable(uv)]
+    uvList = [uv for uv in uvList if components.isExpandable(uv)]
+    if expandList:
+        uvList.extend(mc.ls(mc.polyListComponentConversion(expandList, tuv=True), fl=True))
 
     # get UVs per mesh
-    meshUVs = set(((uv.split('.')[0], int(uv.split('[')[-1].split(']')[0])) for uv in uvList))
+    meshUVs = set()
+    for node, indices in components.groupIndices(uvList).items():
+        meshUVs.update([(node.split('.')[0], uv) for uv in indices.tolist()])
 
     # get shell IDs
     meshes = list(set([mesh for mesh, uv in meshUVs]))
@@ -0,0 +1,482 @@
+'''
+This module is for comparing weights between two snapshots. A snapshot can be a WeightData file,
+a deformerWeights xml file or the deformers in the current Maya session.
+
+Weights are compared in coordinate form, (point, map, value) for each non zero weight, so
+skinClusters with hundreds of influences never have to be expanded into a dense matrix. Maps
+that are only on one side are compared against zero weights.
+
+Each comparison gives a report like this:
+    status        - 'unchanged', 'changed', 'added', 'removed', 'topology' or 'unreadable'
+    pointCount    - (source point count, target point count)
+    addedMaps     - Maps that are only in the target.
+    removedMaps   - Maps that are only in the source.
+    maxDelta      - Largest absolute change of any weight.
+    meanDelta     - Mean absolute change over every point and map.
+    changedCount  - Number of points with a change larger than the tolerance.
+    maps          - OrderedDict of map: {'maxDelta', 'meanDelta', 'changedCount'} for changed maps.
+'''
+import os
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+import numpy
+
+import openrig.maya.weights as rig_weights
+import openrig.maya.weightObject as weightObject
+import openrig.maya.data.weight_data as weight_data
+
+# changes smaller than this are treated as the same weight
+TOLERANCE = 1e-4
+# extensions we read with the deformerWeights xml reader
+WTS_EXTENSIONS = ('.xml', '.xml.gz')
+# extensions we read as WeightData
+WEIGHT_DATA_EXTENSIONS = ('.json', weight_data.BINARY_EXTENSION)
+
+
+class WeightTable(object):
+    '''
+    The non zero weights for one deformer in coordinate form.
+    '''
+    def __init__(self, maps, pointCount, rows, columns, values):
+        '''
+        :param maps: Name of each map, in column order.
+        :type maps: list
+
+        :param pointCount: Number of points on the geometry.
+        :type pointCount: int
+
+        :param rows: Point index for each weight.
+        :type rows: numpy.ndarray
+
+        :param columns: Map index for each weight.
+        :type columns: numpy.ndarray
+
+        :param values: The weights.
+        :type values: numpy.ndarray
+        '''
+        self.maps = list(maps)
+        self.pointCount = int(pointCount)
+        self.rows = numpy.asarray(rows, dtype=numpy.int64)
+        self.columns = numpy.asarray(columns, dtype=numpy.int64)
+        self.values = numpy.asarray(values, dtype=numpy.float64)
+
+    @classmethod
+    def fromArray(cls, maps, weightArray):
+        '''
+        Make a table from a dense array with a row per point and a column per map.
+        '''
+        weightArray = numpy.asarray(weightArray, dtype=numpy.float64)
+        if weightArray.ndim == 1:
+            weightArray = weightArray.reshape(-1, 1)
+        rows, columns = numpy.nonzero(weightArray)
+        return cls(maps, weightArray.shape[0], rows, columns, weightArray[rows, columns])
+
+    @classmethod
+    def fromWeightObject(cls, weight_object):
+        '''
+        Make a table from a WeightObject or SparseWeightObject.
+        '''
+        maps = weight_object.getMaps() or ['envelope']
+        if isinstance(weight_object, weightObject.SparseWeightObject):
+            return cls(maps, weight_object.getPointCount(), weight_object.getRowIndices(),
+                       weight_object.getIndices(), weight_object.getValues())
+        weight_list = weight_object.getWeights()
+        point_count = max([len(weights) for weights in weight_list] or [0])
+        if not point_count:
+            return cls(maps, 0, [], [], [])
+        # maps without weights are zero columns so the columns stay in the same order as the maps
+        weight_list = [weights if len(weights) else numpy.zeros(point_count) for weights in weight_list]
+        return cls.fromArray(maps, numpy.column_stack(weight_list))
+
+    @classmethod
+    def fromWeightData(cls, nodeData):
+        '''
+        Make a table from the data WeightData has stored for one deformer.
+        '''
+        maps = nodeData['maps']
+        if 'indptr' in nodeData:
+            indptr = numpy.asarray(nodeData['indptr'], dtype=numpy.int64)
+            rows = numpy.repeat(numpy.arange(len(indptr) - 1), numpy.diff(indptr))
+            return cls(maps, nodeData['pointCount'], rows, nodeData['indices'], nodeData['values'])
+        return cls.fromArray(maps, numpy.column_stack(nodeData['weights']))
+
+    @classmethod
+    def fromWtsData(cls, wtsData):
+        '''
+        Make a table from the data returned by weights.readWtsXml.
+        '''
+        maps = list(wtsData['sources'])
+        point_count = wtsData['pointCount']
+        rows, columns, values = list(), list(), list()
+        for column, source in enumerate(maps):
+            source_data = wtsData['weights'][source]
+            if source_data['defaultValue']:
+                dense = rig_weights.getDenseWeights(source_data, point_count)
+                indices = numpy.flatnonzero(dense)
+                source_values = dense[indices]
+            else:
+                indices = numpy.asarray(source_data['indices'], dtype=numpy.int64)
+                source_values = numpy.asarray(source_data['values'], dtype=numpy.float64)
+                keep = (indices < point_count) & (source_values != 0)
+                indices = indices[keep]
+                source_values = source_values[keep]
+            rows.append(indices)
+            columns.append(numpy.full(len(indices), column, dtype=numpy.int64))
+            values.append(source_values)
+
+        if not maps:
+            return cls(maps, point_count, [], [], [])
+        return cls(maps, point_count, numpy.concatenate(rows), numpy.concatenate(columns),
+                   numpy.concatenate(values))
+
+
+def diffTables(source, target, tolerance=TOLERANCE):
+    '''
+    Compare the weights of two tables.
+
+    :param source: Weights we're comparing from.
+    :type source: WeightTable
+
+    :param target: Weights we're comparing to.
+    :type target: WeightTable
+
+    :param tolerance: Changes smaller than this are ignored.
+    :type tolerance: float
+
+    :return: Report of the changes.
+    :rtype: OrderedDict
+    '''
+    report = OrderedDict()
+    report['status'] = 'unchanged'
+    report['pointCount'] = (source.pointCount, target.pointCount)
+    report['addedMaps'] = [map_ for map_ in target.maps if map_ not in source.maps]
+    report['removedMaps'] = [map_ for map_ in source.maps if map_ not in target.maps]
+    report['maxDelta'] = 0.0
+    report['meanDelta'] = 0.0
+    report['changedCount'] = 0
+    report['maps'] = OrderedDict()
+
+    if source.pointCount != target.pointCount:
+        report['status'] = 'topology'
+        return report
+
+    # put both tables in the columns of the union of the maps
+    map_list = list(source.maps) + report['addedMaps']
+    target_columns = numpy.array([map_list.index(map_) for map_ in target.maps], dtype=numpy.int64)
+    column_count = max(len(map_list), 1)
+
+    # subtract the weights by summing them with the target negated for each (point, map) key
+    keys = numpy.concatenate([source.rows * column_count + source.columns,
+                              target.rows * column_count + target_columns[target.columns]])
+    values = numpy.concatenate([-source.values, target.values])
+    if len(keys):
+        unique_keys, inverse = numpy.unique(keys, return_inverse=True)
+        deltas = numpy.abs(numpy.bincount(inverse, weights=values))
+    else:
+        unique_keys = numpy.zeros(0, dtype=numpy.int64)
+        deltas = numpy.zeros(0)
+
+    changed = deltas > tolerance
+    unique_keys = unique_keys[changed]
+    deltas = deltas[changed]
+    if not len(deltas):
+        if report['addedMaps'] or report['removedMaps']:
+            report['status'] = 'changed'
+        return report
+
+    rows = unique_keys // column_count
+    columns = unique_keys % column_count
+    point_count = max(source.pointCount, 1)
+
+    map_max = numpy.zeros(column_count)
+    numpy.maximum.at(map_max, columns, deltas)
+    map_sum = numpy.bincount(columns, weights=deltas, minlength=column_count)
+    map_changed = numpy.bincount(columns, minlength=column_count)
+
+    report['status'] = 'changed'
+    report['maxDelta'] = float(deltas.max())
+    report['meanDelta'] = float(deltas.sum() / (point_count * column_count))
+    report['changedCount'] = int(len(numpy.unique(rows)))
+    for column in numpy.flatnonzero(map_changed):
+        report['maps'][map_list[column]] = {'maxDelta': float(map_max[column]),
+                                            'meanDelta': float(map_sum[column] / point_count),
+                                            'changedCount': int(map_changed[column])}
+
+    return report
+
+
+def _emptyReport(status, table):
+    '''
+    Report for a deformer that is only in one of the snapshots.
+    '''
+    report = OrderedDict()
+    report['status'] = status
+    report['pointCount'] = (table.pointCount, table.pointCount)
+    report['addedMaps'] = list(table.maps) if status == 'added' else list()
+    report['removedMaps'] = list(table.maps) if status == 'removed' else list()
+    return report
+
+
+def diffSnapshots(source, target, tolerance=TOLERANCE):
+    '''
+    Compare two snapshots of deformer weights.
+
+    :param source: Dictionary of deformer: WeightTable we're comparing from.
+    :type source: dict
+
+    :param target: Dictionary of deformer: WeightTable we're comparing to.
+    :type target: dict
+
+    :param tolerance: Changes smaller than this are ignored.
+    :type tolerance: float
+
+    :return: OrderedDict of deformer: report
+    :rtype: OrderedDict
+    '''
+    reports = OrderedDict()
+    for deformer in source:
+        if deformer not in target:
+            reports[deformer] = _emptyReport('removed', source[deformer])
+            continue
+        reports[deformer] = diffTables(source[deformer], target[deformer], tolerance)
+    for deformer in target:
+        if deformer not in source:
+            reports[deformer] = _emptyReport('added', target[deformer])
+
+    return reports
+
+
+def readSnapshot(filepath):
+    '''
+    Read a weight file into a snapshot. Snapshots are keyed by deformer name. deformerWeights xml
+    files use the deformer stored in the file, or the part of the file name after "geo__" if the
+    file doesn't have one.
+
+    :param filepath: WeightData or deformerWeights xml file. Zipped xml files are read directly.
+    :type filepath: str
+
+    :return: OrderedDict of deformer: WeightTable
+    :rtype: OrderedDict
+
+    :raises ValueError: If a .json file isn't WeightData.
+    '''
+    snapshot = OrderedDict()
+    filename = os.path.basename(filepath)
+    for extension in WTS_EXTENSIONS:
+        if filename.endswith(extension):
+            wtsData = rig_weights.readWtsXml(filepath)
+            deformer = wtsData.get('deformer') or filename[:-len(extension)].split('__', 1)[-1]
+            snapshot[deformer] = WeightTable.fromWtsData(wtsData)
+            return snapshot
+
+    data = weight_data.WeightData()
+    try:
+        data.read(filepath)
+        for node, nodeData in data.getData().items():
+            snapshot[node] = WeightTable.fromWeightData(nodeData)
+    except (KeyError, TypeError, AttributeError):
+        raise ValueError('{} is not a WeightData file.'.format(filepath))
+
+    return snapshot
+
+
+def getSnapshot(deformerList):
+    '''
+    Get a snapshot of the weights of deformers in the current Maya session.
+
+    :param deformerList: Deformer names or (deformer, geometry) pairs.
+    :type deformerList: list
+
+    :return: OrderedDict of deformer: WeightTable
+    :rtype: OrderedDict
+    '''
+    snapshot = OrderedDict()
+    for item, weight_object in zip(deformerList, rig_weights.getWeightsBatch(deformerList)):
+        deformer = item if isinstance(item, basestring) else item[0]
+        snapshot[deformer] = WeightTable.fromWeightObject(weight_object)
+
+    return snapshot
+
+
+def diffFiles(sourceFile, targetFile, tolerance=TOLERANCE):
+    '''
+    Compare the weights in two files.
+
+    :return: OrderedDict of deformer: report
+    :rtype: OrderedDict
+    '''
+    return diffSnapshots(readSnapshot(sourceFile), readSnapshot(targetFile), tolerance)
+
+
+def diffLive(filepath, deformerList=None, tolerance=TOLERANCE):
+    '''
+    Compare the weights in a file against the deformers in the current Maya session.
+
+    :param filepath: File we're comparing from.
+    :type filepath: str
+
+    :param deformerList: Deformers to compare. Default is every deformer in the file.
+    :type deformerList: list
+
+    :return: OrderedDict of deformer: report
+    :rtype: OrderedDict
+    '''
+    source = readSnapshot(filepath)
+    if deformerList is None:
+        deformerList = list(source.keys())
+    return diffSnapshots(source, getSnapshot(deformerList), tolerance)
+
+
+def isWeightFile(filename):
+    '''
+    Check if the file is one readSnapshot can read. Other files in a weights directory, like the
+    .shp blendShape deltas and the export manifest, are skipped.
+
+    :param filename: Name of the file
+    :type filename: str
+
+    :rtype: bool
+    '''
+    filename = os.path.basename(filename)
+    if filename == rig_weights.WTS_MANIFEST_FILENAME:
+        return False
+    return filename.endswith(WTS_EXTENSIONS + WEIGHT_DATA_EXTENSIONS)
+
+
+def _getFilename(filename):
+    '''
+    Name of the file without the .gz so zipped and unzipped files are matched.
+    '''
+    return filename[:-3] if filename.endswith('.gz') else filename
+
+
+def _unreadableReport(filepath, error):
+    '''
+    Report for a file that couldn't be read.
+    '''
+    report = OrderedDict()
+    report['status'] = 'unreadable'
+    report['pointCount'] = (0, 0)
+    report['addedMaps'] = list()
+    report['removedMaps'] = list()
+    report['filepath'] = filepath
+    report['error'] = str(error)
+    return report
+
+
+def _diffFilePair(args):
+    '''
+    Read and compare one pair of files. This is what runs on the read threads. A file we can't
+    read is reported as unreadable instead of stopping the other files.
+    '''
+    filename, sourceFile, targetFile, tolerance = args
+    snapshots = list()
+    for filepath in [sourceFile, targetFile]:
+        if not filepath:
+            snapshots.append(OrderedDict())
+            continue
+        try:
+            snapshots.append(readSnapshot(filepath))
+        except (IOError, OSError, RuntimeError, ValueError, SyntaxError) as error:
+            return filename, OrderedDict([(filename, _unreadableReport(filepath, error))])
+    return filename, diffSnapshots(snapshots[0], snapshots[1], tolerance)
+
+
+def iterDiffDirectories(sourceDirectory, targetDirectory, tolerance=TOLERANCE, threads=None):
+    '''
+    Compare every weight file in two directories. Files that aren't weights are skipped and files
+    that can't be read are reported as 'unreadable'. Reports are yielded as each pair of files is
+    compared so a whole character can be checked without holding every file in memory.
+
+    ..example ::
+         for filename, reports in iterDiffDirectories(published_dir, build_dir):
+             print formatReports(reports, filename)
+
+    :param sourceDirectory: Directory we're comparing from.
+    :type sourceDirectory: str
+
+    :param targetDirectory: Directory we're comparing to.
+    :type targetDirectory: str
+
+    :param tolerance: Changes smaller than this are ignored.
+    :type tolerance: float
+
+    :param threads: Number of files to read at the same time. Default is weights.WTS_READ_THREADS
+    :type threads: int
+
+    :return: Generator of (filename, OrderedDict of deformer: report)
+    :rtype: generator
+    '''
+    file_map = OrderedDict()
+    for index, directory in enumerate([sourceDirectory, targetDirectory]):
+        if not os.path.isdir(directory):
+            continue
+        for filename in sorted(os.listdir(directory)):
+            filepath = os.path.join(directory, filename)
+            if not os.path.isfile(filepath) or not isWeightFile(filename):
+                continue
+            file_map.setdefault(_getFilename(filename), [None, None])[index] = filepath
+
+    args_list = [(filename, paths[0], paths[1], tolerance) for filename, paths in file_map.items()]
+    pool = ThreadPool(threads or rig_weights.WTS_READ_THREADS)
+    try:
+        for result in pool.imap(_diffFilePair, args_list):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+def hasChanges(reports):
+    '''
+    Check if any of the reports have a change.
+
+    :param reports: OrderedDict of deformer: report
+    :type reports: dict
+
+    :return: True if any deformer changed
+    :rtype: bool
+    '''
+    return any(report['status'] != 'unchanged' for report in reports.values())
+
+
+def formatReports(reports, title=None, maxMaps=10):
+    '''
+    Format the reports into lines you can print or log in a publish check.
+
+    :param reports: OrderedDict of deformer: report
+    :type reports: dict
+
+    :param title: Line to put above the reports, like the file name.
+    :type title: str
+
+    :param maxMaps: Number of changed maps to list for each deformer. They're sorted by largest change.
+    :type maxMaps: int
+
+    :return: The formatted report
+    :rtype: str
+    '''
+    lines = [title] if title else list()
+    for deformer, report in reports.items():
+        if report['status'] == 'unchanged':
+            continue
+        if report['status'] == 'unreadable':
+            lines.append('  {}: unreadable {}'.format(report['filepath'], report['error']))
+            continue
+        if report['status'] in ('added', 'removed', 'topology'):
+            lines.append('  {}: {} {}'.format(deformer, report['status'], report['pointCount']))
+            continue
+        lines.append('  {}: max {:.5f} mean {:.6f} points {}'.format(deformer, report['maxDelta'],
+                                                                     report['meanDelta'],
+                                                                     report['changedCount']))
+        if report['addedMaps']:
+            lines.append('    added maps: {}'.format(', '.join(report['addedMaps'])))
+        if report['removedMaps']:
+            lines.append('    removed maps: {}'.format(', '.join(report['removedMaps'])))
+        map_list = sorted(report['maps'].items(), key=lambda item: -item[1]['maxDelta'])
+        for map_, map_report in map_list[:maxMaps]:
+            lines.append('    {}: max {:.5f} mean {:.6f} points {}'.format(map_, map_report['maxDelta'],
+                                                                         map_report['meanDelta'],
+                                                                         map_report['changedCount']))
+
+    return '\n'.join(lines)
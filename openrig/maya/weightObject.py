@@ -21,6 +21,7 @@ class WeightObject(object):
 
         self.__maps = list()
         self.__weights = list()
+        self.__array = None
         self.setMaps(maps)
         self.setWeights(weights)
         self._index = 0
@@ -101,22 +102,145 @@ class WeightObject(object):
 
         return (map, weights)
 
-    def normalize(self, maps=None):
+    def getMapMask(self, maps, columnCount):
         '''
-        This method is used to normalize each maps weights
-        :return:
+        This will return a boolean mask with a value per column for the maps passed in.
+
+        :param maps: Map names or indices, or a boolean mask with a value per map.
+        :type maps: str | list | numpy.ndarray
+
+        :param columnCount: Number of columns in the weights.
+        :type columnCount: int
+
+        :return: Mask that is True for the columns of the maps passed in.
+        :rtype: numpy.ndarray
+        '''
+        mask = numpy.zeros(columnCount, dtype=bool)
+        if maps is None:
+            return mask
+        if isinstance(maps, numpy.ndarray) and maps.dtype == bool:
+            mask[:len(maps)] = maps[:columnCount]
+            return mask
+
+        map_list = self.getMaps()
+        for map in common.toList(maps):
+            if isinstance(map, (int, numpy.integer)):
+                mask[map] = True
+            elif map in map_list:
+                mask[map_list.index(map)] = True
+
+        return mask
+
+    def normalize(self, maps=None, locked=None):
+        '''
+        This will normalize the weights so each component adds up to 1. If maps are passed in
+        only those maps will be scaled and the weights on every other map will stay as they are.
+        Weights on locked maps are never changed. Components that have no weight on the maps
+        being scaled are left alone.
+
+        If there is only one map there is nothing to normalize across so the weights are
+        clamped between 0 and 1.
+
+        :param maps: Maps you want to scale to normalize the weights.
+        :type maps: str | list
+
+        :param locked: Maps that are locked, or a boolean mask with a value per map.
+        :type locked: str | list | numpy.ndarray
         '''
+        weightArray = numpy.array(self.getArray(), dtype=numpy.float64)
+        if weightArray.ndim != 2 or not weightArray.size:
+            return
+        if weightArray.shape[1] == 1:
+            self.clamp(locked=locked)
+            return
+
+        free = ~self.getMapMask(locked, weightArray.shape[1])
         if maps:
-            maps = common.toList(maps)
-            for map in maps:
-                weight_list = self.__weights[self.__maps.index(maps)]
-                value_index_list = numpy.where(weight_list[0] > 1)[0]
-                for index in value_index_list:
-                    weights[index] = 1
-        else:
-            value_index_list = numpy.where(self.__weights[0] > 1)[0]
-            for index in value_index_list:
-                self.__weights[0][index] = 1
+            free &= self.getMapMask(maps, weightArray.shape[1])
+
+        free_total = weightArray[:, free].sum(axis=1)
+        locked_total = weightArray[:, ~free].sum(axis=1)
+        scale = numpy.ones(len(weightArray))
+        has_weight = free_total > 0
+        scale[has_weight] = numpy.clip(1.0 - locked_total[has_weight], 0.0, None) / free_total[has_weight]
+        weightArray[:, free] *= scale[:, None]
+
+        self.setWeights(weightArray)
+
+    def clamp(self, minValue=0.0, maxValue=1.0, maps=None, locked=None):
+        '''
+        This will clamp the weights between the min and max value.
+
+        :param minValue: Lowest value a weight can have.
+        :type minValue: float
+
+        :param maxValue: Highest value a weight can have.
+        :type maxValue: float
+
+        :param maps: Maps you want to clamp. Default is all of them.
+        :type maps: str | list
+
+        :param locked: Maps that are locked, or a boolean mask with a value per map.
+        :type locked: str | list | numpy.ndarray
+        '''
+        weightArray = numpy.array(self.getArray(), dtype=numpy.float64)
+        if weightArray.ndim != 2 or not weightArray.size:
+            return
+
+        columns = ~self.getMapMask(locked, weightArray.shape[1])
+        if maps:
+            columns &= self.getMapMask(maps, weightArray.shape[1])
+        weightArray[:, columns] = numpy.clip(weightArray[:, columns], minValue, maxValue)
+
+        self.setWeights(weightArray)
+
+    def scale(self, maps, value, locked=None):
+        '''
+        This will scale the weights on the maps passed in and keep the total for each component
+        the same. The weight that is added or removed is taken from or given to the other
+        unlocked maps in proportion to the weight they already have. The scaled maps can't go
+        over what the locked maps leave.
+
+        ..example ::
+             weight_object.scale(['jaw_bind'], 1.5, locked=['head_bind'])
+
+        :param maps: Maps you want to scale.
+        :type maps: str | list
+
+        :param value: What to scale the weights by.
+        :type value: float
+
+        :param locked: Maps that are locked, or a boolean mask with a value per map.
+        :type locked: str | list | numpy.ndarray
+        '''
+        weightArray = numpy.array(self.getArray(), dtype=numpy.float64)
+        if weightArray.ndim != 2 or not weightArray.size:
+            return
+
+        locked_mask = self.getMapMask(locked, weightArray.shape[1])
+        scaled = self.getMapMask(maps, weightArray.shape[1]) & ~locked_mask
+        other = ~scaled & ~locked_mask
+
+        # the total we have to work with is whatever the locked maps leave
+        available = numpy.clip(1.0 - weightArray[:, locked_mask].sum(axis=1), 0.0, None)
+
+        scaled_weights = numpy.clip(weightArray[:, scaled] * value, 0.0, None)
+        scaled_total = scaled_weights.sum(axis=1)
+        over = scaled_total > available
+        scaled_weights[over] *= (available[over] / scaled_total[over])[:, None]
+        scaled_total = numpy.minimum(scaled_total, available)
+
+        # give whatever is left to the other maps in proportion to their weights
+        other_weights = weightArray[:, other]
+        other_total = other_weights.sum(axis=1)
+        old_total = weightArray[:, scaled].sum(axis=1) + other_total
+        remaining = numpy.clip(numpy.minimum(old_total, available) - scaled_total, 0.0, None)
+        has_weight = other_total > 0
+        other_weights[has_weight] *= (remaining[has_weight] / other_total[has_weight])[:, None]
+
+        weightArray[:, scaled] = scaled_weights
+        weightArray[:, other] = other_weights
+        self.setWeights(weightArray)
 
     def next(self):
         '''
@@ -153,6 +277,29 @@ class WeightObject(object):
             mapList = common.toList(maps)
             return [self.__weights[self.__maps.index(map)] for map in mapList if map in self.__maps]
 
+    def getArray(self):
+        '''
+        This will return the weights as one array with a row per component and a column per map.
+        If the weights were set from an array we return that array without copying it. Maps that
+        are shorter than the longest map are padded with zeros, and an empty array is returned
+        when there are no maps.
+
+        :return: Array of weights with a shape of (components, maps)
+        :type: numpy.ndarray
+        '''
+        if self.__array is not None:
+            return self.__array
+        if not self.__weights:
+            return numpy.zeros((0, 0))
+
+        lengths = [len(weights) for weights in self.__weights]
+        if min(lengths) == max(lengths):
+            return numpy.column_stack(self.__weights)
+        weightArray = numpy.zeros((max(lengths), len(self.__weights)))
+        for column, weights in enumerate(self.__weights):
+            weightArray[:len(weights), column] = weights
+        return weightArray
+
     # Set
     def setMaps(self, value):
         '''
@@ -168,9 +315,18 @@ class WeightObject(object):
         This will take in a value which should be a list of numpy arrays you want to in the order
         which you have given the maps. These two list should be the same length.
 
-        :param value: Must be a list of numpy arrays.
-        :type value: list
+        You can also pass in one array with a row per component and a column per map. The
+        weights for each map will be views into that array so nothing is copied.
+
+        :param value: Must be a list of numpy arrays or a 2D numpy array.
+        :type value: list | numpy.ndarray
         '''
+        self.__array = None
+        if isinstance(value, numpy.ndarray) and value.ndim == 2:
+            self.__array = value
+            self.__weights = [value[:, index] for index in range(value.shape[1])]
+            return
+
         weightList = common.toList(value)
         self.__weights = list()
         for weights in weightList:
@@ -179,3 +335,348 @@ class WeightObject(object):
                 continue
             self.__weights.append(numpy.array(weights))
 
+
+class SparseWeightObject(WeightObject):
+    '''
+    Class that contains maps and weights per map, stored in compressed sparse row form.
+    There is a row per component and a column per map. Only the non zero weights are stored
+    which is what we want for skinClusters where most of the weights are zero.
+
+    The weights are kept in three arrays:
+        indptr  - Where each row starts and ends in the indices and values arrays. (components + 1)
+        indices - The map index for each value.
+        values  - The weight values.
+    '''
+    def __init__(self, maps=list(), weights=list(), indptr=None, indices=None, values=None):
+        '''
+        This is the constructor for our sparse weightObject. You can either pass in dense weights
+        the same way you would for a WeightObject or the sparse arrays directly.
+
+        :param maps: List of maps that will have a corresponding column in the sparse weights
+        :type maps: list
+
+        :param weights: List of numpy array's storing influnce value per component
+        :type weights: list | numpy.ndarray
+
+        :param indptr: Array of where each row starts in the indices and values
+        :type indptr: numpy.ndarray
+
+        :param indices: Array of the map index for each value
+        :type indices: numpy.ndarray
+
+        :param values: Array of the weight values
+        :type values: numpy.ndarray
+        '''
+        self._indptr = numpy.zeros(1, dtype=numpy.int64)
+        self._indices = numpy.array([], dtype=numpy.int32)
+        self._values = numpy.array([], dtype=numpy.float64)
+        self._columnCount = 0
+        super(SparseWeightObject, self).__init__(maps, weights)
+
+        if indptr is not None:
+            self.setSparseWeights(indptr, indices, values)
+
+    def __add__(self, other):
+        '''
+        This will add two weight objects together and return a new sparse one
+        :param other: another weight object
+        :return: SparseWeightObject
+        '''
+        return self.__combine(other, 1.0)
+
+    def __sub__(self, other):
+        '''
+        This will subtract one weight object from another and return a new sparse one
+        :param other: The other weightObject
+        :return: subtracted SparseWeightObject
+        '''
+        return self.__combine(other, -1.0)
+
+    def __getitem__(self, key):
+        '''
+        This will return the map and weight at the given key
+        :param key: map name or index
+        :return: tuple
+        '''
+        map_list = self.getMaps()
+        if isinstance(key, int):
+            if map_list:
+                key = map_list[key]
+            else:
+                return ('', self.getArray()[:, key])
+        if key not in map_list:
+            print('Cannot find {} in this WeightObject. Please be sure to pass valid str or int'.format(key))
+            return ('', numpy.array([]))
+        return (str(key), self.getWeights(key)[0])
+
+    def __combine(self, other, sign):
+        '''
+        Adds or subtracts the maps that are in both weight objects without going dense.
+        The maps will be in the order of the other weight object.
+        '''
+        if not isinstance(other, WeightObject):
+            raise TypeError('{} is not a weight object. Must pass a WeightObject as type.'.format(other))
+        if not isinstance(other, SparseWeightObject):
+            other = SparseWeightObject(other.getMaps(), other.getWeights())
+        if other.getPointCount() != self.getPointCount():
+            raise ValueError('Both weight objects must have the same number of components.')
+
+        self_map_list = self.getMaps()
+        other_map_list = other.getMaps()
+        if other_map_list:
+            new_map_list = [map for map in other_map_list if map in self_map_list]
+            self_columns = [self_map_list.index(map) for map in new_map_list]
+            other_columns = [other_map_list.index(map) for map in new_map_list]
+        else:
+            new_map_list = list()
+            self_columns = [0]
+            other_columns = [0]
+
+        # remap both sets of entries to the new columns and stack them
+        rows = list()
+        columns = list()
+        values = list()
+        for weight_object, column_list, scale in [(self, self_columns, 1.0), (other, other_columns, sign)]:
+            lookup = numpy.full(max(weight_object.getColumnCount(), 1), -1, dtype=numpy.int64)
+            lookup[numpy.asarray(column_list, dtype=numpy.int64)] = numpy.arange(len(column_list))
+            new_columns = lookup[weight_object.getIndices()] if weight_object.getIndices().size else \
+                numpy.array([], dtype=numpy.int64)
+            keep = new_columns != -1
+            rows.append(weight_object.getRowIndices()[keep])
+            columns.append(new_columns[keep])
+            values.append(weight_object.getValues()[keep] * scale)
+
+        return _fromCoordinates(new_map_list,
+                                numpy.concatenate(rows),
+                                numpy.concatenate(columns),
+                                numpy.concatenate(values),
+                                self.getPointCount(),
+                                len(self_columns))
+
+    def normalize(self, maps=None, locked=None):
+        '''
+        This will normalize the weights so each component adds up to 1. If maps are passed in
+        only those maps will be scaled and the weights on every other map will stay as they are.
+        Weights on locked maps are never changed. Components that have no weight on the maps
+        being scaled are left alone.
+
+        If there is only one map there is nothing to normalize across so the weights are
+        clamped between 0 and 1.
+
+        :param maps: Maps you want to scale to normalize the weights.
+        :type maps: str | list
+
+        :param locked: Maps that are locked, or a boolean mask with a value per map.
+        :type locked: str | list | numpy.ndarray
+        '''
+        if self.getColumnCount() == 1:
+            self.clamp(locked=locked)
+            return
+
+        rows = self.getRowIndices()
+        point_count = self.getPointCount()
+        column_free = ~self.getMapMask(locked, self.getColumnCount())
+        if maps:
+            column_free &= self.getMapMask(maps, self.getColumnCount())
+        free = column_free[self._indices]
+
+        total = numpy.bincount(rows, weights=self._values, minlength=point_count)
+        free_total = numpy.bincount(rows[free], weights=self._values[free], minlength=point_count)
+        locked_total = total - free_total
+        scale = numpy.ones(point_count)
+        has_weight = free_total > 0
+        scale[has_weight] = numpy.clip(1.0 - locked_total[has_weight], 0.0, None) / free_total[has_weight]
+        # write to a copy, the values can be a read only map of a binary weight file
+        values = numpy.array(self._values, dtype=numpy.float64)
+        values[free] *= scale[rows[free]]
+        self._values = values
+
+    # Get
+    def getWeights(self, maps=None):
+        '''
+        This will return the list of dense weights for the maps. Only the columns asked
+        for are expanded.
+
+        :return: List of weights per map stored on this weight object
+        :type: list
+        '''
+        map_list = self.getMaps()
+        if not maps:
+            columns = range(self._columnCount)
+        else:
+            columns = [map_list.index(map) for map in common.toList(maps) if map in map_list]
+        array = self.getArray(columns)
+        return [array[:, index] for index in range(len(columns))]
+
+    def getArray(self, columns=None):
+        '''
+        This will convert the sparse weights to a dense array with a row per component and a
+        column per map.
+
+        :param columns: Map indices you want in the dense array. Default is all of them.
+        :type columns: list
+
+        :return: Array of weights with a shape of (components, maps)
+        :type: numpy.ndarray
+        '''
+        if columns is None:
+            columns = range(self._columnCount)
+        columns = list(columns)
+        array = numpy.zeros((self.getPointCount(), len(columns)))
+        if not columns or not self._values.size:
+            return array
+        lookup = numpy.full(self._columnCount, -1, dtype=numpy.int64)
+        lookup[columns] = numpy.arange(len(columns))
+        new_columns = lookup[self._indices]
+        keep = new_columns != -1
+        array[self.getRowIndices()[keep], new_columns[keep]] = self._values[keep]
+        return array
+
+    def getPointCount(self):
+        '''
+        :return: Number of components (rows)
+        :type: int
+        '''
+        return self._indptr.size - 1
+
+    def getColumnCount(self):
+        '''
+        :return: Number of maps (columns)
+        :type: int
+        '''
+        return self._columnCount
+
+    def getIndptr(self):
+        '''
+        :return: Where each component starts in the indices and values
+        :type: numpy.ndarray
+        '''
+        return self._indptr
+
+    def getIndices(self):
+        '''
+        :return: The map index for every value.
+        :type: numpy.ndarray
+        '''
+        return self._indices
+
+    def getValues(self):
+        '''
+        :return: The weight values.
+        :type: numpy.ndarray
+        '''
+        return self._values
+
+    def getRowIndices(self):
+        '''
+        :return: The component index for every value.
+        :type: numpy.ndarray
+        '''
+        return numpy.repeat(numpy.arange(self.getPointCount()), numpy.diff(self._indptr))
+
+    def toDense(self):
+        '''
+        This will return a dense WeightObject with the same maps and weights.
+
+        :return: WeightObject
+        '''
+        return WeightObject(maps=list(self.getMaps()), weights=self.getArray())
+
+    # Set
+    def setWeights(self, value, threshold=0.0):
+        '''
+        This will take in dense weights and store only the values that are above the threshold.
+        Empty arrays in a list of weights are stored as maps with no weight so the columns still
+        line up with the maps.
+
+        :param value: Must be a list of numpy arrays or a 2D numpy array.
+        :type value: list | numpy.ndarray
+
+        :param threshold: Weights at or below this value are not stored.
+        :type threshold: float
+        '''
+        if isinstance(value, numpy.ndarray) and value.ndim == 2:
+            array = value
+        else:
+            weightList = common.toList(value)
+            pointCount = max([len(weights) for weights in weightList] or [0])
+            if not pointCount:
+                self.setSparseWeights(numpy.zeros(1, dtype=numpy.int64), [], [], len(weightList))
+                return
+            array = numpy.zeros((pointCount, len(weightList)))
+            for column, weights in enumerate(weightList):
+                if len(weights):
+                    array[:, column] = weights
+
+        rows, columns = numpy.nonzero(numpy.abs(array) > threshold)
+        self.setSparseWeights(numpy.concatenate([[0], numpy.cumsum(numpy.bincount(rows, minlength=array.shape[0]))]),
+                              columns,
+                              array[rows, columns],
+                              array.shape[1])
+
+    def setSparseWeights(self, indptr, indices, values, columnCount=None):
+        '''
+        This will set the sparse arrays directly.
+
+        :param indptr: Array of where each row starts in the indices and values
+        :type indptr: numpy.ndarray | list
+
+        :param indices: Array of the map index for each value
+        :type indices: numpy.ndarray | list
+
+        :param values: Array of the weight values
+        :type values: numpy.ndarray | list
+
+        :param columnCount: Number of maps. Default is the length of the maps list.
+        :type columnCount: int
+        '''
+        self._indptr = numpy.asarray(indptr, dtype=numpy.int64)
+        self._indices = numpy.asarray(indices, dtype=numpy.int32)
+        self._values = numpy.asarray(values, dtype=numpy.float64)
+        if columnCount is None:
+            columnCount = max(len(self.getMaps()), 1)
+        self._columnCount = columnCount
+
+
+def _fromCoordinates(maps, rows, columns, values, pointCount, columnCount=None):
+    '''
+    This will build a sparse weight object from (row, column, value) entries. Entries with
+    the same row and column will be summed and zeros will be dropped.
+
+    :param maps: List of maps
+    :type maps: list
+
+    :param rows: Component index for each value
+    :type rows: numpy.ndarray
+
+    :param columns: Map index for each value
+    :type columns: numpy.ndarray
+
+    :param values: The weight values
+    :type values: numpy.ndarray
+
+    :param pointCount: Number of components
+    :type pointCount: int
+
+    :return: SparseWeightObject
+    '''
+    if columnCount is None:
+        columnCount = max(len(maps), 1)
+    rows = numpy.asarray(rows, dtype=numpy.int64)
+    columns = numpy.asarray(columns, dtype=numpy.int64)
+    values = numpy.asarray(values, dtype=numpy.float64)
+
+    # sum up duplicate entries and sort them by row then column
+    keys, inverse = numpy.unique(rows * columnCount + columns, return_inverse=True)
+    values = numpy.bincount(inverse, weights=values, minlength=keys.size)
+    keep = values != 0
+    keys = keys[keep]
+    values = values[keep]
+    rows = keys // columnCount
+
+    weight_object = SparseWeightObject(maps=maps)
+    weight_object.setSparseWeights(numpy.concatenate([[0], numpy.cumsum(numpy.bincount(rows, minlength=pointCount))]),
+                                   keys % columnCount,
+                                   values,
+                                   columnCount)
+    return weight_object
@@ -3,24 +3,40 @@ This will deal with getting, setting, importing, exporting weights.
 '''
 import maya.cmds as mc
 import maya.api.OpenMaya as om2
-# using this one for the MItGeometry 
-import maya.OpenMaya as OpenMaya
 
 import os
-import xml.etree.ElementTree as et
+import json
+import hashlib
+try:
+    import xml.etree.cElementTree as et
+except ImportError:
+    import xml.etree.ElementTree as et
+from collections import OrderedDict
 import numpy
 
 from openrig.shared import common
+from openrig.shared import spatial
+from openrig.shared import topology
 from openrig.maya import weightObject
 import openrig.maya.transform as rig_transform
 import openrig.maya.blendShape as rig_blendshape
 import openrig.maya.skinCluster as rig_skincluster
 import openrig.maya.shape as rig_shape
+import openrig.maya.symmetry as rig_symmetry
 import gzip
 import shutil
+import time
+import tempfile
+from multiprocessing.pool import ThreadPool
 
 BLENDWEIGHTS_ATTR = 'blendWeights'
+# number of threads used to read weight files ahead of the ones being applied and to unzip directories
+WTS_READ_THREADS = 4
 SKINCLUSTER_ATTRIBUTE_LIST = ['skinningMethod', BLENDWEIGHTS_ATTR, 'normalizeWeights']
+# file in the export directory with the hash of the weights for each file we've exported
+WTS_MANIFEST_FILENAME = 'wts_manifest.json'
+# bump this if what goes into the hash changes so every file gets exported again
+WTS_HASH_VERSION = 2
 
 def setWeights(deformer, weights, mapList=None, geometry=None):
     '''
@@ -55,6 +71,10 @@ def setWeights(deformer, weights, mapList=None, geometry=None):
     #       it needs to be shortened to match the pnt count.
     pnt_count = rig_shape.getPointCount(geometry) -1
 
+    # expand sparse weights once here, the dense weight object hands out views of the same array
+    if isinstance(weights, weightObject.SparseWeightObject):
+        weights = weights.toDense()
+
     # make sure we have the correct weights for what we're going to set.
     if isinstance(weights, (list, tuple)):
         weightList = [numpy.array(weights)]
@@ -66,19 +86,14 @@ def setWeights(deformer, weights, mapList=None, geometry=None):
         weightList = weights.getWeights()
 
     if mc.nodeType(deformer) == 'skinCluster':
-        # iterate through the mesh and set the values on each point
-        for mapIndex, inf in enumerate(mapList):
-            # find the inf index
-            infIndex = None
-            con = mc.listConnections(inf+'.worldMatrix[0]', p=True, d=True, s=False)
-            for c in con:
-                if deformer+'.matrix' in c:
-                    infIndex = c.split('[')[1][:-1]
-            if infIndex:
-                attr = '{}.wl[0:{}].w[{}]'.format(deformer, pnt_count, infIndex)
-                # Convert the numpy array to a list so it can be unpacked in setAttr
-                weights = weightList[mapIndex].tolist()
-                mc.setAttr(attr, *weights)
+        # use the array if it's already laid out the way the skinCluster wants it,
+        # otherwise stack the maps into columns so we can set them in one call.
+        if isinstance(weights, weightObject.WeightObject) and len(weightList) == len(mapList):
+            weightArray = weights.getArray()
+        else:
+            weightArray = numpy.column_stack(weightList[:len(mapList)])
+        rig_skincluster.setWeightArray(deformer, weightArray, influenceList=mapList,
+                                       shapeDagPath=geoDagPath, pointCount=pnt_count + 1)
     elif mc.nodeType(deformer) == 'blendShape':
         for map in mapList:
             #Get indexes
@@ -101,6 +116,91 @@ def setWeights(deformer, weights, mapList=None, geometry=None):
         weights = weightList[0].tolist()
         mc.setAttr(attr, *weights)
 
+def getGeometryInfo(deformer, geometry=None, cache=None):
+    '''
+    Resolve the shape the deformer weights live on. If you pass in a cache dictionary the shape
+    is only resolved once for each geometry, no matter how many deformers are on it.
+
+    :param deformer: Deformer name
+    :type deformer: str
+
+    :param geometry: Name of the geometry. If None we use the first geometry of the deformer.
+    :type geometry: str
+
+    :param cache: Dictionary to store the resolved geometry in and look it up from.
+    :type cache: dict
+
+    :returns: fullPathName, partialPathName, pointCount, MDagPath of the shape
+    :rtype: tuple
+    '''
+    key = geometry or ('__deformer__', deformer)
+    if cache is not None and key in cache:
+        return cache[key]
+
+    if geometry:
+        if not mc.objExists(geometry):
+            raise RuntimeError("{} doesn't exists in the current Maya session!".format(geometry))
+    else:
+        geometry = mc.deformer(deformer, q=True, g=True)[0]
+
+    # make sure we have the shape of the geometry
+    geoDagPath = rig_transform.getDagPath(geometry)
+    geoDagPath.extendToShape()
+    geometryFullPath = geoDagPath.fullPathName()
+    geometryInfo = (geometryFullPath, geoDagPath.partialPathName(), rig_shape.getPointCount(geometryFullPath),
+                    geoDagPath)
+
+    if cache is not None:
+        cache[key] = geometryInfo
+        cache[geometryFullPath] = geometryInfo
+
+    return geometryInfo
+
+
+def getWeightsBatch(deformerList, mapLists=None, cache=None):
+    '''
+    Gets weights for a list of deformers at once. Each geometry is only resolved once, so this is
+    what you want when you're gathering every deformer on a character.
+
+    ..example ::
+         weight_objects = getWeightsBatch([('blink_l_cluster', 'body_geo'), 'body_skinCluster'])
+
+    :param deformerList: Deformer names or (deformer, geometry) pairs.
+    :type deformerList: list
+
+    :param mapLists: A mapList for each deformer. None gets all of the maps for that deformer.
+    :type mapLists: list
+
+    :param cache: Dictionary of resolved geometry to share with getGeometryInfo.
+    :type cache: dict
+
+    :returns: A weight object for each deformer, in the same order.
+    :rtype: list
+    '''
+    if cache is None:
+        cache = dict()
+    if mapLists is None:
+        mapLists = [None] * len(deformerList)
+
+    # node types for all of the deformers in one call
+    deformerNames = [item if isinstance(item, basestring) else item[0] for item in deformerList]
+    typeList = mc.ls(deformerNames, showType=True) or list()
+    typeMap = dict(zip(typeList[::2], typeList[1::2]))
+    inheritedTypeMap = dict()
+
+    weightObjectList = list()
+    for item, mapList in zip(deformerList, mapLists):
+        deformer, geometry = (item, None) if isinstance(item, basestring) else item
+        deformerType = typeMap.get(deformer) or mc.nodeType(deformer)
+        if deformerType not in inheritedTypeMap:
+            inheritedTypeMap[deformerType] = mc.nodeType(deformer, i=True) or list()
+        geometryInfo = getGeometryInfo(deformer, geometry, cache)
+        weightObjectList.append(_getWeights(deformer, mapList, geometryInfo, deformerType,
+                                            inheritedTypeMap[deformerType]))
+
+    return weightObjectList
+
+
 def getWeights(deformer, mapList=None, geometry=None):
     '''
     Gets weights for specified deformers. Geo does not need to be specified unless the deformer has multiple goes.
@@ -113,65 +213,59 @@ def getWeights(deformer, mapList=None, geometry=None):
     :returns: Returns a weight object that you are able to use or manipulate.
     :rtype: WeightObject
     '''
+    return getWeightsBatch([(deformer, geometry)], mapLists=[mapList])[0]
+
+
+def _roundWeights(values, decimals):
+    '''
+    Convert the values to a numpy array, rounded unless decimals is None.
+    '''
+    if decimals is None:
+        return numpy.asarray(values, dtype=numpy.float64)
+    return numpy.round(values, decimals)
+
+
+def _getWeights(deformer, mapList, geometryInfo, deformerType, inheritedTypes, decimals=5):
+    '''
+    Gets the weights for a deformer on geometry that has already been resolved. The weights are
+    rounded to decimals, pass None to get them exactly as Maya has them.
+    '''
     weightList = list()
-    # make sure there is a mapList
-    if not mapList:
-        mapList = getMaps(deformer) or list()
-    if not isinstance(mapList, (list, tuple)):
+    if mapList and not isinstance(mapList, (list, tuple)):
         mapList = common.toList(mapList)
 
-    if geometry:
-        if not mc.objExists(geometry):
-            raise RuntimeError("{} doesn't exists in the current Maya session!".format(geometry))
-        # make sure we have the shape of the geometry for all deformers except the skinCluster
-        geoDagPath = rig_transform.getDagPath(geometry)
-        geoDagPath.extendToShape()
-        geometryFullPath = geoDagPath.fullPathName()
-    else:
-        # get the geometry and the iterator to use for looping through the mesh points for wts.
-        geometry = mc.deformer(deformer, q=True, g=True)[0]
-        geoDagPath = rig_transform.getDagPath(geometry)
-        geoDagPath.extendToShape()
-        geometryFullPath = geoDagPath.fullPathName()
+    geometryFullPath, geometryPartialPath, pnt_count, geoDagPath = geometryInfo
 
-    selList = OpenMaya.MSelectionList()
-    selList.add(geometryFullPath)
-    geoDagPath = OpenMaya.MDagPath()
-    selList.getDagPath(0, geoDagPath)
-    geoIterator = OpenMaya.MItGeometry(geoDagPath)
+    if deformerType == 'skinCluster':
+        # get the whole weight matrix in one call and round to 5 decimals in place
+        weightArray, influenceList = rig_skincluster.getWeightArray(deformer, shapeDagPath=geoDagPath,
+                                                                    pointCount=pnt_count)
+        if decimals is not None:
+            numpy.round(weightArray, decimals, out=weightArray)
 
-    # Get point count
-    pnt_count = rig_shape.getPointCount(geometry) -1
+        # if we want every influence in the order the skinCluster has them we can
+        # wrap the array as is. Otherwise we pull out the columns for the maps we want.
+        if not mapList or list(mapList) == influenceList:
+            return weightObject.WeightObject(maps=influenceList, weights=weightArray)
+        weightList = [numpy.array([]) for map_ in mapList]
+        for map_index, inf in enumerate(mapList):
+            if inf in influenceList:
+                weightList[map_index] = weightArray[:, influenceList.index(inf)]
+        return weightObject.WeightObject(maps=mapList, weights=weightList)
+
+    # only skinClusters have maps we can look up, the other deformers need them passed in
+    if not mapList:
+        mapList = list()
+
+    # Get the last point index
+    pnt_count -= 1
 
     if not mapList:
         weightList = [numpy.array([])]
     else:
         weightList = [numpy.array([]) for map_ in mapList]
 
-    if mc.nodeType(deformer) == 'skinCluster':
-        for inf in mapList:
-            # get the connections so we can get to the weight list
-            infIndex = None
-            con = mc.listConnections('{}.worldMatrix[0]'.format(inf), p=True, d=True, s=False)
-            for c in con:
-                if deformer+'.matrix' in c:
-                    infIndex = c.split('[')[1][:-1]
-            if infIndex:
-                map_index = mapList.index(inf)
-                attr = '{}.wl[0:{}].w[{}]'.format(deformer, pnt_count, infIndex)
-                values = mc.getAttr(attr)
-                # Convert to numpy array and round to 5 decimals
-                values = numpy.round(values, 5)
-                weightList[map_index] = values
-
-    elif mc.nodeType(deformer) == 'blendShape':
-        # iterate over the geometry
-        geometryindex = 0
-
-        geoList = mc.ls(mc.deformer(deformer, q=True, geometry=True), l=True)
-        if geoList and geometryFullPath in geoList:
-            geometryindex = geoList.index(geometryFullPath)
-
+    if deformerType == 'blendShape':
         for map in mapList:
             # Get blendshape target index
             targetIndex = rig_blendshape.getTargetIndex(deformer, map)
@@ -192,12 +286,12 @@ def getWeights(deformer, mapList=None, geometry=None):
                 # Valid values exist, get them
                 values = mc.getAttr(attr)
                 # Convert to numpy array and round to 5 decimals
-                values = numpy.round(values, 5)
+                values = _roundWeights(values, decimals)
 
             # Add array to weightList
             weightList[map_index] = values
 
-    elif 'weightGeometryFilter' in mc.nodeType(deformer, i=True):
+    elif 'weightGeometryFilter' in inheritedTypes:
         geoList = mc.ls(mc.deformer(deformer,q=True, geometry=True), l=True)
 
         if geoList and geometryFullPath in geoList:
@@ -217,14 +311,15 @@ def getWeights(deformer, mapList=None, geometry=None):
             # Valid values exist, get them
             values = mc.getAttr(attr)
             # Convert to numpy array and round to 5 decimals
-            values = numpy.round(values, 5)
+            values = _roundWeights(values, decimals)
 
         # Add array to weightList
         weightList[0] = values
 
     return weightObject.WeightObject(maps=mapList, weights=weightList)
 
-def mirrorWeights(sourceDeformer, sourceGeometry, destinationDeformer=None, destinationGeometry=None, mapList=None, posVector=(-1, 1, 1)):
+def mirrorWeights(sourceDeformer, sourceGeometry, destinationDeformer=None, destinationGeometry=None, mapList=None, posVector=(-1, 1, 1),
+                  centerEdge=None):
     '''
     Mirror weights
     This will mirror the weights for the given deformer and maps. If the deformer doesn't have a mirror name then
@@ -240,6 +335,9 @@ def mirrorWeights(sourceDeformer, sourceGeometry, destinationDeformer=None, dest
     :type geometry: str
     :param posVector: Direction you want to mirror the weights.
     :type posVector: str
+    :param centerEdge: Edge on the center line. If given we walk the topology from this edge to find
+                       the mirrored points instead of using their position.
+    :type centerEdge: int | str | tuple
     '''
     if sourceGeometry:
         if not mc.objExists(sourceGeometry):
@@ -250,7 +348,7 @@ def mirrorWeights(sourceDeformer, sourceGeometry, destinationDeformer=None, dest
         geometryFullPath = geoDagPath.fullPathName()
     else:
         # get the geometry and the iterator to use for looping through the mesh points for wts.
-        sourceGeometry = mc.deformer(deformer, q=True, g=True)[0]
+        sourceGeometry = mc.deformer(sourceDeformer, q=True, g=True)[0]
         geoDagPath = rig_transform.getDagPath(sourceGeometry)
         geoDagPath.extendToShape()
         geometryFullPath = geoDagPath.fullPathName()
@@ -287,51 +385,35 @@ def mirrorWeights(sourceDeformer, sourceGeometry, destinationDeformer=None, dest
 
     destination_geoPointArray = destination_geoMFnMesh.getPoints(om2.MSpace.kWorld)
 
+    if not destinationDeformer:
+        destinationDeformer = common.getMirrorName(sourceDeformer) or sourceDeformer
+
     weight_object = getWeights(sourceDeformer, mapList, geometryFullPath)
-    # put each point to a list
-    weight_list = weight_object.getWeights()
-    map_list = weight_object.getMaps()
+    weight_array = weight_object.getArray()
     point_list = numpy.asarray(geoPointArray[:])
     destination_point_list = numpy.asarray(destination_geoPointArray[:])
-    weight_list_array = list()
-    # make the posVector an array
-    new_pos_vector = numpy.asarray(posVector + tuple([1]))
-    # since we don't have a map for envelope, we will set this to be
-    if not map_list:
-        map_list.append(1)
-
-    for map_index in range(len(map_list)):
-        new_weight_list = numpy.zeros(len(geoPointArray))
-        value_id_list = numpy.where(weight_list[map_index] > .001)[0]
-        value_point_list = numpy.take(point_list, axis=0, indices=value_id_list)
-        mirrored_point_list = value_point_list * new_pos_vector
-
-        mirrored_weight_id_list = list()
-        for point in mirrored_point_list:
-            deltas = destination_point_list - point
-            dist_2 = numpy.einsum('ij,ij->i', deltas, deltas)
-            mirrored_weight_id_list.append(numpy.argmin(dist_2))
-
-        if not destinationDeformer:
-            destinationDeformer = common.getMirrorName(sourceDeformer) or sourceDeformer
-
-        # get mirrored deformer
-        numpy.put(new_weight_list, mirrored_weight_id_list, numpy.take(weight_list[map_index], indices=value_id_list))
-
-        # get mirrored deformer
-        if destinationDeformer == sourceDeformer:
-            from_id_list = numpy.where(numpy.take(numpy.array(destination_point_list), axis=1, indices=0) >= 0.00)[0]
-
-            for i in value_id_list:
-                if i in from_id_list:
-                    new_weight_list[i] = weight_list[map_index][i]
-        weight_list_array.append(new_weight_list)
-    new_weight_object = weightObject.WeightObject(maps=mapList, weights=weight_list_array)
+
+    # when we stay on the same mesh we can use the cached symmetry map
+    mirror_map = None
+    if destination_geometryFullPath == geometryFullPath and mc.nodeType(geometryFullPath) == 'mesh':
+        mirror_map = rig_symmetry.getSymmetryMap(geometryFullPath, posVector, centerEdge=centerEdge)[0]
+
+    new_weight_array = _mirrorWeightArray(weight_array, point_list, destination_point_list, posVector,
+                                          mirrorMap=mirror_map)
+
+    # when we mirror onto the same deformer keep the weights that are already on the positive side
+    if destinationDeformer == sourceDeformer:
+        point_count = min(len(weight_array), len(destination_point_list))
+        keep_mask = weight_array[:point_count] > .001
+        keep_mask &= (destination_point_list[:point_count, 0] >= 0.00)[:, None]
+        new_weight_array[:point_count][keep_mask] = weight_array[:point_count][keep_mask]
+
+    new_weight_object = weightObject.WeightObject(maps=mapList, weights=new_weight_array)
 
     if mc.objExists(destinationDeformer):
         setWeights(destinationDeformer, new_weight_object, geometry=destination_geometryFullPath)
 
-def flipWeights(deformer, mapList=None, geometry=None, posVector=(-1, 1, 1)):
+def flipWeights(deformer, mapList=None, geometry=None, posVector=(-1, 1, 1), centerEdge=None):
     '''
     Mirror weights
     This will mirror the weights for the given deformer and maps. If the deformer doesn't have a mirror name then
@@ -347,6 +429,9 @@ def flipWeights(deformer, mapList=None, geometry=None, posVector=(-1, 1, 1)):
     :type geometry: str
     :param posVector: Direction you want to mirror the weights.
     :type posVector: str
+    :param centerEdge: Edge on the center line. If given we walk the topology from this edge to find
+                       the mirrored points instead of using their position.
+    :type centerEdge: int | str | tuple
     '''
     if geometry:
         if not mc.objExists(geometry):
@@ -374,36 +459,65 @@ def flipWeights(deformer, mapList=None, geometry=None, posVector=(-1, 1, 1)):
     geoPointArray = geoMFnMesh.getPoints(om2.MSpace.kWorld)
 
     weight_object = getWeights(deformer, mapList, geometryFullPath)
-    # put each point to a list
-    weight_list = weight_object.getWeights()
-    map_list = weight_object.getMaps()
-    weight_list_array = list()
     point_list = numpy.asarray(geoPointArray[:])
-    new_pos_vector = numpy.asarray(posVector + tuple([1]))
-    # since we don't have a map for envelope, we will set this to be
-    if not map_list:
-        map_list.append(1)
-    for map_index in range(len(map_list)):
-        new_weight_list = numpy.zeros(len(geoPointArray))
-        value_id_list = numpy.where(weight_list[map_index] > .001)[0]
-        value_point_list = numpy.take(point_list, axis=0, indices=value_id_list)
-        mirrored_point_list = value_point_list * new_pos_vector
-
-        mirrored_weight_id_list = list()
-        for point in mirrored_point_list:
-            deltas = point_list - point
-            dist_2 = numpy.einsum('ij,ij->i', deltas, deltas)
-            mirrored_weight_id_list.append(numpy.argmin(dist_2))
-
-        # get mirrored deformer
-        numpy.put(new_weight_list, mirrored_weight_id_list, numpy.take(weight_list[map_index], indices=value_id_list))
-
-        weight_list_array.append(new_weight_list)
+    mirror_map = None
+    if mc.nodeType(geometryFullPath) == 'mesh':
+        mirror_map = rig_symmetry.getSymmetryMap(geometryFullPath, posVector, centerEdge=centerEdge)[0]
+    new_weight_array = _mirrorWeightArray(weight_object.getArray(), point_list, point_list, posVector,
+                                          mirrorMap=mirror_map)
 
     # create the new weight object and set the weights.
-    new_weight_object = weightObject.WeightObject(maps=mapList, weights=weight_list_array)
+    new_weight_object = weightObject.WeightObject(maps=mapList, weights=new_weight_array)
     setWeights(deformer, new_weight_object, geometry=geometryFullPath)
 
+def _mirrorWeightArray(weightArray, pointArray, destinationPointArray, posVector=(-1, 1, 1), mirrorMap=None):
+    '''
+    Mirror a (points, maps) weight array from pointArray onto destinationPointArray. Only the
+    points that have a weight above .001 in any map are mirrored, and the closest destination
+    point for each of those is found once with a grid lookup and shared by all of the maps.
+    If you pass in a mirrorMap we use that instead of looking up the closest points.
+
+    :param weightArray: Array of weights with a row per point and a column per map.
+    :type weightArray: numpy.ndarray
+
+    :param pointArray: Points the weights are on.
+    :type pointArray: numpy.ndarray
+
+    :param destinationPointArray: Points we're mirroring the weights onto.
+    :type destinationPointArray: numpy.ndarray
+
+    :param posVector: Direction you want to mirror the weights.
+    :type posVector: tuple
+
+    :param mirrorMap: Mirrored destination point index for every point.
+    :type mirrorMap: numpy.ndarray
+
+    :return: Mirrored weight array with a row per destination point.
+    :rtype: numpy.ndarray
+    '''
+    weightArray = numpy.asarray(weightArray)
+    if weightArray.ndim == 1:
+        weightArray = weightArray[:, None]
+    new_weight_array = numpy.zeros((len(destinationPointArray), weightArray.shape[1]))
+
+    rows, columns = numpy.nonzero(weightArray > .001)
+    if not rows.size:
+        return new_weight_array
+
+    if mirrorMap is not None:
+        mirror_map = numpy.asarray(mirrorMap)
+    else:
+        value_id_list = numpy.unique(rows)
+        mirrored_point_list = pointArray[value_id_list, :3] * numpy.asarray(posVector, dtype=numpy.float64)
+        mirrored_id_list = spatial.closestPoints(destinationPointArray, mirrored_point_list)[0]
+        mirror_map = numpy.zeros(len(weightArray), dtype=numpy.int64)
+        mirror_map[value_id_list] = mirrored_id_list
+
+    # map every weighted point to its mirrored point and scatter the values across
+    new_weight_array[mirror_map[rows], columns] = weightArray[rows, columns]
+
+    return new_weight_array
+
 def isDefault(deformer, map):
     '''
     Querys if any user defined values have been set for the map.
@@ -447,10 +561,93 @@ def getMaps(deformer):
     elif mc.nodeType(deformer) == "cluster":
         return None
 
-def exportWeights(geometry, deformer, directory):
+def getWeightsHash(deformer, geometry):
+    '''
+    Hash the weights of a deformer on the given geometry, and the attributes we export with them.
+    This is used to tell if the weights have changed since they were last exported.
+
+    :param deformer: The deformer you want to hash the weights for.
+    :type deformer: str
+
+    :param geometry: The geometry you want to hash the weights for.
+    :type geometry: str
+
+    :return: Hex digest of the hash
+    :rtype: str
+    '''
+    sha = hashlib.sha1()
+    sha.update(str(WTS_HASH_VERSION))
+
+    deformerType = mc.nodeType(deformer)
+    mapList = None
+    if deformerType == 'blendShape':
+        mapList = mc.listAttr('{}.w'.format(deformer), m=True) or list()
+    # hash the weights before they're rounded so small edits still change the hash
+    geometryInfo = getGeometryInfo(deformer, geometry)
+    weight_object = _getWeights(deformer, mapList, geometryInfo, deformerType,
+                                mc.nodeType(deformer, i=True) or list(), decimals=None)
+
+    sha.update(repr(weight_object.getMaps()))
+    for weights in weight_object.getWeights():
+        weights = numpy.ascontiguousarray(weights, dtype=numpy.float64)
+        sha.update(str(weights.shape))
+        sha.update(weights.tostring())
+
+    if deformerType == 'skinCluster':
+        for attr in SKINCLUSTER_ATTRIBUTE_LIST:
+            sha.update(repr(mc.getAttr('{}.{}'.format(deformer, attr))))
+    elif deformerType == 'blendShape':
+        # the export writes the base weights of the blendShape as well as the target weights
+        pnt_count = geometryInfo[2]
+        if mc.objExists('{}.it[0].bw[*]'.format(deformer)):
+            values = numpy.asarray(mc.getAttr('{}.it[0].bw[0:{}]'.format(deformer, pnt_count - 1)),
+                                   dtype=numpy.float64)
+        else:
+            values = numpy.ones(pnt_count)
+        sha.update('baseWeights')
+        sha.update(values.tostring())
+
+    return sha.hexdigest()
+
+def readWtsManifest(directory):
+    '''
+    Read the manifest of weight hashes in the directory.
+
+    :param directory: The directory the weights are exported to.
+    :type directory: str
+
+    :return: Dictionary of filename: hash
+    :rtype: dict
+    '''
+    filepath = os.path.join(directory, WTS_MANIFEST_FILENAME)
+    if not os.path.isfile(filepath):
+        return dict()
+    try:
+        with open(filepath, 'r') as f:
+            return json.load(f)
+    except ValueError:
+        # if it's corrupt we just export everything again
+        return dict()
+
+def writeWtsManifest(directory, manifest):
+    '''
+    Write the manifest of weight hashes to the directory.
+
+    :param directory: The directory the weights are exported to.
+    :type directory: str
+
+    :param manifest: Dictionary of filename: hash
+    :type manifest: dict
+    '''
+    with open(os.path.join(directory, WTS_MANIFEST_FILENAME), 'w') as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+
+def exportWeights(geometry, deformer, directory, incremental=False):
     '''
     This will export weights for the given deformer into the given directory.
     If the directory doesn't exists. It will create the full path.
+    If incremental is on we hash the weights and only export the files that have changed since the
+    last export. The hashes are kept in a manifest file (WTS_MANIFEST_FILENAME) in the directory.
     .. example::
         exportWeights("body_geo",
             "body_geo_skinCluster",
@@ -469,6 +666,10 @@ def exportWeights(geometry, deformer, directory):
     :type deformer: str | list
     :param directory: The directory you wish to store the deformers passed.
     :type directory: str
+    :param incremental: Skip the files whose weights haven't changed since they were last exported.
+    :type incremental: bool
+    :return: The files that were exported.
+    :rtype: list
     '''
     # importing pubs.ui so we can get the maya main window widget.
     # make sure that we have a list for the rest of the function to work properly
@@ -480,7 +681,11 @@ def exportWeights(geometry, deformer, directory):
     if not os.path.isdir(directory):
         os.makedirs(directory, 755)
     if not deformerList or not geoList:
-        return
+        return files_saved
+    # the manifest is kept up to date on every export so an incremental export never trusts a hash
+    # from before a full export rewrote the file
+    manifest = readWtsManifest(directory)
+    manifest_changed = False
     # here we will loop through all of the the deformers and geometry and export the files
     # to the given directory.
     for geo in geoList:
@@ -500,6 +705,17 @@ def exportWeights(geometry, deformer, directory):
                 skipGeo = list(set(shapes).difference(set([geoShape])))
                 # this is where we will export the weights.
                 file_name = "{}__{}.xml".format(mc.listRelatives(geoShape, p=True)[0], deformer)
+                if incremental:
+                    weights_hash = getWeightsHash(deformer, dagPath.fullPathName())
+                    file_exists = getWtsFilepath(os.path.join(directory, file_name)) is not None
+                    if file_exists and manifest.get(file_name) == weights_hash:
+                        print('Weights have not changed, skipping {}'.format(file_name))
+                        continue
+                    manifest[file_name] = weights_hash
+                    manifest_changed = True
+                elif manifest.pop(file_name, None) is not None:
+                    # we didn't hash these weights, so the next incremental export has to write them
+                    manifest_changed = True
                 if mc.nodeType(deformer) == 'skinCluster':
 
                     mc.deformerWeights(file_name,
@@ -515,12 +731,17 @@ def exportWeights(geometry, deformer, directory):
                                         deformer=deformer,
                                         path=directory)
                 files_saved.append(r'{}/{}'.format(directory, file_name))
-    if files_saved:
-        return files_saved
+    if manifest_changed:
+        writeWtsManifest(directory, manifest)
 
-def importWeights(geometry, deformer, filepath):
+    return files_saved
+
+def importWeights(geometry, deformer, filepath, wtsData=None):
     '''
     This will import weights for the given deformer into the given directory.
+    skinClusters, blendShapes and other deformers with weight maps are read with our own parser
+    and set in one call, everything else goes through deformerWeights. Zipped files (.gz) are read
+    directly, deformerWeights can't read them so they're skipped for deformers without weight maps.
     .. example::
         importWeights("body_geo",
             "cluster1",
@@ -536,6 +757,8 @@ def importWeights(geometry, deformer, filepath):
     :type deformer: str
     :param filepath: The filepath you want to use for the weights.
     :type filepath: str
+    :param wtsData: The file already read with readWtsXml. If None we will read the file.
+    :type wtsData: dict
     '''
     if not os.path.isfile(filepath):
         raise RuntimeError("{} is not an existing filepath.".format(filepath))
@@ -560,98 +783,386 @@ def importWeights(geometry, deformer, filepath):
     geoShape = dagPath.partialPathName()
 
     # get the difference between the deformer and the deformers influenced by
-    if geoShape in shapes:
-        skipGeo = ";".join(list(set(shapes).difference(set([geoShape]))))
+    skipGeo = ";".join(list(set(shapes).difference(set([geoShape]))))
 
     #import the weights for the given deformer and filepath
     try:
-        if mc.nodeType(deformer) == 'skinCluster':
-            attribute_list = [attr for attr in SKINCLUSTER_ATTRIBUTE_LIST if attr != BLENDWEIGHTS_ATTR]
-            mc.deformerWeights(filename,
-                               im=True,
-                               deformer=deformer,
-                               skip=skipGeo,
-                               path=directory,
-                               at=attribute_list)
-            # if the blend map is in the xml file we will make sure to apply it properly, for
-            # some reason maya's import isn't doing it correctly. We will remove once we know it works.
-            tree = et.parse(filepath)
-            root = tree.getroot()
-            # create skinCluster deformer if it doesn't exist in the current session.
-            for deformer_tag in root.findall('deformer'):
-                for attr in deformer_tag.findall('attribute'):
-                    if attr.get('name') == BLENDWEIGHTS_ATTR:
-                        value = [float(v) for v in attr.get('value').split(' ')]
-                        multi = [int(v) for v in attr.get('multi').split(' ')]
-                        for v, i in zip(value, multi):
-                            mc.setAttr('{}.{}[{}]'.format(deformer, BLENDWEIGHTS_ATTR, i), v)
-        else:
-            mc.deformerWeights(filename,
-                               im=True,
-                               deformer=deformer,
-                               skip=skipGeo,
-                               path=directory)
+        deformerType = mc.nodeType(deformer)
+        if deformerType == 'skinCluster':
+            _setSkinClusterWtsData(deformer, dagPath.fullPathName(), wtsData or readWtsXml(filepath))
+            return True
+        if deformerType == 'blendShape':
+            _setBlendShapeWtsData(deformer, dagPath.fullPathName(), wtsData or readWtsXml(filepath))
+            return True
+        if 'weightGeometryFilter' in mc.nodeType(deformer, i=True):
+            _setDeformerWtsData(deformer, dagPath.fullPathName(), wtsData or readWtsXml(filepath))
+            return True
+
+        if filepath.endswith('.gz'):
+            mc.warning("deformerWeights can't read zipped files, unzip [ {} ] to load it onto [ {} ]".format(
+                filepath, deformer))
+            return False
+        mc.deformerWeights(filename,
+                           im=True,
+                           deformer=deformer,
+                           skip=skipGeo,
+                           path=directory)
         return True
     except:
         print "\ncouldn't apply {} to {}".format(filename, deformer)
 
 def unzipWts(filepath):
+    '''
+    Unzip a .gz file next to itself. The unzipped file is given the modified time of the zipped
+    file, so it's only unzipped again once the zipped file is newer than it. An unzipped file that
+    was edited after it was unzipped is newer than the zipped file and is left alone.
 
-    # Unzip
-    #       Compare when the zip file was written, if it is more than a minute newer
-    #       than the non-zipped, unzip. If no un-zipped file exists it will unzip
-    #       because of the large default diff_time.
-    unzip = False
-    diff_time = 10000
-    filepath_nonzip = filepath.replace('.gz', '')
+    :param filepath: Path to the .gz file
+    :type filepath: str
+    '''
+    if not os.path.isfile(filepath):
+        return
+    filepath_nonzip = filepath[:-3] if filepath.endswith('.gz') else filepath
     filename = os.path.basename(filepath)
+    zip_mtime = os.stat(filepath).st_mtime
+    if os.path.isfile(filepath_nonzip) and os.stat(filepath_nonzip).st_mtime >= zip_mtime:
+        print('No need to unzip, [ {} ] is up to date'.format(filename))
+        return
 
-    if os.path.exists(filepath) and os.path.exists(filepath_nonzip):
-        diff_time = os.stat(filepath).st_mtime - os.stat(filepath_nonzip).st_mtime
-
-    # Always unzip if the unzipped file does not exist
-    if not os.path.exists(filepath_nonzip):
-        print ('unzipping - unzipped file does not exist', filename)
-        unzip = True
-    # Unzipped file exists, only unzip if zipped file is newer
-    elif diff_time > 60.0:
-        print ('unzipping - zip file is newer than non-zipped file', filename)
-        unzip = True
-
-    if unzip:
-        if os.path.exists(filepath):
-            with gzip.open(filepath, 'rb') as f:
-                file_content = f.read()
-                # Write uncompressed file
-                g = open(filepath_nonzip, 'w')
-                g.write(file_content)
-                g.close()
-    else:
-        print('No need to unzip, file is update date', filename)
-
-def unzipWtsDir(directory):
-
+    print('unzipping [ {} ]'.format(filename))
+    # stream it out so we never hold the whole file in memory, and unzip next to the file so
+    # nothing reads a half written file
+    temp_filepath = filepath_nonzip + '.tmp'
+    with gzip.open(filepath, 'rb') as f:
+        with open(temp_filepath, 'wb') as g:
+            shutil.copyfileobj(f, g)
+    os.utime(temp_filepath, (zip_mtime, zip_mtime))
+    # windows can't rename over an existing file
+    if os.name == 'nt' and os.path.isfile(filepath_nonzip):
+        os.remove(filepath_nonzip)
+    os.rename(temp_filepath, filepath_nonzip)
+
+def unzipWtsDir(directory, threads=None):
+    '''
+    Unzip all of the .gz files in the directories next to themselves. The files are unzipped in
+    parallel. The loaders in this module read .gz files directly, so this is only needed when
+    something else has to read the files.
+
+    :param directory: Directory or list of directories with zipped weight files.
+    :type directory: str | list
+    :param threads: Number of threads to unzip with. Default is WTS_READ_THREADS
+    :type threads: int
+    '''
     directory_list = common.toList(directory)
-    # loop through all of the files in the directory and make sure they're weights files.
-    loadedFiles = ''
 
     # Comp files
     files_comped = common.compDirFiles(directory_list)
 
-    # Reverse comped files to ensure top directory files are applied last
-    files_comped.reverse()
-    directory_list.reverse()
-
+    filepath_list = list()
     for i in range(len(directory_list)):
-        directory = directory_list[i]
-        dir_name = directory.split('/')[-1]
-
         for filename in files_comped[i]:
             if filename.endswith('.gz'):
-                filepath = '{}/{}'.format(directory, filename)
-                unzipWts(filepath)
+                filepath_list.append('{}/{}'.format(directory_list[i], filename))
+
+    if not filepath_list:
+        return
 
-def applyWtsDir(directory, includeFilter=None, excludeFilter=None):
+    pool = ThreadPool(threads or WTS_READ_THREADS)
+    try:
+        pool.map(unzipWts, filepath_list)
+    finally:
+        pool.close()
+        pool.join()
+
+def getWtsFilepath(filepath):
+    '''
+    Get the file we should read for a weight file. If there is a zipped version of the file that
+    is newer than it, or the file doesn't exist, we return the zipped file.
+
+    :param filepath: Path to the uncompressed file. i.e. body_geo__body_geo_skinCluster.xml
+    :type filepath: str
+
+    :return: The path to read, or None if neither file exists.
+    :rtype: str
+    '''
+    zip_filepath = filepath + '.gz'
+    if not os.path.isfile(zip_filepath):
+        return filepath if os.path.isfile(filepath) else None
+    if not os.path.isfile(filepath):
+        return zip_filepath
+    if os.stat(zip_filepath).st_mtime > os.stat(filepath).st_mtime:
+        return zip_filepath
+
+    return filepath
+
+def _unzipToTemp(filepath):
+    '''
+    Unzip a file into a new temp directory for the Maya commands that can only read files
+    from disk. This is only used for the .shp files written by the blendShape command, the
+    other files are read straight from the .gz. The caller should remove the directory when
+    it's done with the file.
+
+    :param filepath: Path to the .gz file
+    :type filepath: str
+
+    :return: Path to the uncompressed file in the temp directory.
+    :rtype: str
+    '''
+    temp_filepath = os.path.join(tempfile.mkdtemp(prefix='openrig_wts_'), os.path.basename(filepath)[:-3])
+    with gzip.open(filepath, 'rb') as f:
+        with open(temp_filepath, 'wb') as g:
+            shutil.copyfileobj(f, g)
+
+    return temp_filepath
+
+def readWtsXml(filepath):
+    '''
+    Stream parse a deformerWeights xml file into numpy arrays. The elements are cleared from the
+    root as we go so we never hold the whole tree in memory, and the shape points are skipped.
+    Zipped files (.gz) are decompressed as they're read.
+
+    The data returned looks like this:
+        shape      - Name of the shape in the file
+        deformer   - Name of the deformer the weights were exported from
+        pointCount - Number of points on the shape
+        sources    - Influences or maps in the order they're in the file, one per weights element.
+        weights    - OrderedDict of source: {'indices', 'values', 'defaultValue', 'layer'}
+        attributes - OrderedDict of deformer attribute name: (multi indices, values)
+
+    :param filepath: Path to the xml or xml.gz file
+    :type filepath: str
+
+    :return: Dictionary with the data in the file.
+    :rtype: dict
+    '''
+    data = {'shape': None,
+            'deformer': None,
+            'pointCount': 0,
+            'sources': list(),
+            'weights': OrderedDict(),
+            'attributes': OrderedDict()}
+
+    index_list = list()
+    value_list = list()
+    in_weights = False
+    root = None
+    source_file = gzip.open(filepath, 'rb') if filepath.endswith('.gz') else open(filepath, 'rb')
+    try:
+        for event, element in et.iterparse(source_file, events=('start', 'end')):
+            tag = element.tag
+            if event == 'start':
+                if root is None:
+                    root = element
+                elif tag == 'weights':
+                    in_weights = True
+                    index_list = list()
+                    value_list = list()
+                continue
+
+            if tag == 'point':
+                # shape points are the positions, we only want the points inside of weights
+                if in_weights:
+                    index_list.append(element.get('index'))
+                    value_list.append(element.get('value'))
+            elif tag == 'weights':
+                source = element.get('source')
+                data['sources'].append(source)
+                data['weights'][source] = {'indices': numpy.array(index_list, dtype=numpy.int64),
+                                           'values': numpy.array(value_list, dtype=numpy.float64),
+                                           'defaultValue': float(element.get('defaultValue', 0.0)),
+                                           'layer': int(element.get('layer', 0))}
+                data['shape'] = data['shape'] or element.get('shape')
+                data['deformer'] = data['deformer'] or element.get('deformer')
+                in_weights = False
+                # cleared elements are still children of the root until we clear it as well
+                element.clear()
+                root.clear()
+                continue
+            elif tag == 'shape':
+                data['shape'] = element.get('name')
+                data['pointCount'] = int(element.get('size', 0))
+            elif tag == 'attribute':
+                values = numpy.array(element.get('value', '').split(), dtype=numpy.float64)
+                multi = element.get('multi')
+                multi = numpy.array(multi.split(), dtype=numpy.int64) if multi else None
+                data['attributes'][element.get('name')] = (multi, values)
+            else:
+                continue
+            element.clear()
+    finally:
+        source_file.close()
+
+    return data
+
+def getDenseWeights(sourceData, pointCount):
+    '''
+    Expand the weights read from the xml for one source into a value per point.
+
+    :param sourceData: One of the weights entries from readWtsXml.
+    :type sourceData: dict
+
+    :param pointCount: Number of points on the geometry.
+    :type pointCount: int
+
+    :return: Weight for every point
+    :rtype: numpy.ndarray
+    '''
+    weights = numpy.full(pointCount, sourceData['defaultValue'])
+    keep = sourceData['indices'] < pointCount
+    weights[sourceData['indices'][keep]] = sourceData['values'][keep]
+
+    return weights
+
+def _setSkinClusterWtsData(skinCluster, geometry, wtsData):
+    '''
+    Set the weights and the skinCluster attributes read with readWtsXml. All of the weights are
+    set with one call and influences that aren't in the file are set to zero.
+
+    :param skinCluster: The skinCluster to set the weights on.
+    :type skinCluster: str
+
+    :param geometry: The geometry the weights are for.
+    :type geometry: str
+
+    :param wtsData: Data returned from readWtsXml.
+    :type wtsData: dict
+    '''
+    influenceList = mc.skinCluster(skinCluster, q=True, inf=True)
+    pointCount = rig_shape.getPointCount(geometry)
+
+    missing_list = [source for source in wtsData['sources'] if source not in influenceList]
+    if missing_list:
+        mc.warning('{} are not influences of {}'.format(missing_list, skinCluster))
+
+    weightArray = numpy.zeros((pointCount, len(influenceList)))
+    for column, inf in enumerate(influenceList):
+        if inf in wtsData['weights']:
+            weightArray[:, column] = getDenseWeights(wtsData['weights'][inf], pointCount)
+    rig_skincluster.setWeightArray(skinCluster, weightArray, influenceList=influenceList, geometry=geometry)
+
+    for attr in SKINCLUSTER_ATTRIBUTE_LIST:
+        if attr not in wtsData['attributes']:
+            continue
+        multi, values = wtsData['attributes'][attr]
+        if attr == BLENDWEIGHTS_ATTR:
+            # set every point in one call, points that aren't in the file get zero
+            blendWeights = numpy.zeros(pointCount)
+            if multi is None:
+                multi = numpy.arange(len(values))
+            keep = multi < pointCount
+            blendWeights[multi[keep]] = values[keep]
+            rig_skincluster.setBlendWeightArray(skinCluster, blendWeights, geometry=geometry, pointCount=pointCount)
+        elif len(values):
+            mc.setAttr('{}.{}'.format(skinCluster, attr), int(values[0]))
+
+def _setDeformerWtsData(deformer, geometry, wtsData):
+    '''
+    Set the weights read with readWtsXml on a deformer with one weight map, like a cluster.
+    The map exported from the deformer is used, or the first map if the deformer was renamed.
+
+    :param deformer: The deformer to set the weights on.
+    :type deformer: str
+
+    :param geometry: The geometry the weights are for.
+    :type geometry: str
+
+    :param wtsData: Data returned from readWtsXml.
+    :type wtsData: dict
+    '''
+    if not wtsData['sources']:
+        mc.warning('There are no weights to set on [ {} ]'.format(deformer))
+        return
+    source = wtsData['deformer'] if wtsData['deformer'] in wtsData['weights'] else wtsData['sources'][0]
+    if len(wtsData['sources']) > 1:
+        mc.warning('[ {} ] only has one weight map, setting the weights from [ {} ]'.format(deformer, source))
+
+    pointCount = rig_shape.getPointCount(geometry)
+    setWeights(deformer, getDenseWeights(wtsData['weights'][source], pointCount), geometry=geometry)
+
+def _setBlendShapeWtsData(bs, geometry, wtsData):
+    '''
+    Set the weights read with readWtsXml on a blendShape. The weights exported from the
+    blendShape itself are the base weights, the rest are matched to the targets by name.
+
+    :param bs: The blendShape to set the weights on.
+    :type bs: str
+
+    :param geometry: The geometry the weights are for.
+    :type geometry: str
+
+    :param wtsData: Data returned from readWtsXml.
+    :type wtsData: dict
+    '''
+    pointCount = rig_shape.getPointCount(geometry)
+    mapList = list()
+    weightList = list()
+    missing_list = list()
+    for source in wtsData['sources']:
+        weights = getDenseWeights(wtsData['weights'][source], pointCount)
+        if source in (bs, wtsData['deformer']):
+            mc.setAttr('{}.it[0].bw[0:{}]'.format(bs, pointCount - 1), *weights.tolist())
+        elif rig_blendshape.getTargetIndex(bs, source) != -1:
+            mapList.append(source)
+            weightList.append(weights)
+        else:
+            missing_list.append(source)
+    if missing_list:
+        mc.warning('{} are not targets of {}'.format(missing_list, bs))
+    if mapList:
+        setWeights(bs, weightObject.WeightObject(maps=mapList, weights=weightList), mapList=mapList,
+                   geometry=geometry)
+
+def _readWtsFile(filepath):
+    '''
+    Parse a weight file. This is run on the worker threads in applyWtsDir so it must not touch
+    the Maya scene.
+
+    :param filepath: Path to the xml file. If there is a newer .gz next to it we read that instead.
+    :type filepath: str
+
+    :return: Parsed data for the file with the time it took.
+    :rtype: dict
+    '''
+    result = {'filepath': getWtsFilepath(filepath), 'parse': 0.0, 'error': None}
+    try:
+        start = time.time()
+        result['wtsData'] = readWtsXml(result['filepath'])
+        result['parse'] = time.time() - start
+    except Exception as error:
+        result['error'] = error
+
+    return result
+
+def _getWtsFileList(directory_list):
+    '''
+    Get the weight files to load from the directories. Files in the first directory win over files
+    with the same name in the directories after it, and they are returned last so they're applied last.
+    Zipped files are returned with the name they will have once they're unzipped.
+
+    :param directory_list: Directories to get the files from.
+    :type directory_list: list
+
+    :return: List of (directory, filename)
+    :rtype: list
+    '''
+    found_set = set()
+    file_list = list()
+    for directory in directory_list:
+        if not os.path.isdir(directory):
+            continue
+        filename_list = list()
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith('.gz'):
+                filename = filename[:-3]
+            if filename in found_set or filename in filename_list:
+                continue
+            filename_list.append(filename)
+        found_set.update(filename_list)
+        file_list.insert(0, [(directory, filename) for filename in filename_list])
+
+    return [item for items in file_list for item in items]
+
+def applyWtsDir(directory, includeFilter=None, excludeFilter=None, threads=None):
     '''
     This function will take a directory with properly named weight files,
     i.e.(geometryName__deformerName.xml), and apply them if both the deformer and geometry
@@ -660,12 +1171,15 @@ def applyWtsDir(directory, includeFilter=None, excludeFilter=None):
         We need to make sure we create the other deformers if they don't exist. Currently We're only
         creating skinClusters.
     If the deformers isn't in the scene but the geometry is, we will create the deformer for you.
+    Files are parsed, straight from the .gz if they're zipped, on a pool of worker threads while
+    the main thread applies the files that are ready, so the time it takes is mostly the time it takes Maya to apply them.
     :param directory: Directory path with weight files inside of it.
     :type directory: str
+    :param threads: Number of threads to read files with. Default is WTS_READ_THREADS
+    :type threads: int
+    :return: Time spent in each stage. Worker stages are the total across all of the threads.
+    :rtype: dict
     '''
-    # Unzip if needed, copy directory var so it is not mutated
-    unzipWtsDir(list(directory))
-
     directory_list = common.toList(directory)
     # loop through all of the files in the directory and make sure they're weights files.
     skippedFiles = ''
@@ -673,43 +1187,51 @@ def applyWtsDir(directory, includeFilter=None, excludeFilter=None):
     loadedFiles = ''
     loaded_file_list = []
     dir_name = ''
+    timings = dict(parse=0.0, wait=0.0, create=0.0, apply=0.0, total=0.0)
+    total_start = time.time()
+
+    # filter the files first so the workers only read files we're going to apply
+    job_list = list()
+    for directory, filename in _getWtsFileList(directory_list):
+        # Check file extensions
+        if os.path.splitext(filename)[-1] not in [".xml"]:
+            continue
+        # Apply name filters
+        if includeFilter != '' and includeFilter is not None:
+            if includeFilter not in filename:
+                skippedFiles+=('Load filter skipped: ' + filename + '\r')
+                skipped_file_list.append(filename)
+                continue
+        if excludeFilter != '' and excludeFilter is not None:
+            if excludeFilter in filename:
+                skippedFiles+=('Load filter skipped: ' + filename + '\r')
+                skipped_file_list.append(filename)
+                continue
+        job_list.append((directory, filename))
 
-    # Comp files
-    files_comped = common.compDirFiles(directory_list)
-
-    # Reverse comped files to ensure top directory files are applied last
-    files_comped.reverse()
-    directory_list.reverse()
-
-    for i in range(len(directory_list)):
-        directory = directory_list[i]
-        loadedFiles += '\r\rLoading from: {}'.format(directory)
-        loadedFiles += '\r -------------------------------------------------------  \n'
-        dir_name = directory.split('/')[-1]
-
-        for filename in files_comped[i]:
+    pool = ThreadPool(threads or WTS_READ_THREADS)
+    try:
+        # imap keeps the order of the files and keeps reading ahead while we apply
+        results = pool.imap(_readWtsFile, [os.path.join(*job) for job in job_list])
+        for directory, filename in job_list:
+            if directory.split('/')[-1] != dir_name:
+                dir_name = directory.split('/')[-1]
+                loadedFiles += '\r\rLoading from: {}'.format(directory)
+                loadedFiles += '\r -------------------------------------------------------  \n'
+
+            start = time.time()
+            wts_file = next(results)
+            timings['wait'] += time.time() - start
+            timings['parse'] += wts_file['parse']
+            if wts_file['error'] is not None:
+                print('Loading {}: could not read file [ {} ]'.format(filename, wts_file['error']))
+                continue
 
-            filepath = os.path.join(directory, filename)
+            filepath = wts_file['filepath']
             fileSplit = filename.split("__")
             if len(fileSplit) > 2:
                 fileSplit[1] = fileSplit[1] + '__' + fileSplit[2]
 
-            # Check file extensions
-            extension = os.path.splitext(filepath)[-1]
-            if extension not in [".xml"]:
-                continue
-            # Apply name filters
-            if includeFilter != '':
-                if includeFilter not in filename:
-                    skippedFiles+=('Load filter skipped: ' + filename + '\r')
-                    skipped_file_list.append(filename)
-                    continue
-            if excludeFilter != '':
-                if excludeFilter in filename:
-                    skippedFiles+=('Load filter skipped: ' + filename + '\r')
-                    skipped_file_list.append(filename)
-                    continue
-
             # get the geometry, deformer, and deformerType from the file name.
             geometry = fileSplit[0]
             deformer = fileSplit[1].split(".")[0]
@@ -719,12 +1241,11 @@ def applyWtsDir(directory, includeFilter=None, excludeFilter=None):
                 print('Loading {}: Geometry [ {} ] does not exist'.format(deformer, geometry))
                 continue
             # if the deformer doesn't exist, then we will create it.
+            start = time.time()
             if not mc.objExists(deformer):
-                tree = et.parse(filepath)
-                root = tree.getroot()
                 # create skinCluster deformer if it doesn't exist in the current session.
                 if deformerType == "skinCluster":
-                    jointList = [wts.get('source') for wts in root.findall('weights')]
+                    jointList = wts_file['wtsData']['sources']
                     jointListExists = mc.ls(jointList)
                     jointListMissing = list(set(jointList) - set(jointListExists))
                     if jointListMissing:
@@ -741,40 +1262,68 @@ def applyWtsDir(directory, includeFilter=None, excludeFilter=None):
                                  pinBorderVertices=True,envelope=True)
                 if deformerType == "blendShape":
                     # Create the blendshape with its deltas
-                    delta_file = filepath.replace('.xml', '.shp')
-                    if not os.path.isfile(delta_file):
+                    delta_file = getWtsFilepath(os.path.join(directory, filename).replace('.xml', '.shp'))
+                    if not delta_file:
                         # If no shp file exists then we must assum no weights exist
                         continue
-                    mc.blendShape(ip=delta_file, name=deformer,
-                                  ignoreSelected=True, topologyCheck=False, suppressDialog=True)
+                    # deltas written by exportTargetDeltas are read straight from the .gz
+                    if rig_blendshape.isTargetDeltaFile(delta_file):
+                        rig_blendshape.importTargetDeltas(mc.blendShape(geometry, name=deformer)[0], delta_file)
+                    # the blendShape command can only read its own files uncompressed
+                    elif delta_file.endswith('.gz'):
+                        delta_file = _unzipToTemp(delta_file)
+                        try:
+                            mc.blendShape(ip=delta_file, name=deformer,
+                                          ignoreSelected=True, topologyCheck=False, suppressDialog=True)
+                        finally:
+                            shutil.rmtree(os.path.dirname(delta_file), ignore_errors=True)
+                    else:
+                        mc.blendShape(ip=delta_file, name=deformer,
+                                      ignoreSelected=True, topologyCheck=False, suppressDialog=True)
+            timings['create'] += time.time() - start
 
             # apply the weights
             if not mc.objExists(deformer):
                 print('deformer does not exist [ {} ]'.format(deformer))
                 continue
             # import
-            loaded = importWeights(geometry, deformer, filepath)
+            start = time.time()
+            loaded = importWeights(geometry, deformer, filepath, wtsData=wts_file['wtsData'])
             if not loaded:
                 # Just doing a continue here because the importWeights call prints out it if
                 # it did not load.
+                timings['apply'] += time.time() - start
                 continue
             # this ensures that our skinCluster is normalized.
             if deformerType == "skinCluster":
                 mc.skinCluster(deformer, e=True, fnw=True)
+            timings['apply'] += time.time() - start
 
             loadedFiles += ('Loaded: ' + filename + '\n')
             loaded_file_list.append(filename)
+    finally:
+        pool.close()
+        pool.join()
 
+    timings['total'] = time.time() - total_start
     print(loadedFiles)
     print('[ {} ]: {} loaded, {} skipped'.format(dir_name, len(loaded_file_list), len(skipped_file_list)))
+    print('[ {} ]: {}'.format(dir_name, ', '.join(['{} {:.2f}s'.format(stage, timings[stage]) for stage in
+                                                   ['parse', 'wait', 'create', 'apply', 'total']])))
 
-def pruneWeights(deformer, geometry, mapList=None, threshold=.0001):
+    return timings
+
+def pruneWeights(deformer, geometry, mapList=None, threshold=.0001, maxInfluences=None):
     '''
     :param deformer: Deformer to be pruned
     :param threshold: Points with weight values be low this will be pruned
+    :param maxInfluences: Max number of influences per point for skinClusters. None means no limit.
     :return: None
     '''
-    if mc.nodeType(deformer) in  ['cluster', 'wire']:
+    if mc.nodeType(deformer) == 'skinCluster':
+        rig_skincluster.pruneWeights(deformer, threshold=threshold, maxInfluences=maxInfluences,
+                                     geometry=geometry)
+    elif mc.nodeType(deformer) in  ['cluster', 'wire']:
         pointCount = mc.polyEvaluate(geometry, v=1)
         attr = deformer + '.wl[0].w[0:{}]'.format(pointCount-1)
         if not mc.objExists(attr):
@@ -790,6 +1339,63 @@ def pruneWeights(deformer, geometry, mapList=None, threshold=.0001):
             deformerSet = mc.listConnections(deformer, type='objectSet')[-1]
             mc.sets(points, remove=deformerSet)
 
+def smoothWeights(weights, geometry=None, iterations=1, strength=.5, mask=None, locked=None, normalize=True):
+    '''
+    Laplacian smooth weights across the mesh. Each iteration moves the weight on every vertex
+    towards the average of its neighbors. The vertex adjacency is built once per topology and
+    cached so smoothing the same mesh again only does the sparse products.
+
+    If you pass in a deformer the weights are read from it, smoothed and set back on it.
+
+    ..example ::
+         smoothWeights('body_geo_skinCluster', 'body_geo', iterations=5, locked=['head_bind'])
+         smoothed = smoothWeights(weight_object, 'body_geo', mask=mask)
+
+    :param weights: WeightObject to smooth, or the name of a deformer to smooth the weights on.
+    :type weights: WeightObject | str
+    :param geometry: Mesh the weights are on. Default is the first geometry of the deformer.
+    :type geometry: str
+    :param iterations: Number of times to smooth.
+    :type iterations: int
+    :param strength: How far to move towards the average each iteration, from 0 to 1.
+    :type strength: float
+    :param mask: Per vertex multiplier on the strength, from 0 to 1.
+    :type mask: numpy.ndarray | list
+    :param locked: Maps that shouldn't be smoothed, or a boolean mask with a value per map.
+    :type locked: str | list | numpy.ndarray
+    :param normalize: Keep each vertex adding up to 1 when there is more than one map.
+    :type normalize: bool
+    :return: The smoothed weights
+    :rtype: WeightObject
+    '''
+    deformer = None
+    if isinstance(weights, basestring):
+        deformer = weights
+        if not geometry:
+            geometry = mc.deformer(deformer, q=True, g=True)[0]
+        weights = getWeights(deformer, geometry=geometry)
+    if not geometry:
+        raise RuntimeError('You must pass in the geometry to smooth a WeightObject.')
+
+    # the adjacency is cached by topology hash so it's only built the first time we see the mesh
+    polygon_counts, polygon_connects, point_count = rig_symmetry.getMeshTopology(geometry)
+    indptr, indices = topology.getVertexAdjacency(polygon_counts, polygon_connects, point_count)
+
+    weightArray = numpy.array(weights.getArray(), dtype=numpy.float64)
+    if weightArray.ndim == 1:
+        weightArray = weightArray[:, None]
+    free = ~weights.getMapMask(locked, weightArray.shape[1])
+    weightArray[:, free] = topology.smoothValues(weightArray[:, free], indptr, indices, iterations, strength, mask)
+
+    new_weights = weights.__class__(maps=weights.getMaps(), weights=weightArray)
+    if normalize and weightArray.shape[1] > 1:
+        new_weights.normalize(locked=locked)
+
+    if deformer:
+        setWeights(deformer, new_weights, geometry=geometry)
+
+    return new_weights
+
 def copyMapsToSkincluster(source_mesh, maps, target_mesh=''):
     '''
     :param source_mesh: Source mesh to query maps from
@@ -862,7 +1468,7 @@ def copyMapsToSkincluster(source_mesh, maps, target_mesh=''):
         joint = mc.joint(n='{}__{}__bind'.format(node, attr))
         mc.parent(joint, bind_group)
         # Add to skincluster
-        mc.skinCluster(sc, e=1, addInfluence=joint, lw=True)
+        rig_skincluster.addInfluence(sc, joint, lw=True)
         # Set weights
         setWeights(sc, weights, mapList=joint)
         # Lock influence
@@ -880,32 +1486,127 @@ def copySkinclusterToMaps(source_mesh, target_mesh, maps):
     :return:
     '''
 
-def copyDeformerWeight(source_mesh, target_mesh, source_deformer, target_deformer, source_map=None, target_map=None):
+def getTransferMap(sourceGeometry, targetGeometry):
+    '''
+    Build the map from the points of the target geometry to the closest point on the surface of
+    the source mesh. Both are compared in their rest (Orig) shape so the map is the same in any
+    pose. It can be reused to transfer any number of maps between the two.
+
+    ..example ::
+         transfer_map = getTransferMap('body_geo', 'body_proxy')
+         target_values = transfer_map.apply(source_values)
+
+    :param sourceGeometry: Mesh we're transfering from.
+    :type sourceGeometry: str
+
+    :param targetGeometry: Geometry we're transfering to.
+    :type targetGeometry: str
+
+    :return: Barycentric map with a row per target point.
+    :rtype: spatial.BarycentricMap
+    '''
+    for geometry in [sourceGeometry, targetGeometry]:
+        if not mc.objExists(geometry):
+            raise RuntimeError("{} doesn't exists in the current Maya session!".format(geometry))
+
+    # the Orig shapes sit under the same transforms, so their world points are the bind positions
+    sourceDagPath = rig_transform.getDagPath(rig_shape.getOrigShape(sourceGeometry))
+    if not sourceDagPath.hasFn(om2.MFn.kMesh):
+        raise RuntimeError('{} is not a mesh.'.format(sourceGeometry))
+    meshFn = om2.MFnMesh(sourceDagPath)
+    points = numpy.array(meshFn.getPoints(om2.MSpace.kWorld), dtype=numpy.float64)[:, :3]
+    triangles = numpy.array(meshFn.getTriangles()[1], dtype=numpy.int64)
+
+    targetDagPath = rig_transform.getDagPath(rig_shape.getOrigShape(targetGeometry))
+    targetPoints = om2.MItGeometry(targetDagPath).allPositions(om2.MSpace.kWorld)
+    targetPoints = numpy.array(targetPoints, dtype=numpy.float64)[:, :3]
+
+    return spatial.BarycentricMap(points, triangles, targetPoints)
+
+
+def transferWeights(sourceDeformer, targetDeformer, sourceGeometry, targetGeometry, mapList=None,
+                    targetMapList=None, transferMap=None):
+    '''
+    Transfer weights between deformers on different geometry using the closest point on the
+    surface of the source mesh. Every map is moved in one go with the same transfer map.
+
+    :param sourceDeformer: Deformer we're getting the weights from.
+    :type sourceDeformer: str
+
+    :param targetDeformer: Deformer we're setting the weights on.
+    :type targetDeformer: str
+
+    :param sourceGeometry: Mesh the source deformer is on.
+    :type sourceGeometry: str
+
+    :param targetGeometry: Geometry the target deformer is on.
+    :type targetGeometry: str
+
+    :param mapList: Maps to transfer. Default is all of the maps on the source deformer.
+    :type mapList: list
+
+    :param targetMapList: Maps to set on the target deformer. Default is the same as mapList.
+    :type targetMapList: list
+
+    :param transferMap: Map from getTransferMap. Pass one in when you're transfering more than
+                        one deformer between the same geometry so it's only built once.
+    :type transferMap: spatial.BarycentricMap
+
+    :return: The transfered weights.
+    :rtype: WeightObject
+    '''
+    if transferMap is None:
+        transferMap = getTransferMap(sourceGeometry, targetGeometry)
+
+    sourceWeights = getWeights(sourceDeformer, mapList=mapList, geometry=sourceGeometry)
+    mapList = sourceWeights.getMaps()
+    weightList = sourceWeights.getWeights()
+    targetMapList = common.toList(targetMapList) if targetMapList else list(mapList)
+    # drop the maps we didn't find weights for. Deformers like clusters have one unnamed map.
+    if mapList:
+        found = [index for index, weights in enumerate(weightList) if len(weights)]
+        targetMapList = [targetMapList[index] for index in found]
+    weightList = [weights for weights in weightList if len(weights)]
+    if not weightList:
+        mc.warning('No weights found for {} on {}'.format(sourceDeformer, sourceGeometry))
+        return weightObject.WeightObject(maps=list(), weights=list())
+
+    weightArray = transferMap.apply(numpy.column_stack(weightList))
+    targetWeights = weightObject.WeightObject(maps=targetMapList, weights=weightArray)
+
+    if mc.nodeType(targetDeformer) == 'skinCluster':
+        # make sure the target has all of the influences before we set the weights
+        influenceList = mc.skinCluster(targetDeformer, q=True, inf=True) or list()
+        missingList = [inf for inf in targetMapList if inf not in influenceList]
+        for inf in missingList:
+            rig_skincluster.addInfluence(targetDeformer, inf, wt=0)
+        targetWeights.normalize()
+
+    setWeights(targetDeformer, targetWeights, mapList=targetMapList, geometry=targetGeometry)
+
+    return targetWeights
+
+
+def copyDeformerWeight(source_mesh, target_mesh, source_deformer, target_deformer, source_map=None, target_map=None,
+                       transfer_map=None):
+    '''
+    Copy the weights of a deformer onto a deformer on another mesh using the closest point on the
+    surface of the source mesh.
+
+    :param transfer_map: Map from getTransferMap to reuse when copying more than one deformer.
+    :type transfer_map: spatial.BarycentricMap
+    '''
     if mc.nodeType(source_deformer) in ['blendShape']:
-        map = '{}.{}'.format(source_deformer, source_map)
-        sc_source_mesh, sc_group = copyMapsToSkincluster(source_mesh, map)
-        sc_target_mesh = mc.duplicate(target_mesh, '{}_sc_target_copy'.format(target_mesh))[0]
-        sc_target = rig_skincluster.transferSkinCluster(sc_source_mesh,
-                                                                 sc_target_mesh,
-                                                                 surfaceAssociation="closestPoint")[0]
-        inf_name = '{}__{}__bind'.format(source_deformer, source_map)
-        weights = getWeights(sc_target, inf_name)
-        setWeights(target_deformer, weights, mapList=target_map)
-        mc.delete(sc_group, sc_target_mesh)
+        transferWeights(source_deformer, target_deformer, source_mesh, target_mesh, mapList=source_map,
+                        targetMapList=target_map, transferMap=transfer_map)
 
     if mc.nodeType(source_deformer) in ['cluster', 'wire']:
-        map = source_deformer
-        sc_source_mesh, sc_group = copyMapsToSkincluster(source_mesh, map)
-        sc_target_mesh = mc.duplicate(target_mesh, '{}_sc_target_copy'.format(target_mesh))[0]
-        sc_target = rig_skincluster.transferSkinCluster(sc_source_mesh,
-                                                        sc_target_mesh,
-                                                        surfaceAssociation="closestPoint")[0]
-        inf_name = '{}__{}__bind'.format(source_deformer, source_map)
-        weights = getWeights(sc_target, inf_name)
-        setWeights(target_deformer, weights, geometry=target_mesh)
-        mc.delete(sc_group, sc_target_mesh)
+        transferWeights(source_deformer, target_deformer, source_mesh, target_mesh, transferMap=transfer_map)
 
     if mc.nodeType(source_deformer) in ['skinCluster']:
-        sc_target = rig_skincluster.transferSkinCluster(source_mesh,
-                                                        target_mesh,
-                                                        surfaceAssociation="closestPoint")[0]
+        # if there isn't a skinCluster on the target yet this will build one with the same influences
+        if not mc.objExists(target_deformer) or mc.nodeType(target_deformer) != 'skinCluster':
+            rig_skincluster.transferSkinCluster(source_mesh, target_mesh, surfaceAssociation="closestPoint")
+        else:
+            transferWeights(source_deformer, target_deformer, source_mesh, target_mesh,
+                            transferMap=transfer_map)
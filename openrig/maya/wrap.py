@@ -2,13 +2,14 @@
 import maya.cmds as mc
 import maya.mel as mm
 from openrig.shared import common
+from openrig.shared import components
 from openrig.maya import naming
 
 
 def doWrapTo():
     """Performs a wrapTo based on the selected objects in-scene."""
     # get selection
-    selection = mc.ls(sl=True, fl=True)
+    selection = components.flattenComponents(mc.ls(sl=True))
     
     # get faces, geo, and influence
     faces = list()
@@ -73,10 +74,9 @@ def wrapTo(geo, influence, faces=None):
         influenceDup = mc.rename(influenceDup, '%s_%s_wrapInfluence1' % (influence, frame))
         
         # use given faces only
-        influenceDupFaces = set([influenceDup+'.f[%s]' % str(f) for f in faces])
-        allFaces = set(mc.ls(influenceDup+'.f[*]', fl=True))
-        toDelete = allFaces-influenceDupFaces
-        mc.delete(list(toDelete))
+        keepFaces = set([int(f) for f in faces])
+        toDelete = [f for f in range(mc.polyEvaluate(influenceDup, face=True)) if f not in keepFaces]
+        mc.delete(components.compressIndices(toDelete, 'f', influenceDup))
         
         # wrap duplicate faces back to influence
         # TODO: rewrite this so it doesn't rely on selection...
@@ -0,0 +1,187 @@
+"""Convert Maya component strings like "body_geo.vtx[0:1200]" to index arrays and back without
+going through Maya. Ranges are expanded with numpy so a few range strings covering a whole mesh
+cost about the same as a single index."""
+import itertools
+import re
+from collections import OrderedDict
+
+import numpy
+
+# node (optional), component name and everything in brackets, like "body_geo.vtx[0:5]" or "cv[1][2:3]"
+COMPONENT_RE = re.compile(r'^(?:(?P<node>.+)\.)?(?P<name>\w+)(?P<brackets>(?:\[[^\]]*\])+)$')
+BRACKET_RE = re.compile(r'\[([^\]]*)\]')
+
+
+def isComponent(component):
+    """Return True if the string is a component, like "vtx[3]" or "body_geo.cv[0:4]"."""
+    return bool(COMPONENT_RE.match(component))
+
+
+def isExpandable(component):
+    """Return True if the string is a component with explicit indices, like "vtx[0:4]", so it can
+    be expanded without Maya. Object names and components with "*" need Maya to expand them."""
+    match = COMPONENT_RE.match(component)
+    return bool(match) and '*' not in match.group('brackets')
+
+
+def parseComponent(component):
+    """Split a component string into the node, the component name and the index ranges.
+    Each range is (start, end) with the end included, or None for "*".
+
+    :param component: Component like "body_geo.vtx[0:1200]", "vtx[3]" or "surface.cv[0:2][4]"
+    :type component: str
+
+    :returns: node, name, ranges. node is None if the string doesn't have one.
+    :rtype: tuple
+    """
+    match = COMPONENT_RE.match(component)
+    if not match:
+        raise ValueError('{} is not a component.'.format(component))
+
+    ranges = list()
+    for value in BRACKET_RE.findall(match.group('brackets')):
+        if value == '*':
+            ranges.append(None)
+        elif ':' in value:
+            start, end = value.split(':')
+            ranges.append((int(start), int(end)))
+        else:
+            ranges.append((int(value), int(value)))
+
+    return match.group('node'), match.group('name'), ranges
+
+
+def _getRanges(componentList, count=None):
+    """Parse the single index ranges for the components into start and end arrays."""
+    if isinstance(componentList, basestring):
+        componentList = [componentList]
+
+    starts = list()
+    ends = list()
+    for component in componentList:
+        ranges = parseComponent(component)[2]
+        if len(ranges) != 1:
+            raise ValueError('{} does not have a single index.'.format(component))
+        if ranges[0] is None:
+            if count is None:
+                raise ValueError('{} needs a count to expand "*".'.format(component))
+            ranges[0] = (0, count - 1)
+        starts.append(ranges[0][0])
+        ends.append(ranges[0][1])
+
+    return numpy.array(starts, dtype=numpy.int64), numpy.array(ends, dtype=numpy.int64)
+
+
+def expandIndices(componentList, count=None):
+    """Expand single index components into an array of indices, in the order they're given.
+
+    ..example ::
+         expandIndices(['vtx[0:3]', 'vtx[7]'])
+         # array([0, 1, 2, 3, 7])
+
+    :param componentList: Components like "vtx[0:1200]", "cp[5]", "map[3]". Can include the node.
+    :type componentList: list | str
+
+    :param count: Number of components on the node. Only needed to expand "*".
+    :type count: int
+
+    :returns: Index for every component
+    :rtype: numpy.ndarray
+    """
+    starts, ends = _getRanges(componentList, count)
+    lengths = ends - starts + 1
+    if not len(lengths) or lengths.sum() <= 0:
+        return numpy.zeros(0, dtype=numpy.int64)
+
+    # offset a running count so each range starts back at its own start value
+    offsets = numpy.cumsum(lengths) - lengths
+    return numpy.arange(lengths.sum(), dtype=numpy.int64) + numpy.repeat(starts - offsets, lengths)
+
+
+def groupIndices(componentList, count=None):
+    """Expand single index components into an array of indices for each node.
+
+    :param componentList: Components with the node, like "body_geo.map[0:20]"
+    :type componentList: list | str
+
+    :param count: Number of components on each node. Only needed to expand "*".
+    :type count: int
+
+    :returns: OrderedDict of node: indices
+    :rtype: OrderedDict
+    """
+    if isinstance(componentList, basestring):
+        componentList = [componentList]
+
+    nodeComponents = OrderedDict()
+    for component in componentList:
+        node = parseComponent(component)[0]
+        nodeComponents.setdefault(node, list()).append(component)
+
+    return OrderedDict((node, expandIndices(components, count)) for node, components in nodeComponents.items())
+
+
+def compressIndices(indices, component='vtx', node=None):
+    """Compress indices into the fewest range strings. The indices are sorted and duplicates removed.
+
+    ..example ::
+         compressIndices([0, 1, 2, 3, 7], node='body_geo')
+         # ['body_geo.vtx[0:3]', 'body_geo.vtx[7]']
+
+    :param indices: Component indices
+    :type indices: numpy.ndarray | list
+
+    :param component: Name of the component, like "vtx", "cp" or "map"
+    :type component: str
+
+    :param node: Node to put in front of the component. If None there's no node.
+    :type node: str
+
+    :returns: Component strings
+    :rtype: list
+    """
+    indices = numpy.unique(numpy.asarray(indices, dtype=numpy.int64))
+    if not len(indices):
+        return list()
+
+    # a new range starts wherever the next index isn't one more than the last
+    breaks = numpy.flatnonzero(numpy.diff(indices) != 1) + 1
+    starts = indices[numpy.concatenate([[0], breaks])].tolist()
+    ends = indices[numpy.concatenate([breaks - 1, [len(indices) - 1]])].tolist()
+
+    prefix = '{}.{}'.format(node, component) if node else component
+    return ['{}[{}]'.format(prefix, start) if start == end else '{}[{}:{}]'.format(prefix, start, end)
+            for start, end in zip(starts, ends)]
+
+
+def flattenComponents(componentList):
+    """Flatten components the same way mc.ls(flatten=True) does. Strings that aren't components,
+    like object names, are passed through. Components with more than one index, like nurbs
+    surface cvs, are flattened into every combination.
+
+    :param componentList: Components and object names
+    :type componentList: list | str
+
+    :returns: A string for every component
+    :rtype: list
+    """
+    if isinstance(componentList, basestring):
+        componentList = [componentList]
+
+    flattened = list()
+    for component in componentList:
+        if not isComponent(component):
+            flattened.append(component)
+            continue
+        node, name, ranges = parseComponent(component)
+        if None in ranges:
+            raise ValueError('{} needs Maya to expand "*".'.format(component))
+        prefix = '{}.{}'.format(node, name) if node else name
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            flattened.extend(['{}[{}]'.format(prefix, index) for index in range(start, end + 1)])
+            continue
+        for indices in itertools.product(*[range(start, end + 1) for start, end in ranges]):
+            flattened.append(prefix + ''.join(['[{}]'.format(index) for index in indices]))
+
+    return flattened
@@ -0,0 +1,491 @@
+"""Spatial lookups for large point sets using numpy only."""
+import numpy
+
+# number of query points we handle at once so the candidate arrays stay a reasonable size
+CHUNK_SIZE = 65536
+
+
+class PointGrid(object):
+    """PointGrid class: Uniform grid over a set of points for fast closest point queries.
+
+    The points are bucketed into cubic cells and sorted by cell so each cell is a contiguous
+    range of the sorted points. A query looks in the cells around the query point one ring at a
+    time until the closest point found is guaranteed to be closer than anything outside the
+    rings that have been searched. Queries that are still open after MAX_RINGS rings search the
+    whole box their current closest point could be in at once.
+    """
+
+    # rings we walk one at a time before searching the rest of the box in one go
+    MAX_RINGS = 8
+    # most cells we allow along the longest axis when picking the cell size
+    MAX_CELLS_PER_AXIS = 1024
+    # most (query, cell) or (query, point) pairs we check at once
+    PAIR_LIMIT = 2 ** 21
+
+    def __init__(self, points, cellSize=None):
+        """
+        :param points: Array of points. Only the first three columns are used.
+        :type points: numpy.ndarray | list
+
+        :param cellSize: Size of each grid cell. If None we pick a size that puts about two
+                         points in each cell.
+        :type cellSize: float
+        """
+        self._points = numpy.ascontiguousarray(numpy.asarray(points, dtype=numpy.float64)[:, :3])
+        self._min = self._points.min(axis=0)
+        self._max = self._points.max(axis=0)
+        extent = self._max - self._min
+
+        if cellSize is None:
+            cellSize = self._getCellSize(extent, len(self._points))
+        if not cellSize or cellSize <= 0:
+            cellSize = 1.0
+        self._cellSize = float(cellSize)
+        # same rounding as _getCells so the points on the max side stay inside the grid
+        self._dims = self._getCells(self._max[None])[0] + 1
+
+        keys = self._getKeys(self._getCells(self._points))
+        self._order = numpy.argsort(keys, kind='mergesort')
+        self._sortedKeys = keys[self._order]
+
+        # when there aren't too many cells we can look up where each cell starts directly
+        self._cellStarts = None
+        cell_count = int(numpy.prod(self._dims))
+        if cell_count <= len(self._points) * 8:
+            self._cellStarts = numpy.searchsorted(self._sortedKeys, numpy.arange(cell_count + 1))
+
+    @classmethod
+    def _getCellSize(cls, extent, pointCount):
+        """Cell size that puts about two points in each cell.
+
+        Axes thinner than a cell don't add any cells, so they're dropped from the density
+        estimate one at a time. Otherwise a mesh that is almost flat gets tiny cells.
+        """
+        extent = numpy.sort(extent)[::-1]
+        if not extent[0]:
+            return None
+        for axes in (3, 2, 1):
+            cellSize = (numpy.prod(extent[:axes]) * 2.0 / pointCount) ** (1.0 / axes)
+            if extent[axes - 1] > cellSize:
+                break
+
+        return max(cellSize, extent[0] / cls.MAX_CELLS_PER_AXIS)
+
+    def _getCells(self, points):
+        """Return the integer cell coordinates for the points."""
+        return numpy.floor((points - self._min) / self._cellSize).astype(numpy.int64)
+
+    def _getKeys(self, cells):
+        """Return a single integer key per cell."""
+        return (cells[:, 0] * self._dims[1] + cells[:, 1]) * self._dims[2] + cells[:, 2]
+
+    def _getShell(self, ring):
+        """Every cell offset that is exactly ring cells away and could still be in the grid."""
+        spans = [numpy.arange(max(-ring, 1 - dim), min(ring, dim - 1) + 1) for dim in self._dims]
+        offsets = numpy.array(numpy.meshgrid(*spans, indexing='ij')).reshape(3, -1).T
+        return offsets[numpy.abs(offsets).max(axis=1) == ring]
+
+    def query(self, queryPoints):
+        """Return the index of and distance to the closest grid point for each query point.
+
+        :param queryPoints: Array of points. Only the first three columns are used.
+        :type queryPoints: numpy.ndarray | list
+
+        :returns: indices, distances
+        :rtype: tuple
+        """
+        queryPoints = numpy.asarray(queryPoints, dtype=numpy.float64)[:, :3]
+        indices = numpy.zeros(len(queryPoints), dtype=numpy.int64)
+        distances = numpy.zeros(len(queryPoints))
+        for start in range(0, len(queryPoints), CHUNK_SIZE):
+            chunk = slice(start, start + CHUNK_SIZE)
+            indices[chunk], distances[chunk] = self._queryChunk(queryPoints[chunk])
+
+        return indices, distances
+
+    def _queryChunk(self, queryPoints):
+        """Ring search for a chunk of query points."""
+        count = len(queryPoints)
+        best_index = numpy.full(count, -1, dtype=numpy.int64)
+        best_dist2 = numpy.full(count, numpy.inf)
+        # queries off the grid start from the closest cell on it
+        cells = numpy.clip(self._getCells(queryPoints), 0, self._dims - 1)
+        outside = numpy.maximum(self._min - queryPoints, 0.0) + numpy.maximum(queryPoints - self._max, 0.0)
+        outside2 = outside ** 2
+        active = numpy.arange(count)
+
+        ring = 0
+        while active.size and ring < self.MAX_RINGS:
+            offsets = self._getShell(ring)
+            batch_size = max(1, self.PAIR_LIMIT // max(len(offsets), 1))
+            for start in range(0, len(active), batch_size):
+                batch = active[start:start + batch_size]
+                neighbors = (cells[batch][:, None, :] + offsets[None, :, :]).reshape(-1, 3)
+                self._searchCells(queryPoints, numpy.repeat(batch, len(offsets)), neighbors,
+                                  best_index, best_dist2)
+
+            lower2 = self._getUnsearchedDistance2(queryPoints[active], cells[active], ring, outside2[active])
+            active = active[best_dist2[active] > lower2]
+            ring += 1
+
+        if active.size:
+            self._finishQueries(queryPoints, active, best_index, best_dist2)
+
+        return best_index, numpy.sqrt(best_dist2)
+
+    def _getUnsearchedDistance2(self, queryPoints, cells, ring, outside2):
+        """Smallest squared distance from each query to a cell outside the rings searched so far.
+
+        A point past a face of the searched box is at least the face gap away along that axis
+        and, being in the grid, at least as far as the query is off the grid along the others.
+        """
+        total2 = outside2.sum(axis=1)
+        lower2 = numpy.full(len(queryPoints), numpy.inf)
+        for axis in range(3):
+            others2 = total2 - outside2[:, axis]
+            low_face = self._min[axis] + (cells[:, axis] - ring) * self._cellSize
+            high_face = self._min[axis] + (cells[:, axis] + ring + 1) * self._cellSize
+            low_gap = numpy.maximum(queryPoints[:, axis] - low_face, 0.0)
+            high_gap = numpy.maximum(high_face - queryPoints[:, axis], 0.0)
+            low_open = cells[:, axis] - ring > 0
+            high_open = cells[:, axis] + ring < self._dims[axis] - 1
+            lower2 = numpy.where(low_open, numpy.minimum(lower2, low_gap ** 2 + others2), lower2)
+            lower2 = numpy.where(high_open, numpy.minimum(lower2, high_gap ** 2 + others2), lower2)
+
+        return lower2
+
+    def _finishQueries(self, queryPoints, queries, best_index, best_dist2):
+        """Search everything the queries left after the ring walk could still be closest to."""
+        found = queries[numpy.isfinite(best_dist2[queries])]
+        if found.size:
+            # every point closer than the current best is in the box around it
+            radii = numpy.sqrt(best_dist2[found])[:, None]
+            low = numpy.clip(self._getCells(queryPoints[found] - radii), 0, self._dims - 1)
+            high = numpy.clip(self._getCells(queryPoints[found] + radii), 0, self._dims - 1)
+            pending = [numpy.arange(len(found))]
+            while pending:
+                subset = pending.pop()
+                if numpy.prod(high[subset] - low[subset] + 1, axis=1).sum() > self.PAIR_LIMIT and len(subset) > 1:
+                    pending.extend([subset[:len(subset) // 2], subset[len(subset) // 2:]])
+                    continue
+                neighbors, owners = _expandBoxes(low[subset], high[subset])
+                self._searchCells(queryPoints, found[subset][owners], neighbors, best_index, best_dist2)
+
+        # nothing near these at all, so just check every point
+        missing = queries[~numpy.isfinite(best_dist2[queries])]
+        batch_size = max(1, self.PAIR_LIMIT // len(self._points))
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            deltas = self._points[None, :, :] - queryPoints[batch][:, None, :]
+            dist2 = numpy.einsum('ijk,ijk->ij', deltas, deltas)
+            best_index[batch] = numpy.argmin(dist2, axis=1)
+            best_dist2[batch] = dist2[numpy.arange(len(batch)), best_index[batch]]
+
+    def _searchCells(self, queryPoints, queryIds, cells, best_index, best_dist2):
+        """Check every point in the given cells against its query and keep the closest."""
+        valid = numpy.all((cells >= 0) & (cells < self._dims), axis=1)
+        query_ids = queryIds[valid]
+        keys = self._getKeys(cells[valid])
+        if self._cellStarts is None:
+            starts = numpy.searchsorted(self._sortedKeys, keys, side='left')
+            counts = numpy.searchsorted(self._sortedKeys, keys, side='right') - starts
+        else:
+            starts = self._cellStarts[keys]
+            counts = self._cellStarts[keys + 1] - starts
+        keep = counts > 0
+        query_ids, starts, counts = query_ids[keep], starts[keep], counts[keep]
+        if not counts.size:
+            return
+
+        # expand each cell range into one flat list of candidate points
+        total = counts.sum()
+        range_starts = numpy.cumsum(counts) - counts
+        flat = numpy.arange(total) - numpy.repeat(range_starts, counts) + numpy.repeat(starts, counts)
+        candidates = self._order[flat]
+        candidate_queries = numpy.repeat(query_ids, counts)
+        deltas = self._points[candidates] - queryPoints[candidate_queries]
+        dist2 = numpy.einsum('ij,ij->i', deltas, deltas)
+
+        # group the candidates by query and find the smallest distance in each group,
+        # ties go to the lowest point index
+        order = numpy.argsort(candidate_queries, kind='mergesort')
+        sorted_queries = candidate_queries[order]
+        sorted_dist2 = dist2[order]
+        sorted_candidates = candidates[order]
+        group_starts = numpy.flatnonzero(numpy.concatenate([[True], sorted_queries[1:] != sorted_queries[:-1]]))
+        group_queries = sorted_queries[group_starts]
+        group_dist2 = numpy.minimum.reduceat(sorted_dist2, group_starts)
+        group_sizes = numpy.diff(numpy.append(group_starts, len(sorted_queries)))
+        is_min = sorted_dist2 == numpy.repeat(group_dist2, group_sizes)
+        group_index = numpy.minimum.reduceat(numpy.where(is_min, sorted_candidates, len(self._points)),
+                                             group_starts)
+
+        closer = (group_dist2 < best_dist2[group_queries]) | \
+                 ((group_dist2 == best_dist2[group_queries]) & (group_index < best_index[group_queries]))
+        best_dist2[group_queries[closer]] = group_dist2[closer]
+        best_index[group_queries[closer]] = group_index[closer]
+
+
+def closestPoints(points, queryPoints):
+    """Return the index of and distance to the closest point in points for each query point.
+
+    :param points: Array of points to search.
+    :type points: numpy.ndarray | list
+
+    :param queryPoints: Array of points to find the closest point for.
+    :type queryPoints: numpy.ndarray | list
+
+    :returns: indices, distances
+    :rtype: tuple
+    """
+    return PointGrid(points).query(queryPoints)
+
+
+def _closestPointsOnTriangles(queryPoints, a, b, c):
+    """Closest point on each triangle (a, b, c) to each query point, given as barycentric weights.
+
+    :returns: barycentric, distances2
+    :rtype: tuple
+    """
+    ab = b - a
+    ac = c - a
+    ap = queryPoints - a
+    d00 = numpy.einsum('ij,ij->i', ab, ab)
+    d01 = numpy.einsum('ij,ij->i', ab, ac)
+    d11 = numpy.einsum('ij,ij->i', ac, ac)
+    d20 = numpy.einsum('ij,ij->i', ap, ab)
+    d21 = numpy.einsum('ij,ij->i', ap, ac)
+    denom = d00 * d11 - d01 * d01
+
+    # projection onto the plane of the triangle
+    valid = numpy.abs(denom) > 1e-20
+    safe_denom = numpy.where(valid, denom, 1.0)
+    v = (d11 * d20 - d01 * d21) / safe_denom
+    w = (d00 * d21 - d01 * d20) / safe_denom
+    u = 1.0 - v - w
+    barycentric = numpy.column_stack([u, v, w])
+    projected = a + ab * v[:, None] + ac * w[:, None]
+    deltas = queryPoints - projected
+    distances2 = numpy.einsum('ij,ij->i', deltas, deltas)
+    outside = ~valid | (u < 0) | (v < 0) | (w < 0)
+    distances2[outside] = numpy.inf
+
+    # closest point on each edge for the points that project outside the triangle
+    for start, end, start_column, end_column in [(a, b, 0, 1), (b, c, 1, 2), (c, a, 2, 0)]:
+        edge = end - start
+        length2 = numpy.einsum('ij,ij->i', edge, edge)
+        t = numpy.einsum('ij,ij->i', queryPoints - start, edge) / numpy.where(length2 > 0, length2, 1.0)
+        t = numpy.clip(t, 0.0, 1.0)
+        deltas = queryPoints - (start + edge * t[:, None])
+        edge_distances2 = numpy.einsum('ij,ij->i', deltas, deltas)
+        closer = outside & (edge_distances2 < distances2)
+        distances2[closer] = edge_distances2[closer]
+        barycentric[closer] = 0.0
+        barycentric[closer, start_column] = 1.0 - t[closer]
+        barycentric[closer, end_column] = t[closer]
+
+    return barycentric, distances2
+
+
+def _expandBoxes(low, high):
+    """Every integer cell in each box from low to high, with the box each cell came from."""
+    dims = high - low + 1
+    counts = numpy.prod(dims, axis=1)
+    owners = numpy.repeat(numpy.arange(len(low)), counts)
+    local = numpy.arange(counts.sum()) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+    owner_dims = dims[owners]
+    cells = numpy.empty((len(owners), 3), dtype=numpy.int64)
+    cells[:, 2] = local % owner_dims[:, 2]
+    cells[:, 1] = (local // owner_dims[:, 2]) % owner_dims[:, 1]
+    cells[:, 0] = local // (owner_dims[:, 2] * owner_dims[:, 1])
+
+    return cells + low[owners], owners
+
+
+class TriangleGrid(object):
+    """TriangleGrid class: Uniform grid over the triangles of a mesh for closest triangle queries.
+
+    Each triangle is added to every cell its bounding box overlaps. A query with a search radius
+    checks every triangle in the cells overlapping the box around it, so any triangle closer than
+    the radius is always found, no matter how large the triangle is or where its vertices are.
+    """
+
+    # most (query, triangle) pairs we check at once
+    PAIR_LIMIT = 2 ** 21
+
+    def __init__(self, points, triangles, cellSize=None):
+        """
+        :param points: Points of the mesh.
+        :type points: numpy.ndarray | list
+
+        :param triangles: Vertex ids with three per triangle. Can be flat or (triangles, 3).
+        :type triangles: numpy.ndarray | list
+
+        :param cellSize: Size of each grid cell. If None we use the average triangle size.
+        :type cellSize: float
+        """
+        self._points = numpy.asarray(points, dtype=numpy.float64)[:, :3]
+        self._triangles = numpy.asarray(triangles, dtype=numpy.int64).reshape(-1, 3)
+        corners = self._points[self._triangles]
+        low = corners.min(axis=1)
+        high = corners.max(axis=1)
+
+        if cellSize is None and len(self._triangles):
+            cellSize = (high - low).max(axis=1).mean()
+        if not cellSize or cellSize <= 0:
+            cellSize = 1.0
+        self._cellSize = float(cellSize)
+        self._min = self._points.min(axis=0) if len(self._points) else numpy.zeros(3)
+        extent = (self._points.max(axis=0) if len(self._points) else numpy.zeros(3)) - self._min
+        self._dims = (extent // self._cellSize).astype(numpy.int64) + 1
+
+        cells, owners = _expandBoxes(self._getCells(low), self._getCells(high))
+        keys = self._getKeys(cells)
+        order = numpy.argsort(keys, kind='mergesort')
+        self._sortedKeys = keys[order]
+        self._cellTriangles = owners[order]
+
+    def _getCells(self, points):
+        """Return the integer cell coordinates for the points, clamped to the grid."""
+        cells = numpy.floor((points - self._min) / self._cellSize).astype(numpy.int64)
+        return numpy.clip(cells, 0, self._dims - 1)
+
+    def _getKeys(self, cells):
+        """Return a single integer key per cell."""
+        return (cells[:, 0] * self._dims[1] + cells[:, 1]) * self._dims[2] + cells[:, 2]
+
+    def query(self, queryPoints, radii):
+        """Return the closest triangle within the radius of each query point.
+
+        :param queryPoints: Array of points. Only the first three columns are used.
+        :type queryPoints: numpy.ndarray | list
+
+        :param radii: Search radius for each query point. The distance to the closest mesh
+                      vertex is always large enough.
+        :type radii: numpy.ndarray
+
+        :returns: triangle ids (-1 if nothing was in range), barycentric weights, squared distances
+        :rtype: tuple
+        """
+        queryPoints = numpy.asarray(queryPoints, dtype=numpy.float64)[:, :3]
+        radii = numpy.asarray(radii, dtype=numpy.float64) + self._cellSize * 1e-6
+        best_triangles = numpy.full(len(queryPoints), -1, dtype=numpy.int64)
+        best_barycentric = numpy.zeros((len(queryPoints), 3))
+        best_dist2 = numpy.full(len(queryPoints), numpy.inf)
+        if not len(self._triangles):
+            return best_triangles, best_barycentric, best_dist2
+
+        low = self._getCells(queryPoints - radii[:, None])
+        high = self._getCells(queryPoints + radii[:, None])
+        pending = [numpy.arange(start, min(start + CHUNK_SIZE, len(queryPoints)))
+                   for start in range(0, len(queryPoints), CHUNK_SIZE)]
+        while pending:
+            queries = pending.pop()
+            # split the chunk when it would check too many cells or pairs at once
+            cell_count = numpy.prod(high[queries] - low[queries] + 1, axis=1).sum()
+            if cell_count > self.PAIR_LIMIT and len(queries) > 1:
+                pending.extend([queries[:len(queries) // 2], queries[len(queries) // 2:]])
+                continue
+            cells, owners = _expandBoxes(low[queries], high[queries])
+            keys = self._getKeys(cells)
+            starts = numpy.searchsorted(self._sortedKeys, keys, side='left')
+            counts = numpy.searchsorted(self._sortedKeys, keys, side='right') - starts
+            if counts.sum() > self.PAIR_LIMIT and len(queries) > 1:
+                pending.extend([queries[:len(queries) // 2], queries[len(queries) // 2:]])
+                continue
+
+            # large triangles are in many cells so only check each pair once
+            flat = numpy.arange(counts.sum()) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+            triangle_ids = self._cellTriangles[flat + numpy.repeat(starts, counts)]
+            pair_keys = numpy.unique(queries[numpy.repeat(owners, counts)] * len(self._triangles) + triangle_ids)
+            if not len(pair_keys):
+                continue
+            pair_queries = pair_keys // len(self._triangles)
+            pair_triangles = pair_keys % len(self._triangles)
+
+            corners = self._triangles[pair_triangles]
+            barycentric, dist2 = _closestPointsOnTriangles(queryPoints[pair_queries],
+                                                           self._points[corners[:, 0]],
+                                                           self._points[corners[:, 1]],
+                                                           self._points[corners[:, 2]])
+
+            # the pairs are sorted by query, pick the closest pair in each group
+            group_starts = numpy.flatnonzero(numpy.concatenate([[True], pair_queries[1:] != pair_queries[:-1]]))
+            group_dist2 = numpy.minimum.reduceat(dist2, group_starts)
+            group_sizes = numpy.diff(numpy.append(group_starts, len(pair_queries)))
+            is_min = dist2 == numpy.repeat(group_dist2, group_sizes)
+            first_min = numpy.minimum.reduceat(numpy.where(is_min, numpy.arange(len(dist2)), len(dist2)),
+                                               group_starts)
+            group_queries = pair_queries[group_starts]
+            best_triangles[group_queries] = pair_triangles[first_min]
+            best_barycentric[group_queries] = barycentric[first_min]
+            best_dist2[group_queries] = group_dist2
+
+        return best_triangles, best_barycentric, best_dist2
+
+
+class BarycentricMap(object):
+    """BarycentricMap class: Closest point on a triangle mesh for a set of query points.
+
+    For each query point we find the closest point on the mesh triangles and store the three
+    triangle vertices with their barycentric weights. The distance to the closest vertex bounds
+    the search, then every triangle that could be closer is checked with a TriangleGrid. Any
+    number of per vertex values can then be moved from the mesh to the query points with apply,
+    which is one gather and a weighted sum.
+    """
+
+    def __init__(self, points, triangles, queryPoints):
+        """
+        :param points: Points of the mesh we're mapping from.
+        :type points: numpy.ndarray | list
+
+        :param triangles: Vertex ids with three per triangle. Can be flat or (triangles, 3).
+        :type triangles: numpy.ndarray | list
+
+        :param queryPoints: Points we want the closest point on the mesh for.
+        :type queryPoints: numpy.ndarray | list
+        """
+        points = numpy.asarray(points, dtype=numpy.float64)[:, :3]
+        queryPoints = numpy.asarray(queryPoints, dtype=numpy.float64)[:, :3]
+        triangles = numpy.asarray(triangles, dtype=numpy.int64).reshape(-1, 3)
+
+        closest_vertices, vertex_distances = closestPoints(points, queryPoints)
+        triangle_ids, barycentric, distances2 = TriangleGrid(points, triangles).query(queryPoints,
+                                                                                     vertex_distances)
+
+        # points that aren't on any triangle map straight to their closest vertex
+        self._indices = numpy.column_stack([closest_vertices] * 3)
+        self._weights = numpy.zeros((len(queryPoints), 3))
+        self._weights[:, 0] = 1.0
+        self._distances = vertex_distances.copy()
+
+        found = triangle_ids >= 0
+        self._indices[found] = triangles[triangle_ids[found]]
+        self._weights[found] = barycentric[found]
+        self._distances[found] = numpy.sqrt(distances2[found])
+
+    def getIndices(self):
+        """Return the three mesh vertex ids for each query point."""
+        return self._indices
+
+    def getWeights(self):
+        """Return the three barycentric weights for each query point."""
+        return self._weights
+
+    def getDistances(self):
+        """Return the distance from each query point to its closest point on the mesh."""
+        return self._distances
+
+    def apply(self, values):
+        """Interpolate per vertex values from the mesh to the query points.
+
+        :param values: Values with a row per mesh vertex. Can be 1D or 2D.
+        :type values: numpy.ndarray | list
+
+        :returns: Values with a row per query point.
+        :rtype: numpy.ndarray
+        """
+        values = numpy.asarray(values, dtype=numpy.float64)
+        if values.ndim == 1:
+            return numpy.einsum('ij,ij->i', values[self._indices], self._weights)
+        return numpy.einsum('ijk,ij->ik', values[self._indices], self._weights)
@@ -0,0 +1,238 @@
+"""Topology utilities for polygon meshes given as face vertex counts and face vertex ids."""
+import collections
+import hashlib
+import numpy
+
+# topology hash -> (indptr, indices) of the vertex adjacency
+_ADJACENCY_CACHE = dict()
+# most neighbor values smoothValues gathers at once, so wide weight arrays are smoothed a few columns at a time
+SMOOTH_CHUNK_SIZE = 2 ** 22
+
+
+def getHalfEdges(polygonCounts, polygonConnects):
+    """Return a lookup from each directed face edge to the face it belongs to.
+
+    :param polygonCounts: Number of vertices for each face.
+    :type polygonCounts: numpy.ndarray | list
+
+    :param polygonConnects: Vertex ids for each face, in winding order.
+    :type polygonConnects: numpy.ndarray | list
+
+    :returns: halfEdges, faceOffsets. halfEdges is a dict of (start, end): (face, position)
+    :rtype: tuple
+    """
+    counts = numpy.asarray(polygonCounts, dtype=numpy.int64)
+    connects = numpy.asarray(polygonConnects, dtype=numpy.int64)
+    offsets = numpy.concatenate([[0], numpy.cumsum(counts)])
+
+    face_ids = numpy.repeat(numpy.arange(len(counts)), counts)
+    positions = numpy.arange(len(connects)) - offsets[face_ids]
+    # the next vertex in the face, wrapping around at the end of each face
+    next_index = numpy.arange(len(connects)) + 1
+    last = offsets[1:] - 1
+    next_index[last] = offsets[:-1]
+    next_connects = connects[next_index]
+
+    keys = zip(connects.tolist(), next_connects.tolist())
+    halfEdges = dict(zip(keys, zip(face_ids.tolist(), positions.tolist())))
+
+    return halfEdges, offsets
+
+
+def getTopologicalMirrorMap(polygonCounts, polygonConnects, centerEdge, pointCount=None):
+    """Build a vertex mirror map by walking the faces on both sides of a center edge in lockstep.
+
+    Mirroring reverses the winding of a face, so the face on one side of an edge going a->b is
+    matched with the face going mirror(b)->mirror(a) on the other side. Each matched face pair
+    gives the mirror of all of its vertices and we move across every edge of the face to the
+    next pair. Every face is visited once so it's linear in the size of the mesh.
+
+    :param polygonCounts: Number of vertices for each face.
+    :type polygonCounts: numpy.ndarray | list
+
+    :param polygonConnects: Vertex ids for each face, in winding order.
+    :type polygonConnects: numpy.ndarray | list
+
+    :param centerEdge: The two vertex ids of an edge that lies on the line of symmetry.
+    :type centerEdge: tuple
+
+    :param pointCount: Number of vertices on the mesh. Default is the highest vertex id + 1.
+    :type pointCount: int
+
+    :returns: Mirrored vertex id for every vertex. Vertices we couldn't reach are -1.
+    :rtype: numpy.ndarray
+    """
+    connects = numpy.asarray(polygonConnects, dtype=numpy.int64)
+    counts = numpy.asarray(polygonCounts, dtype=numpy.int64)
+    if pointCount is None:
+        pointCount = int(connects.max()) + 1 if len(connects) else 0
+
+    halfEdges, offsets = getHalfEdges(counts, connects)
+    connect_list = connects.tolist()
+    count_list = counts.tolist()
+    offset_list = offsets.tolist()
+
+    mirror_map = [-1] * pointCount
+    start, end = [int(vertex) for vertex in centerEdge]
+    if (start, end) not in halfEdges and (end, start) not in halfEdges:
+        raise RuntimeError('{} is not an edge on the mesh.'.format(centerEdge))
+    mirror_map[start] = start
+    mirror_map[end] = end
+
+    visited = [False] * len(count_list)
+    queue = collections.deque([(start, end), (end, start)])
+    while queue:
+        start, end = queue.popleft()
+        if (start, end) not in halfEdges:
+            continue
+        face, position = halfEdges[(start, end)]
+        if visited[face]:
+            continue
+
+        mirror_start = mirror_map[start]
+        mirror_end = mirror_map[end]
+        if (mirror_end, mirror_start) not in halfEdges:
+            raise RuntimeError('Mesh is not symmetrical across edge {}.'.format((start, end)))
+        mirror_face, mirror_position = halfEdges[(mirror_end, mirror_start)]
+
+        count = count_list[face]
+        if count != count_list[mirror_face]:
+            raise RuntimeError('Mesh is not symmetrical, faces {} and {} have a different number of '
+                               'vertices.'.format(face, mirror_face))
+
+        # walk forward around this face and backward around the mirrored face
+        offset = offset_list[face]
+        mirror_offset = offset_list[mirror_face]
+        face_vertices = list()
+        for step in range(count):
+            vertex = connect_list[offset + (position + step) % count]
+            mirror_vertex = connect_list[mirror_offset + (mirror_position + 1 - step) % count]
+            if mirror_map[vertex] == -1:
+                mirror_map[vertex] = mirror_vertex
+                mirror_map[mirror_vertex] = vertex
+            elif mirror_map[vertex] != mirror_vertex:
+                raise RuntimeError('Mesh is not symmetrical at vertex {}.'.format(vertex))
+            face_vertices.append(vertex)
+
+        visited[face] = True
+        visited[mirror_face] = True
+        # cross every edge of the face into the neighboring face
+        for step in range(count):
+            queue.append((face_vertices[(step + 1) % count], face_vertices[step]))
+
+    return numpy.array(mirror_map, dtype=numpy.int64)
+
+
+def getTopologyHash(polygonCounts, polygonConnects):
+    """Return a hash of the face vertex counts and face vertex ids.
+
+    :param polygonCounts: Number of vertices for each face.
+    :type polygonCounts: numpy.ndarray | list
+
+    :param polygonConnects: Vertex ids for each face, in winding order.
+    :type polygonConnects: numpy.ndarray | list
+
+    :returns: Hex digest of the hash
+    :rtype: str
+    """
+    sha = hashlib.sha1()
+    sha.update(numpy.ascontiguousarray(polygonCounts, dtype=numpy.int32).tostring())
+    sha.update(numpy.ascontiguousarray(polygonConnects, dtype=numpy.int32).tostring())
+
+    return sha.hexdigest()
+
+
+def getVertexAdjacency(polygonCounts, polygonConnects, pointCount=None):
+    """Return the vertex adjacency of a mesh in compressed sparse row form. The neighbors of
+    vertex i are indices[indptr[i]:indptr[i + 1]]. Results are cached by topology.
+
+    :param polygonCounts: Number of vertices for each face.
+    :type polygonCounts: numpy.ndarray | list
+
+    :param polygonConnects: Vertex ids for each face, in winding order.
+    :type polygonConnects: numpy.ndarray | list
+
+    :param pointCount: Number of vertices on the mesh. Default is the highest vertex id + 1.
+    :type pointCount: int
+
+    :returns: indptr, indices
+    :rtype: tuple
+    """
+    connects = numpy.asarray(polygonConnects, dtype=numpy.int64)
+    counts = numpy.asarray(polygonCounts, dtype=numpy.int64)
+    if pointCount is None:
+        pointCount = int(connects.max()) + 1 if len(connects) else 0
+
+    key = (getTopologyHash(counts, connects), pointCount)
+    if key in _ADJACENCY_CACHE:
+        return _ADJACENCY_CACHE[key]
+
+    # every face edge in both directions
+    offsets = numpy.concatenate([[0], numpy.cumsum(counts)])
+    next_index = numpy.arange(len(connects)) + 1
+    next_index[offsets[1:] - 1] = offsets[:-1]
+    starts = numpy.concatenate([connects, connects[next_index]])
+    ends = numpy.concatenate([connects[next_index], connects])
+
+    # drop the edges shared by two faces
+    edge_keys = numpy.unique(starts * pointCount + ends)
+    starts = edge_keys // pointCount
+    indices = edge_keys % pointCount
+    indptr = numpy.searchsorted(starts, numpy.arange(pointCount + 1))
+
+    _ADJACENCY_CACHE[key] = (indptr, indices)
+    return indptr, indices
+
+
+def smoothValues(values, indptr, indices, iterations=1, strength=0.5, mask=None):
+    """Laplacian smooth per vertex values. Each iteration moves every value towards the average
+    of its neighbors by strength. Vertices with no neighbors are left alone.
+
+    :param values: Values with a row per vertex. Can be 1D or 2D.
+    :type values: numpy.ndarray
+
+    :param indptr: Adjacency row pointers from getVertexAdjacency.
+    :type indptr: numpy.ndarray
+
+    :param indices: Adjacency neighbor ids from getVertexAdjacency.
+    :type indices: numpy.ndarray
+
+    :param iterations: Number of times to smooth.
+    :type iterations: int
+
+    :param strength: How far to move towards the average each iteration, from 0 to 1.
+    :type strength: float
+
+    :param mask: Per vertex multiplier on the strength, from 0 to 1.
+    :type mask: numpy.ndarray
+
+    :returns: Smoothed values
+    :rtype: numpy.ndarray
+    """
+    values = numpy.array(values, dtype=numpy.float64)
+    one_dimensional = values.ndim == 1
+    if one_dimensional:
+        values = values[:, None]
+
+    neighbor_counts = numpy.diff(indptr).astype(numpy.float64)
+    has_neighbors = neighbor_counts > 0
+    weight = numpy.where(has_neighbors, float(strength), 0.0)
+    if mask is not None:
+        weight = weight * numpy.asarray(mask, dtype=numpy.float64)
+    weight = weight[:, None]
+    neighbor_counts[~has_neighbors] = 1.0
+    # reduceat sums from each start to the next one, so rows without neighbors are left out
+    starts = numpy.asarray(indptr[:-1])[has_neighbors]
+    chunk_size = max(1, SMOOTH_CHUNK_SIZE // max(1, len(indices)))
+
+    average = numpy.zeros_like(values)
+    for _ in range(iterations):
+        if not len(starts):
+            break
+        for column in range(0, values.shape[1], chunk_size):
+            columns = slice(column, column + chunk_size)
+            average[has_neighbors, columns] = numpy.add.reduceat(values[indices, columns], starts, axis=0)
+        average /= neighbor_counts[:, None]
+        values += weight * (average - values)
+
+    return values[:, 0] if one_dimensional else values
@@ -0,0 +1,27 @@
+'''
+Shared setup for the tests. Importing this puts the repo on the path so openrig can be imported
+wherever the tests are run from.
+
+Tests for the openrig.maya modules call installMaya before they import them. Maya isn't needed,
+they run on the in-memory stand-in in maya_stand_in.py, which the benchmarks use as well.
+'''
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def installMaya():
+    '''
+    Put the stand-in in place of Maya so "import maya.cmds" picks it up. Installing again does
+    nothing, so every test module can call this.
+
+    :return: The stand-in module, to build the scenes for the tests with.
+    :rtype: module
+    '''
+    import maya_stand_in
+    maya_stand_in.install()
+
+    return maya_stand_in
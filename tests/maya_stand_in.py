@@ -0,0 +1,1002 @@
+'''
+This is an in-memory stand-in for the parts of maya.cmds, maya.mel, maya.api.OpenMaya and
+maya.api.OpenMayaAnim that the weight code uses. It lets us test and time our own code outside of Maya.
+
+The scene only knows about meshes, joints, skinClusters, clusters and blendShapes with their
+target weights and deltas. Reading and writing weights through it costs almost nothing, so the
+timings are the cost of our python and numpy code plus the conversions we do to and from the
+data Maya hands us. They are not a replacement for timing inside of Maya.
+
+..example ::
+     import maya_stand_in
+     maya_stand_in.install()
+     import openrig.maya.weights
+'''
+import imp
+import os
+import re
+import sys
+import types
+import numpy
+
+# node name -> node
+SCENE = dict()
+# commands registered by plugins, name -> creator
+COMMANDS = dict()
+# plugin path -> module
+PLUGINS = dict()
+# undoable commands that were run, the last one is undone first
+UNDO_QUEUE = list()
+REDO_QUEUE = list()
+# length of the undo queue when each open chunk was opened
+_UNDO_CHUNKS = list()
+
+_WEIGHT_LIST_RE = re.compile(r'^([^.]+)\.(?:wl|weightList)\[(\d+)\]\.(?:w|weights)\[(.+)\]$')
+_TARGET_WEIGHT_RE = re.compile(r'^([^.]+)\.it\[0\]\.itg\[(\d+)\]\.tw\[(.+)\]$')
+_BASE_WEIGHT_RE = re.compile(r'^([^.]+)\.it\[0\]\.bw\[(.+)\]$')
+_TARGET_DELTA_RE = re.compile(r'^([^.]+)\.it\[0\]\.itg\[(\d+)\]\.iti\[\d+\]\.(ipt|ict)$')
+_VERTEX_RE = re.compile(r'^(?:.+\.)?vtx\[(\d+)(?::(\d+))?\]$')
+_ALIAS_RE = re.compile(r'^([^.]+)\.(?:w|weight)\[(\d+)\]$')
+_ATTR_RE = re.compile(r'^([^.]+)\.(\w+)(?:\[(.+)\])?$')
+
+
+class Node(object):
+    '''
+    Base for all of the nodes in the stand-in scene.
+    '''
+    nodeType = 'node'
+    inherited = ['node']
+
+    def __init__(self, name):
+        self.name = name
+        self.attrs = dict()
+        SCENE[name] = self
+
+    def fullPathName(self):
+        return '|{}'.format(self.name)
+
+
+class Transform(Node):
+    nodeType = 'transform'
+    inherited = ['containerBase', 'entity', 'dagNode', 'transform']
+
+    def __init__(self, name):
+        super(Transform, self).__init__(name)
+        self.shapes = list()
+
+
+class Joint(Transform):
+    nodeType = 'joint'
+    inherited = ['containerBase', 'entity', 'dagNode', 'transform', 'joint']
+
+    def __init__(self, name):
+        super(Joint, self).__init__(name)
+        self.attrs['liw'] = False
+
+
+class Mesh(Node):
+    nodeType = 'mesh'
+    inherited = ['containerBase', 'entity', 'dagNode', 'shape', 'geometryShape', 'deformableShape',
+                 'controlPoint', 'surfaceShape', 'mesh']
+
+    def __init__(self, name, parent, points, polygonCounts, polygonConnects):
+        super(Mesh, self).__init__(name)
+        self.parent = parent
+        parent.shapes.append(self)
+        self.points = numpy.asarray(points, dtype=numpy.float64)
+        self.polygonCounts = numpy.asarray(polygonCounts, dtype=numpy.int32)
+        self.polygonConnects = numpy.asarray(polygonConnects, dtype=numpy.int32)
+
+    def fullPathName(self):
+        return '|{}|{}'.format(self.parent.name, self.name)
+
+
+class Deformer(Node):
+    nodeType = 'geometryFilter'
+    inherited = ['geometryFilter']
+
+    def __init__(self, name, geometry):
+        super(Deformer, self).__init__(name)
+        self.geometry = list(geometry)
+
+
+class SkinCluster(Deformer):
+    nodeType = 'skinCluster'
+    inherited = ['geometryFilter', 'skinCluster']
+
+    def __init__(self, name, geometry, influences, weights):
+        super(SkinCluster, self).__init__(name, [geometry])
+        self.influences = list(influences)
+        self.weights = numpy.asarray(weights, dtype=numpy.float64)
+        self.attrs['skinningMethod'] = 0
+        self.attrs['normalizeWeights'] = 1
+        self.attrs['blendWeights'] = numpy.zeros(len(self.weights))
+
+
+class Cluster(Deformer):
+    nodeType = 'cluster'
+    inherited = ['geometryFilter', 'weightGeometryFilter', 'cluster']
+
+    def __init__(self, name, geometry, weights=None):
+        super(Cluster, self).__init__(name, [geometry])
+        self.weightList = {0: None if weights is None else numpy.asarray(weights, dtype=numpy.float64)}
+
+
+class BlendShape(Deformer):
+    nodeType = 'blendShape'
+    inherited = ['geometryFilter', 'weightGeometryFilter', 'blendShape']
+
+    def __init__(self, name, geometry, targets):
+        super(BlendShape, self).__init__(name, [geometry])
+        # index -> alias
+        self.targets = dict(enumerate(targets))
+        # index -> weights, None until they're painted
+        self.targetWeights = dict((index, None) for index in self.targets)
+        # None until they're painted
+        self.baseWeights = None
+        # index -> {'ipt': (N, 4) points, 'ict': N point indices}, missing until the deltas are set
+        self.targetDeltas = dict()
+
+
+def clear():
+    '''
+    Remove everything from the scene and the undo queue.
+    '''
+    SCENE.clear()
+    del UNDO_QUEUE[:]
+    del REDO_QUEUE[:]
+    del _UNDO_CHUNKS[:]
+
+
+def createMesh(name, points, polygonCounts, polygonConnects):
+    '''
+    Create a mesh named name with a shape named nameShape.
+
+    :return: The mesh shape node.
+    :rtype: Mesh
+    '''
+    transform = Transform(name)
+    return Mesh('{}Shape'.format(name), transform, points, polygonCounts, polygonConnects)
+
+
+# ------------------------------------------------------------------------------------------------
+# helpers
+# ------------------------------------------------------------------------------------------------
+def _getNode(name):
+    '''
+    Get the node for a name, full path or attribute. Returns None if it doesn't exist.
+    '''
+    if not isinstance(name, basestring):
+        return name if isinstance(name, Node) else None
+    name = name.split('.')[0].split('|')[-1]
+    return SCENE.get(name)
+
+
+def _getShape(name):
+    '''
+    Get the shape for a transform or shape name.
+    '''
+    node = _getNode(name)
+    if isinstance(node, Transform) and not isinstance(node, Joint) and node.shapes:
+        return node.shapes[0]
+    return node
+
+
+def _getRange(rangeString, count):
+    '''
+    Expand the index in [] on an attribute to a slice.
+    '''
+    if rangeString == '*':
+        return slice(0, count)
+    if ':' in rangeString:
+        start, end = rangeString.split(':')
+        return slice(int(start), int(end) + 1)
+    return slice(int(rangeString), int(rangeString) + 1)
+
+
+def _pointCount(deformer, geometryIndex=0):
+    return len(_getShape(deformer.geometry[geometryIndex]).points)
+
+
+def _getDeltaData(name):
+    '''
+    Get the blendShape, target index and ipt or ict for a target delta plug. None if it isn't one.
+    '''
+    match = _TARGET_DELTA_RE.match(name)
+    if not match:
+        return None
+    return _getNode(match.group(1)), int(match.group(2)), match.group(3)
+
+
+def _expandVertices(componentList):
+    '''
+    Expand vertex components like "vtx[0:3]" to an index array.
+    '''
+    indices = list()
+    for component in componentList:
+        match = _VERTEX_RE.match(component)
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else start
+        indices.extend(range(start, end + 1))
+    return numpy.array(indices, dtype=numpy.int64)
+
+
+def _emptyDeltas():
+    return dict(ipt=numpy.zeros((0, 4)), ict=numpy.zeros(0, dtype=numpy.int64))
+
+
+def _values(args):
+    if len(args) == 1 and isinstance(args[0], (list, tuple, numpy.ndarray)):
+        return numpy.asarray(args[0], dtype=numpy.float64)
+    return numpy.asarray(args, dtype=numpy.float64)
+
+
+# ------------------------------------------------------------------------------------------------
+# maya.cmds
+# ------------------------------------------------------------------------------------------------
+class _Cmds(types.ModuleType):
+    '''
+    maya.cmds stand-in. Commands that aren't implemented raise so a benchmark never silently
+    times a no-op.
+    '''
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        if name in COMMANDS:
+            return _getPluginCommand(name)
+        def notImplemented(*args, **kwargs):
+            raise NotImplementedError('maya.cmds.{} is not in the stand-in'.format(name))
+        return notImplemented
+
+    @staticmethod
+    def objExists(name):
+        match = _TARGET_WEIGHT_RE.match(name)
+        if match:
+            node = _getNode(match.group(1))
+            return isinstance(node, BlendShape) and node.targetWeights.get(int(match.group(2))) is not None
+        match = _BASE_WEIGHT_RE.match(name)
+        if match:
+            node = _getNode(match.group(1))
+            return isinstance(node, BlendShape) and node.baseWeights is not None
+        match = _WEIGHT_LIST_RE.match(name)
+        if match:
+            node = _getNode(match.group(1))
+            return isinstance(node, Cluster) and node.weightList.get(int(match.group(2))) is not None
+        if '.' in name:
+            node = _getNode(name)
+            return node is not None and name.split('.', 1)[1] in node.attrs
+        return _getNode(name) is not None
+
+    @staticmethod
+    def nodeType(name, i=False, inherited=False):
+        node = _getNode(name)
+        if node is None:
+            raise RuntimeError('No object matches name: {}'.format(name))
+        return list(node.inherited) if i or inherited else node.nodeType
+
+    @staticmethod
+    def ls(*args, **kwargs):
+        names = list()
+        for arg in args:
+            names.extend([arg] if isinstance(arg, basestring) else list(arg))
+        result = list()
+        for name in names:
+            node = _getNode(name)
+            if node is None:
+                continue
+            nodeType = kwargs.get('type') or kwargs.get('typ')
+            if nodeType and nodeType != node.nodeType and nodeType not in node.inherited:
+                continue
+            if kwargs.get('showType') or kwargs.get('st'):
+                result.extend([node.name, node.nodeType])
+            elif kwargs.get('l') or kwargs.get('long'):
+                result.append(node.fullPathName())
+            else:
+                result.append(node.name)
+        return result
+
+    @staticmethod
+    def listRelatives(name, p=False, parent=False, s=False, shapes=False, **kwargs):
+        node = _getNode(name)
+        if p or parent:
+            return [node.parent.name] if isinstance(node, Mesh) else None
+        if s or shapes:
+            return [shape.name for shape in getattr(node, 'shapes', list())] or None
+        return None
+
+    @staticmethod
+    def polyEvaluate(name, v=False, vertex=False, **kwargs):
+        return len(_getShape(name).points)
+
+    @staticmethod
+    def deformer(name, q=False, g=False, geometry=False, **kwargs):
+        return list(_getNode(name).geometry)
+
+    @staticmethod
+    def skinCluster(name, q=False, inf=False, influence=False, geometry=False, g=False, e=False,
+                    ai=None, addInfluence=None, **kwargs):
+        node = _getNode(name)
+        if e and (ai or addInfluence):
+            influence_list = [inf for inf in [ai or addInfluence] if inf not in node.influences]
+            node.influences.extend(influence_list)
+            node.weights = numpy.hstack([node.weights, numpy.zeros((len(node.weights), len(influence_list)))])
+            return
+        if inf or influence:
+            return list(node.influences)
+        if g or geometry:
+            return list(node.geometry)
+
+    @staticmethod
+    def blendShape(name, q=False, target=False, t=False, wc=False, weightCount=False, **kwargs):
+        return len(_getNode(name).targets)
+
+    @staticmethod
+    def aliasAttr(name, q=False, **kwargs):
+        if '.' not in name:
+            node = _getNode(name)
+            result = list()
+            for index in sorted(node.targets):
+                result.extend([node.targets[index], 'weight[{}]'.format(index)])
+            return result
+        match = _ALIAS_RE.match(name)
+        return _getNode(match.group(1)).targets.get(int(match.group(2)))
+
+    @staticmethod
+    def listAttr(name, m=False, multi=False, **kwargs):
+        node = _getNode(name)
+        if isinstance(node, BlendShape) and name.endswith('.w'):
+            return [node.targets[index] for index in sorted(node.targets)]
+        return list(node.attrs)
+
+    @staticmethod
+    def attributeQuery(attr, node=None, exists=False, **kwargs):
+        return attr in _getNode(node).attrs
+
+    @staticmethod
+    def listConnections(plug, s=True, d=True, c=False, **kwargs):
+        node = _getNode(plug)
+        if isinstance(node, SkinCluster) and plug.endswith('.matrix'):
+            result = list()
+            for index, inf in enumerate(node.influences):
+                result.extend(['{}.matrix[{}]'.format(node.name, index), inf])
+            return result
+        return None
+
+    @staticmethod
+    def getAttr(name, multiIndices=False, mi=False, **kwargs):
+        delta_data = _getDeltaData(name)
+        if delta_data:
+            node, index, attr = delta_data
+            if index not in node.targetDeltas:
+                return None
+            value = node.targetDeltas[index][attr]
+            if attr == 'ipt':
+                return [tuple(point) for point in value.tolist()]
+            return ['vtx[{}]'.format(vertex) for vertex in value.tolist()]
+        match = _TARGET_WEIGHT_RE.match(name)
+        if match:
+            node = _getNode(match.group(1))
+            weights = node.targetWeights[int(match.group(2))]
+            return weights[_getRange(match.group(3), len(weights))].tolist()
+        match = _BASE_WEIGHT_RE.match(name)
+        if match:
+            weights = _getNode(match.group(1)).baseWeights
+            return weights[_getRange(match.group(2), len(weights))].tolist()
+        match = _WEIGHT_LIST_RE.match(name)
+        if match:
+            node = _getNode(match.group(1))
+            weights = node.weightList[int(match.group(2))]
+            return weights[_getRange(match.group(3), len(weights))].tolist()
+        match = _ATTR_RE.match(name)
+        node = _getNode(match.group(1))
+        attr = match.group(2)
+        if isinstance(node, SkinCluster) and attr == 'matrix':
+            return range(len(node.influences))
+        value = node.attrs[attr]
+        if isinstance(value, numpy.ndarray):
+            if multiIndices or mi:
+                return range(len(value))
+            if match.group(3):
+                return value[_getRange(match.group(3), len(value))].tolist()
+            return value.tolist()
+        return value
+
+    @staticmethod
+    def setAttr(name, *args, **kwargs):
+        delta_data = _getDeltaData(name)
+        if delta_data:
+            # the count comes first, like the pointArray and componentList flags in Maya
+            node, index, attr = delta_data
+            values = args[1:]
+            if attr == 'ipt':
+                value = numpy.array(values, dtype=numpy.float64).reshape(-1, 4)
+            else:
+                value = _expandVertices(values)
+            node.targetDeltas.setdefault(index, _emptyDeltas())[attr] = value
+            return
+        match = _TARGET_WEIGHT_RE.match(name)
+        if match:
+            node = _getNode(match.group(1))
+            index = int(match.group(2))
+            if node.targetWeights.get(index) is None:
+                node.targetWeights[index] = numpy.ones(_pointCount(node))
+            node.targetWeights[index][_getRange(match.group(3), _pointCount(node))] = _values(args)
+            return
+        match = _BASE_WEIGHT_RE.match(name)
+        if match:
+            node = _getNode(match.group(1))
+            if node.baseWeights is None:
+                node.baseWeights = numpy.ones(_pointCount(node))
+            node.baseWeights[_getRange(match.group(2), _pointCount(node))] = _values(args)
+            return
+        match = _WEIGHT_LIST_RE.match(name)
+        if match:
+            node = _getNode(match.group(1))
+            index = int(match.group(2))
+            if node.weightList.get(index) is None:
+                node.weightList[index] = numpy.ones(_pointCount(node, index))
+            node.weightList[index][_getRange(match.group(3), _pointCount(node, index))] = _values(args)
+            return
+        match = _ATTR_RE.match(name)
+        node = _getNode(match.group(1))
+        attr = match.group(2)
+        if match.group(3):
+            node.attrs[attr][_getRange(match.group(3), len(node.attrs[attr]))] = _values(args)
+        else:
+            node.attrs[attr] = args[0]
+
+    @staticmethod
+    def warning(message):
+        pass
+
+    @staticmethod
+    def undoInfo(q=False, query=False, state=False, st=False, openChunk=False, ock=False, closeChunk=False,
+                 cck=False, **kwargs):
+        if q or query:
+            return True
+        if openChunk or ock:
+            _UNDO_CHUNKS.append(len(UNDO_QUEUE))
+        if (closeChunk or cck) and _UNDO_CHUNKS:
+            start = _UNDO_CHUNKS.pop()
+            if len(UNDO_QUEUE) > start:
+                UNDO_QUEUE[start:] = [_UndoChunk(UNDO_QUEUE[start:])]
+
+    @staticmethod
+    def undo():
+        if UNDO_QUEUE:
+            command = UNDO_QUEUE.pop()
+            command.undoIt()
+            REDO_QUEUE.append(command)
+
+    @staticmethod
+    def redo():
+        if REDO_QUEUE:
+            command = REDO_QUEUE.pop()
+            command.redoIt()
+            UNDO_QUEUE.append(command)
+
+    @staticmethod
+    def pluginInfo(path, q=False, query=False, loaded=False, **kwargs):
+        return path in PLUGINS
+
+    @staticmethod
+    def loadPlugin(path, qt=False, quiet=False):
+        '''
+        Only python plugins given by path are supported. Like Maya, the file is loaded as a module
+        of its own, not the module it is in the package.
+        '''
+        if not os.path.isfile(path):
+            raise NotImplementedError('maya.cmds.loadPlugin only loads python files in the stand-in')
+        module = imp.load_source('{}_plugin'.format(os.path.splitext(os.path.basename(path))[0]), path)
+        module.initializePlugin(path)
+        PLUGINS[path] = module
+
+    @staticmethod
+    def deformerWeights(filename, export=False, ex=False, deformer=None, path='', skip=None, at=None,
+                        attribute=None, **kwargs):
+        '''
+        Only exporting is supported. The file is written in the same layout Maya uses.
+        '''
+        if not (export or ex):
+            raise NotImplementedError('maya.cmds.deformerWeights only exports in the stand-in')
+        node = _getNode(deformer)
+        shape = _getShape(node.geometry[0])
+        if isinstance(node, SkinCluster):
+            sources = node.influences
+            weights = node.weights
+        elif isinstance(node, Cluster):
+            sources = [node.name]
+            weights = node.weightList[0]
+            weights = numpy.ones(len(shape.points)) if weights is None else weights
+            weights = weights[:, None]
+        elif isinstance(node, BlendShape):
+            # the base weights come first with the blendShape as the source, then one per target
+            indices = sorted(node.targets)
+            sources = [node.name] + [node.targets[index] for index in indices]
+            weights = numpy.column_stack([numpy.ones(len(shape.points)) if weights is None else weights
+                                          for weights in [node.baseWeights] +
+                                          [node.targetWeights[index] for index in indices]])
+        else:
+            raise NotImplementedError('maya.cmds.deformerWeights only exports skinClusters, clusters and '
+                                      'blendShapes')
+
+        lines = ['<?xml version="1.0"?>', '<deformerWeight>',
+                 '  <headerInfo fileName="{}" worldMatrix="1 0 0 0 0 1 0 0 0 0 1 0 0 0 0 1 "/>'.format(filename),
+                 '  <shape name="{}" group="0" stride="3" size="{}" max="{}">'.format(shape.name, len(shape.points),
+                                                                                  len(shape.points))]
+        lines.extend(['    <point index="{}" value=" {:.6f} {:.6f} {:.6f}"/>'.format(index, *point)
+                      for index, point in enumerate(shape.points[:, :3].tolist())])
+        lines.append('  </shape>')
+        for column, source in enumerate(sources):
+            indices = numpy.flatnonzero(weights[:, column])
+            lines.append('  <weights deformer="{}" source="{}" shape="{}" layer="{}" defaultValue="0.000" '
+                         'size="{}" max="{}">'.format(node.name, source, shape.name, column, len(indices),
+                                                      len(shape.points) - 1))
+            lines.extend(['    <point index="{}" value="{:.3f}"/>'.format(index, value)
+                          for index, value in zip(indices.tolist(), weights[indices, column].tolist())])
+            lines.append('  </weights>')
+        for attr in _toList(at or attribute):
+            value = node.attrs[attr]
+            if isinstance(value, numpy.ndarray):
+                lines.append('  <attribute name="{}" multi="{}" value="{}" size="{}"/>'.format(
+                    attr, ' '.join(map(str, range(len(value)))), ' '.join(map(str, value.tolist())), len(value)))
+            else:
+                lines.append('  <attribute name="{}" value="{}" size="1"/>'.format(attr, value))
+        lines.append('</deformerWeight>')
+
+        with open(os.path.join(path, filename), 'w') as f:
+            f.write('\n'.join(lines))
+
+
+class _UndoChunk(object):
+    '''
+    Commands run between an open and close chunk. They're undone together.
+    '''
+    def __init__(self, commands):
+        self.commands = list(commands)
+
+    def undoIt(self):
+        for command in reversed(self.commands):
+            command.undoIt()
+
+    def redoIt(self):
+        for command in self.commands:
+            command.redoIt()
+
+
+def _getPluginCommand(name):
+    '''
+    Run a command registered by a plugin and put it on the undo queue.
+    '''
+    def runCommand(*args, **kwargs):
+        command = COMMANDS[name]()
+        result = command.doIt(args)
+        if command.isUndoable():
+            UNDO_QUEUE.append(command)
+            del REDO_QUEUE[:]
+        return result
+    return runCommand
+
+
+def _toList(value):
+    if value is None:
+        return list()
+    return [value] if isinstance(value, basestring) else list(value)
+
+
+# ------------------------------------------------------------------------------------------------
+# maya.api.OpenMaya
+# ------------------------------------------------------------------------------------------------
+class MFn(object):
+    kInvalid = 0
+    kTransform = 110
+    kMesh = 296
+    kNurbsCurve = 267
+    kJoint = 121
+    kCurveCVComponent = 533
+    kMeshVertComponent = 554
+
+
+class MSpace(object):
+    kObject = 2
+    kWorld = 4
+
+
+class MDagPath(object):
+    def __init__(self, node=None):
+        self._node = node
+
+    def extendToShape(self):
+        if isinstance(self._node, Transform) and self._node.shapes:
+            self._node = self._node.shapes[0]
+        return self
+
+    def fullPathName(self):
+        return self._node.fullPathName()
+
+    def partialPathName(self):
+        return self._node.name
+
+    def node(self):
+        return self._node
+
+    def apiType(self):
+        if isinstance(self._node, Mesh):
+            return MFn.kMesh
+        if isinstance(self._node, Joint):
+            return MFn.kJoint
+        return MFn.kTransform
+
+    def hasFn(self, fn):
+        return self.apiType() == fn
+
+
+class MSelectionList(object):
+    def __init__(self):
+        self._nodes = list()
+        self._names = list()
+
+    def add(self, name):
+        node = _getNode(name)
+        if node is None:
+            raise RuntimeError('(kInvalidParameter): Object does not exist')
+        self._nodes.append(node)
+        self._names.append(name)
+        return self
+
+    def length(self):
+        return len(self._nodes)
+
+    def getDagPath(self, index):
+        return MDagPath(self._nodes[index])
+
+    def getDependNode(self, index):
+        return self._nodes[index]
+
+    def getPlug(self, index):
+        delta_data = _getDeltaData(self._names[index])
+        if not delta_data:
+            raise NotImplementedError('MSelectionList.getPlug only supports target deltas in the stand-in')
+        return MPlug(*delta_data)
+
+
+class MPlug(object):
+    '''
+    Plug on the ipt or ict of a blendShape target. The data is held in the same arrays
+    cmds.getAttr and cmds.setAttr use.
+    '''
+    def __init__(self, node, index, attr):
+        self._node = node
+        self._index = index
+        self._attr = attr
+
+    def _getValue(self):
+        if self._index not in self._node.targetDeltas:
+            return None
+        return self._node.targetDeltas[self._index][self._attr]
+
+    def _setValue(self, value):
+        '''
+        Set the array on the plug. None puts the plug back to never being set.
+        '''
+        data = self._node.targetDeltas.setdefault(self._index, _emptyDeltas())
+        data[self._attr] = _emptyDeltas()[self._attr] if value is None else value
+        if value is None and not any(len(array) for array in data.values()):
+            del self._node.targetDeltas[self._index]
+
+    def asMObject(self):
+        if self._index not in self._node.targetDeltas:
+            raise RuntimeError('(kFailure): Unexpected Internal Failure')
+        value = self._node.targetDeltas[self._index][self._attr]
+        if self._attr == 'ipt':
+            return _PointArrayData(value)
+        component = _Component(MFn.kMeshVertComponent)
+        component.elements = value.tolist()
+        return _ComponentListData([component])
+
+    def setMObject(self, data):
+        if isinstance(data, _PointArrayData):
+            value = numpy.array(data.points, dtype=numpy.float64).reshape(-1, 4)
+        else:
+            value = numpy.array([element for component in data.components for element in component.elements],
+                                dtype=numpy.int64)
+        self._setValue(value)
+
+
+class MDGModifier(object):
+    '''
+    Only newPlugValue on the plugs MPlug supports.
+    '''
+    def __init__(self):
+        self._edits = list()
+
+    def newPlugValue(self, plug, data):
+        self._edits.append((plug, data, plug._getValue()))
+        return self
+
+    def doIt(self):
+        for plug, data, oldValue in self._edits:
+            plug.setMObject(data)
+
+    def undoIt(self):
+        for plug, data, oldValue in reversed(self._edits):
+            plug._setValue(oldValue)
+
+
+class MPxCommand(object):
+    def isUndoable(self):
+        return False
+
+
+class MFnPlugin(object):
+    def __init__(self, plugin=None, vendor=None, version=None):
+        self._plugin = plugin
+
+    def registerCommand(self, name, creator, *args):
+        COMMANDS[name] = creator
+
+    def deregisterCommand(self, name):
+        COMMANDS.pop(name, None)
+
+
+class _PointArrayData(object):
+    def __init__(self, points):
+        self.points = points
+
+    def isNull(self):
+        return False
+
+
+class _ComponentListData(object):
+    def __init__(self, components=None):
+        self.components = list(components or list())
+
+    def isNull(self):
+        return False
+
+
+def MPointArray(values=None):
+    return [tuple(value) for value in values or list()]
+
+
+class MFnPointArrayData(object):
+    def __init__(self, data=None):
+        self._data = data
+
+    def create(self, points):
+        self._data = _PointArrayData(points)
+        return self._data
+
+    def array(self):
+        return [tuple(point) for point in numpy.asarray(self._data.points).tolist()]
+
+
+class MFnComponentListData(object):
+    def __init__(self, data=None):
+        self._data = data
+
+    def create(self):
+        self._data = _ComponentListData()
+        return self._data
+
+    def add(self, component):
+        self._data.components.append(component)
+
+    def length(self):
+        return len(self._data.components)
+
+    def get(self, index):
+        return self._data.components[index]
+
+
+class MObjectHandle(object):
+    def __init__(self, node):
+        self._node = node
+
+    def isValid(self):
+        return SCENE.get(self._node.name) is self._node
+
+    def object(self):
+        return self._node
+
+    def hashCode(self):
+        return id(self._node)
+
+
+class MFnDependencyNode(object):
+    def __init__(self, node):
+        self._node = node
+
+    def name(self):
+        return self._node.name
+
+
+class _Component(object):
+    def __init__(self, componentType):
+        self.componentType = componentType
+        self.elementCount = 0
+        self.elements = list()
+
+
+class MFnComponent(object):
+    def __init__(self, component=None):
+        self._component = component
+
+    @property
+    def componentType(self):
+        return self._component.componentType
+
+
+class MFnSingleIndexedComponent(MFnComponent):
+    def create(self, componentType):
+        self._component = _Component(componentType)
+        return self._component
+
+    def setCompleteData(self, count):
+        self._component.elementCount = count
+
+    def addElements(self, elements):
+        self._component.elements.extend(elements)
+
+    def getElements(self):
+        return list(self._component.elements)
+
+    @property
+    def elementCount(self):
+        return self._component.elementCount
+
+
+class MFnMesh(object):
+    def __init__(self, dagPath):
+        self._mesh = _getShape(dagPath.node() if isinstance(dagPath, MDagPath) else dagPath)
+
+    def getPoints(self, space=MSpace.kObject):
+        # MPointArray converts to rows of (x, y, z, w)
+        return numpy.column_stack([self._mesh.points[:, :3], numpy.ones(len(self._mesh.points))])
+
+    def getVertices(self):
+        return self._mesh.polygonCounts.copy(), self._mesh.polygonConnects.copy()
+
+    def getTriangles(self):
+        counts = self._mesh.polygonCounts
+        offsets = numpy.concatenate([[0], numpy.cumsum(counts)])
+        triangles = list()
+        for face, count in enumerate(counts.tolist()):
+            vertices = self._mesh.polygonConnects[offsets[face]:offsets[face] + count].tolist()
+            for index in range(1, count - 1):
+                triangles.extend([vertices[0], vertices[index], vertices[index + 1]])
+        return counts - 2, numpy.array(triangles, dtype=numpy.int32)
+
+    @property
+    def numVertices(self):
+        return len(self._mesh.points)
+
+    @property
+    def numPolygons(self):
+        return len(self._mesh.polygonCounts)
+
+    @property
+    def numFaceVertices(self):
+        return len(self._mesh.polygonConnects)
+
+    def getEdgeVertices(self, edge):
+        raise NotImplementedError('MFnMesh.getEdgeVertices is not in the stand-in')
+
+
+class MItGeometry(object):
+    def __init__(self, dagPath):
+        self._mesh = _getShape(dagPath.node())
+
+    def count(self):
+        return len(self._mesh.points)
+
+    def allPositions(self, space=MSpace.kObject):
+        return MFnMesh(MDagPath(self._mesh)).getPoints(space)
+
+
+def MIntArray(values=None):
+    return list(values or list())
+
+
+class MDoubleArray(object):
+    '''
+    Sequence of doubles like the API array. Slices come back as lists and += appends, which is
+    all the weight code uses. The values are kept in numpy chunks so appending stays cheap.
+    '''
+    def __init__(self, values=None):
+        self._chunks = [numpy.asarray(values if values is not None else list(), dtype=numpy.float64)]
+
+    def _array(self):
+        if len(self._chunks) > 1:
+            self._chunks = [numpy.concatenate(self._chunks)]
+        return self._chunks[0]
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self._chunks)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._array()[key].tolist()
+        return float(self._array()[key])
+
+    def __iter__(self):
+        return iter(self._array().tolist())
+
+    def __iadd__(self, other):
+        self._chunks.append(other._array() if isinstance(other, MDoubleArray) else
+                            numpy.asarray(other, dtype=numpy.float64))
+        return self
+
+
+# ------------------------------------------------------------------------------------------------
+# maya.api.OpenMayaAnim
+# ------------------------------------------------------------------------------------------------
+class MFnSkinCluster(object):
+    def __init__(self, node):
+        self._node = node
+
+    def influenceObjects(self):
+        return [MDagPath(SCENE[inf]) for inf in self._node.influences]
+
+    def getWeights(self, shapeDagPath, components, *args):
+        weights = MDoubleArray()
+        weights._chunks = [self._node.weights.ravel().copy()]
+        return weights, self._node.weights.shape[1]
+
+    def setWeights(self, shapeDagPath, components, influenceIndices, values, normalize=False, returnOldWeights=False):
+        values = values._array().reshape(-1, len(influenceIndices))
+        oldWeights = MDoubleArray(self._node.weights[:len(values), list(influenceIndices)].ravel())
+        self._node.weights[:len(values), list(influenceIndices)] = values
+        if returnOldWeights:
+            return oldWeights
+
+    def getBlendWeights(self, shapeDagPath, components):
+        return MDoubleArray(self._node.attrs['blendWeights'].copy())
+
+    def setBlendWeights(self, shapeDagPath, components, values):
+        values = values._array()
+        self._node.attrs['blendWeights'][:len(values)] = values
+
+
+# ------------------------------------------------------------------------------------------------
+# install
+# ------------------------------------------------------------------------------------------------
+def install():
+    '''
+    Put the stand-in modules in sys.modules so "import maya.cmds" picks them up. This has to be
+    called before any of the openrig.maya modules are imported. Installing again does nothing so
+    every module that calls this patches the same maya.cmds.
+    '''
+    if isinstance(sys.modules.get('maya.cmds'), _Cmds):
+        return
+    maya_module = types.ModuleType('maya')
+    maya_module.__path__ = list()
+    cmds_module = _Cmds('maya.cmds')
+    mel_module = types.ModuleType('maya.mel')
+    mel_module.eval = lambda command: None
+    api_module = types.ModuleType('maya.api')
+    api_module.__path__ = list()
+
+    om2_module = types.ModuleType('maya.api.OpenMaya')
+    for obj in [MFn, MSpace, MDagPath, MSelectionList, MObjectHandle, MFnDependencyNode, MFnComponent,
+                MFnSingleIndexedComponent, MFnMesh, MItGeometry, MIntArray, MDoubleArray, MPlug, MPointArray,
+                MFnPointArrayData, MFnComponentListData, MDGModifier, MPxCommand, MFnPlugin]:
+        setattr(om2_module, obj.__name__, obj)
+    oma2_module = types.ModuleType('maya.api.OpenMayaAnim')
+    oma2_module.MFnSkinCluster = MFnSkinCluster
+    # the old api is only imported, never used in the code we benchmark
+    om1_module = types.ModuleType('maya.OpenMaya')
+
+    maya_module.cmds = cmds_module
+    maya_module.mel = mel_module
+    maya_module.api = api_module
+    maya_module.OpenMaya = om1_module
+    api_module.OpenMaya = om2_module
+    api_module.OpenMayaAnim = oma2_module
+    sys.modules.update({'maya': maya_module,
+                        'maya.cmds': cmds_module,
+                        'maya.mel': mel_module,
+                        'maya.api': api_module,
+                        'maya.api.OpenMaya': om2_module,
+                        'maya.api.OpenMayaAnim': oma2_module,
+                        'maya.OpenMaya': om1_module})
@@ -0,0 +1,124 @@
+'''
+Tests for openrig.maya.blendShape. Maya isn't needed, these run on the in-memory stand-in
+in maya_stand_in.py.
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+import helpers
+maya_stand_in = helpers.installMaya()
+
+import maya.cmds as mc
+import openrig.maya.blendShape as rig_blendShape
+
+
+class TestTargetDeltas(unittest.TestCase):
+
+    def setUp(self):
+        maya_stand_in.clear()
+        rig_blendShape.clearTargetAliasCache()
+        self.directory = tempfile.mkdtemp()
+        points = [(0, 0, 0), (1, 0, 0), (2, 0, 0), (0, 1, 0), (1, 1, 0), (2, 1, 0)]
+        for name in ['body_geo', 'copy_geo']:
+            shape = maya_stand_in.createMesh(name, points, [4, 4], [0, 1, 4, 3, 1, 2, 5, 4])
+            maya_stand_in.BlendShape(name + '_blendShape', shape.name, ['smile', 'blink', 'frown'])
+
+        self.deltas = {'smile': (numpy.array([[1.0, 2.0, 3.0], [-.5, 0.0, .25]]), numpy.array([1, 4])),
+                       'blink': (numpy.array([[0.0, 0.0, 1.0]]), numpy.array([5]))}
+        for target, (deltas, indices) in self.deltas.items():
+            rig_blendShape.setTargetDeltaArray('body_geo_blendShape', target, deltas, indices)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_exportAndImport(self):
+        filepath = os.path.join(self.directory, 'body_geo__body_geo_blendShape.shp')
+        self.assertEqual(rig_blendShape.exportTargetDeltas('body_geo_blendShape', filepath), filepath)
+        self.assertEqual(os.listdir(self.directory), [os.path.basename(filepath)])
+
+        data = rig_blendShape.readTargetDeltas(filepath)
+        self.assertEqual(data['targets'], ['smile', 'blink', 'frown'])
+        numpy.testing.assert_array_equal(data['offsets'], [0, 2, 3, 3])
+
+        self.assertEqual(rig_blendShape.importTargetDeltas('copy_geo_blendShape', filepath, targets=['smile', 'frown']),
+                         ['smile', 'frown'])
+        deltas, indices = rig_blendShape.getTargetDeltaArray('copy_geo_blendShape', 'smile')
+        numpy.testing.assert_allclose(deltas, self.deltas['smile'][0])
+        numpy.testing.assert_array_equal(indices, self.deltas['smile'][1])
+        # frown had no deltas so it's cleared, blink wasn't imported
+        deltas, indices = rig_blendShape.getTargetDeltaArray('copy_geo_blendShape', 'frown')
+        numpy.testing.assert_array_equal(deltas, [[0.0, 0.0, 0.0]])
+        self.assertEqual(len(rig_blendShape.getTargetDeltaArray('copy_geo_blendShape', 'blink')[1]), 0)
+
+    def test_zipped(self):
+        filepath = os.path.join(self.directory, 'body_geo__body_geo_blendShape.shp.gz')
+        rig_blendShape.exportTargetDeltas('body_geo_blendShape', filepath)
+        self.assertTrue(rig_blendShape.isTargetDeltaFile(filepath))
+
+        rig_blendShape.importTargetDeltas('copy_geo_blendShape', filepath)
+        deltas, indices = rig_blendShape.getTargetDeltaArray('copy_geo_blendShape', 'smile')
+        numpy.testing.assert_allclose(deltas, self.deltas['smile'][0])
+        numpy.testing.assert_array_equal(indices, self.deltas['smile'][1])
+
+        # files written by the blendShape command can only be read by the command
+        filepath = os.path.join(self.directory, 'maya.shp')
+        with open(filepath, 'wb') as f:
+            f.write(b'FOR4')
+        self.assertFalse(rig_blendShape.isTargetDeltaFile(filepath))
+
+    def test_duplicateIndices(self):
+        rig_blendShape.setTargetDeltaArray('body_geo_blendShape', 'frown',
+                                           [[1.0, 0.0, 0.0], [2.0, 0.0, 0.0], [3.0, 0.0, 0.0]], [4, 0, 4])
+        deltas, indices = rig_blendShape.getTargetDeltaArray('body_geo_blendShape', 'frown')
+        numpy.testing.assert_array_equal(indices, [0, 4])
+        numpy.testing.assert_array_equal(deltas[:, 0], [2.0, 1.0])
+
+    def test_missingTarget(self):
+        with self.assertRaises(RuntimeError):
+            rig_blendShape.getTargetDeltasBatch('body_geo_blendShape', ['jaw_open'])
+        with self.assertRaises(RuntimeError):
+            rig_blendShape.setTargetDeltaArray('body_geo_blendShape', 'jaw_open', [[1.0, 0.0, 0.0]], [0])
+
+    def test_scaleTargetDeltas(self):
+        mask = numpy.array([0.0, 1.0, 0.0, 0.0, .5, 1.0])
+        targets = rig_blendShape.scaleTargetDeltas('body_geo_blendShape', ['smile', 'blink'], 0.0, mask=mask, axis='xz')
+        self.assertEqual(targets, ['smile', 'blink'])
+        numpy.testing.assert_allclose(rig_blendShape.getTargetDeltaArray('body_geo_blendShape', 'smile')[0],
+                                      [[0.0, 2.0, 0.0], [-.25, 0.0, .125]])
+        numpy.testing.assert_allclose(rig_blendShape.getTargetDeltaArray('body_geo_blendShape', 'blink')[0],
+                                      [[0.0, 0.0, 0.0]])
+
+        rig_blendShape.multiplyTargetDeltas('body_geo_blendShape', numpy.full(6, 2.0), targets='smile', axis='y')
+        numpy.testing.assert_allclose(rig_blendShape.getTargetDeltaArray('body_geo_blendShape', 'smile')[0],
+                                      [[0.0, 4.0, 0.0], [-.25, 0.0, .125]])
+        with self.assertRaises(ValueError):
+            rig_blendShape.scaleTargetDeltas('body_geo_blendShape', ['smile'], 0.0, axis='w')
+
+    def test_undo(self):
+        before = dict((target, rig_blendShape.getTargetDeltaArray('body_geo_blendShape', target))
+                      for target in ['smile', 'blink', 'frown'])
+        rig_blendShape.scaleTargetDeltas('body_geo_blendShape', ['smile', 'blink'], 2.0)
+        rig_blendShape.setTargetDeltaArray('body_geo_blendShape', 'frown', [[1.0, 0.0, 0.0]], [2])
+
+        # the new target deltas and then both scaled targets with one undo
+        mc.undo()
+        self.assertEqual(len(rig_blendShape.getTargetDeltaArray('body_geo_blendShape', 'frown')[1]), 0)
+        numpy.testing.assert_allclose(rig_blendShape.getTargetDeltaArray('body_geo_blendShape', 'smile')[0],
+                                      before['smile'][0] * 2.0)
+        mc.undo()
+        for target, (deltas, indices) in before.items():
+            result = rig_blendShape.getTargetDeltaArray('body_geo_blendShape', target)
+            numpy.testing.assert_allclose(result[0], deltas)
+            numpy.testing.assert_array_equal(result[1], indices)
+
+        mc.redo()
+        numpy.testing.assert_allclose(rig_blendShape.getTargetDeltaArray('body_geo_blendShape', 'blink')[0],
+                                      before['blink'][0] * 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+'''
+Tests for openrig.shared.components. These only need numpy.
+'''
+import unittest
+
+import numpy
+
+# puts openrig on the path
+import helpers
+
+import openrig.shared.components as components
+
+
+class TestComponents(unittest.TestCase):
+
+    def test_roundTrip(self):
+        random = numpy.random.RandomState(0)
+        for _ in range(20):
+            indices = numpy.unique(random.randint(0, 200, random.randint(1, 100)))
+            component_list = components.compressIndices(indices, node='body_geo')
+            numpy.testing.assert_array_equal(components.expandIndices(component_list), indices)
+            self.assertEqual(components.flattenComponents(component_list),
+                             ['body_geo.vtx[{}]'.format(index) for index in indices])
+
+    def test_compressIndices(self):
+        self.assertEqual(components.compressIndices([7, 3, 0, 1, 2, 3]), ['vtx[0:3]', 'vtx[7]'])
+        self.assertEqual(components.compressIndices([4, 5], component='cp', node='body_geo'),
+                         ['body_geo.cp[4:5]'])
+        self.assertEqual(components.compressIndices([]), [])
+
+    def test_expandIndices(self):
+        numpy.testing.assert_array_equal(components.expandIndices(['vtx[5:6]', 'body_geo.vtx[0]']), [5, 6, 0])
+        numpy.testing.assert_array_equal(components.expandIndices('vtx[*]', count=3), [0, 1, 2])
+        with self.assertRaises(ValueError):
+            components.expandIndices('vtx[*]')
+        with self.assertRaises(ValueError):
+            components.expandIndices('surface.cv[0][1]')
+
+    def test_groupIndices(self):
+        groups = components.groupIndices(['body_geo.map[0:1]', 'head_geo.map[4]', 'body_geo.map[3]'])
+        self.assertEqual(list(groups.keys()), ['body_geo', 'head_geo'])
+        numpy.testing.assert_array_equal(groups['body_geo'], [0, 1, 3])
+        numpy.testing.assert_array_equal(groups['head_geo'], [4])
+
+    def test_flattenComponents(self):
+        self.assertEqual(components.flattenComponents(['body_geo', 'surface.cv[0:1][2]']),
+                         ['body_geo', 'surface.cv[0][2]', 'surface.cv[1][2]'])
+        self.assertFalse(components.isExpandable('body_geo.vtx[*]'))
+        self.assertFalse(components.isComponent('body_geo'))
+
+
+if __name__ == '__main__':
+    unittest.main()
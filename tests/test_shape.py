@@ -0,0 +1,50 @@
+'''
+Tests for openrig.maya.shape. Maya isn't needed, these run on the in-memory stand-in
+in maya_stand_in.py.
+'''
+import unittest
+
+import numpy
+
+import helpers
+maya_stand_in = helpers.installMaya()
+
+import openrig.maya.shape as rig_shape
+
+
+class TestDeltas(unittest.TestCase):
+
+    def setUp(self):
+        maya_stand_in.clear()
+        points = numpy.array([(0, 0, 0), (1, 0, 0), (0, 1, 0), (1, 1, 0)], dtype=numpy.float64)
+        maya_stand_in.createMesh('base_geo', points.copy(), [4], [0, 1, 3, 2])
+        points[1] += (.5, .25, 0.0)
+        points[3] += (1e-6, 0.0, 0.0)
+        points[2] += (-.123456, 0.0, 1.0)
+        maya_stand_in.createMesh('target_geo', points, [4], [0, 1, 3, 2])
+
+    def test_getPointDeltas(self):
+        deltas, indices = rig_shape.getPointDeltas('base_geo', 'target_geo')
+        numpy.testing.assert_array_equal(indices, [1, 2])
+        numpy.testing.assert_allclose(deltas, [[.5, .25, 0.0], [-.123456, 0.0, 1.0]])
+
+    def test_getDeltas(self):
+        numpy.testing.assert_allclose(rig_shape.getDeltas('base_geo', 'target_geo'), [0.0, .5, -.1235, 0.0])
+        self.assertEqual(rig_shape.getDeltas('base_geo', 'base_geo'), [])
+        self.assertEqual(rig_shape.getDeltaIndices('base_geo', 'target_geo'), [1, 2])
+
+    def test_deformedBase(self):
+        # the base is deformed, the deltas are still from its rest shape like a blendShape would get them
+        base = maya_stand_in.SCENE['base_geoShape']
+        maya_stand_in.Mesh('base_geoShapeOrig', base.parent, base.points.copy(), [4], [0, 1, 3, 2])
+        base.points[0] += (0.0, 0.0, 2.0)
+        self.assertEqual(rig_shape.getOrigShape('base_geo'), '|base_geo|base_geoShapeOrig')
+        self.assertEqual(rig_shape.getDeltaIndices('base_geo', 'target_geo'), [1, 2])
+
+        deltas, indices = rig_shape.getPointDeltas('base_geo', 'target_geo', deformed=True)
+        numpy.testing.assert_array_equal(indices, [0, 1, 2])
+        numpy.testing.assert_allclose(deltas[0], [0.0, 0.0, -2.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
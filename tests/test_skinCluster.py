@@ -0,0 +1,115 @@
+'''
+Tests for openrig.maya.skinCluster. Maya isn't needed, these run on the in-memory stand-in
+in maya_stand_in.py.
+'''
+import unittest
+
+import numpy
+
+import helpers
+maya_stand_in = helpers.installMaya()
+
+import maya.cmds as mc
+import openrig.maya.skinCluster as rig_skincluster
+
+
+class TestPruneWeightArray(unittest.TestCase):
+
+    def test_maxInfluences(self):
+        weightArray = numpy.array([[.1, .4, .2, .3], [.5, .5, 0.0, 0.0]])
+        pruned = rig_skincluster.pruneWeightArray(weightArray, maxInfluences=2)
+        numpy.testing.assert_allclose(pruned, [[0.0, 4.0 / 7, 0.0, 3.0 / 7], [.5, .5, 0.0, 0.0]])
+
+    def test_lockedColumnsCountTowardsMaxInfluences(self):
+        weightArray = numpy.array([[.25, .15, .2, .2, .2], [.2, .3, .5, 0.0, 0.0]])
+        pruned = rig_skincluster.pruneWeightArray(weightArray, maxInfluences=3, lockedColumns=[3, 4])
+
+        # the locked weights are untouched and only one unlocked weight fills the rest
+        numpy.testing.assert_allclose(pruned[0], [.6, 0.0, 0.0, .2, .2])
+        self.assertLessEqual(numpy.count_nonzero(pruned[0]), 3)
+        # locked columns with no weight don't use up any of the limit
+        numpy.testing.assert_allclose(pruned[1], [.2, .3, .5, 0.0, 0.0])
+
+    def test_lockedColumnsUseEveryInfluence(self):
+        weightArray = numpy.array([[.1, .2, .3, .4]])
+        pruned = rig_skincluster.pruneWeightArray(weightArray, maxInfluences=2, lockedColumns=[2, 3])
+        numpy.testing.assert_allclose(pruned, [[0.0, 0.0, .3, .4]])
+
+    def test_rowUnderThresholdKeepsLargestWeight(self):
+        weightArray = numpy.array([[.004, .003, .003, 0.0], [.001, .002, 0.0, .5]])
+        pruned = rig_skincluster.pruneWeightArray(weightArray, threshold=.01, lockedColumns=[3])
+
+        # the point keeps its largest influence instead of collapsing to the origin
+        numpy.testing.assert_allclose(pruned[0], [1.0, 0.0, 0.0, 0.0])
+        # with a locked weight the largest unlocked one fills the rest
+        numpy.testing.assert_allclose(pruned[1], [0.0, .5, 0.0, .5])
+
+        pruned = rig_skincluster.pruneWeightArray(weightArray, threshold=.01, normalize=False)
+        numpy.testing.assert_allclose(pruned[0], [.004, 0.0, 0.0, 0.0])
+
+
+class TestInfluenceIndexMap(unittest.TestCase):
+
+    def setUp(self):
+        maya_stand_in.clear()
+        rig_skincluster.clearInfluenceIndexCache()
+        shape = maya_stand_in.createMesh('body_geo', [(0, 0, 0), (1, 0, 0), (0, 1, 0)], [3], [0, 1, 2])
+        for name in ['joint_a', 'joint_b', 'joint_c']:
+            maya_stand_in.Joint(name)
+        maya_stand_in.SkinCluster('body_skinCluster', shape, ['joint_a', 'joint_b'], [[1.0, 0.0]] * 3)
+
+    def test_cachedMapDoesNotQuery(self):
+        self.assertEqual(rig_skincluster.getInfIndex('body_skinCluster', 'joint_b'), 1)
+        calls = list()
+        mc.listConnections = lambda *args, **kwargs: calls.append(args)
+        try:
+            for _ in range(3):
+                self.assertEqual(rig_skincluster.getInfIndex('body_skinCluster', 'joint_a'), 0)
+        finally:
+            del mc.listConnections
+        self.assertEqual(calls, list())
+
+    def test_addAndRemoveInfluence(self):
+        rig_skincluster.getInfluenceIndexMap('body_skinCluster')
+        self.assertEqual(rig_skincluster.addInfluence('body_skinCluster', 'joint_c'), 2)
+        self.assertEqual(rig_skincluster.getInfIndex('body_skinCluster', 'joint_c'), 2)
+        rig_skincluster.removeInfluence('body_skinCluster', 'joint_c')
+        self.assertNotIn('body_skinCluster', rig_skincluster._INFLUENCE_INDEX_CACHE)
+
+    def test_influencesAddedOutsideOpenrig(self):
+        index_map = rig_skincluster.getInfluenceIndexMap('body_skinCluster')
+        index_map['joint_c'] = 5
+        self.assertNotIn('joint_c', rig_skincluster.getInfluenceIndexMap('body_skinCluster'))
+
+        # like the add influence tool or redoing an addInfluence
+        mc.skinCluster('body_skinCluster', e=True, ai='joint_c')
+        self.assertEqual(rig_skincluster.getInfIndex('body_skinCluster', 'joint_c'), 2)
+
+
+class TestSetWeightArray(unittest.TestCase):
+
+    def setUp(self):
+        maya_stand_in.clear()
+        shape = maya_stand_in.createMesh('body_geo', [(0, 0, 0), (1, 0, 0), (0, 1, 0)], [3], [0, 1, 2])
+        for name in ['joint_a', 'joint_b']:
+            maya_stand_in.Joint(name)
+        self.weights = numpy.array([[1.0, 0.0], [.5, .5], [0.0, 1.0]])
+        maya_stand_in.SkinCluster('body_skinCluster', shape.name, ['joint_a', 'joint_b'], self.weights.copy())
+
+    def test_undo(self):
+        rig_skincluster.setWeightArray('body_skinCluster', [[.25], [.75], [0.0]], ['joint_b'])
+        rig_skincluster.setBlendWeightArray('body_skinCluster', [.5, 1.0, 0.0])
+        weights = rig_skincluster.getWeightArray('body_skinCluster')[0]
+        numpy.testing.assert_allclose(weights[:, 1], [.25, .75, 0.0])
+
+        mc.undo()
+        numpy.testing.assert_allclose(mc.getAttr('body_skinCluster.blendWeights'), [0.0, 0.0, 0.0])
+        mc.undo()
+        numpy.testing.assert_allclose(rig_skincluster.getWeightArray('body_skinCluster')[0], self.weights)
+
+        mc.redo()
+        numpy.testing.assert_allclose(rig_skincluster.getWeightArray('body_skinCluster')[0], weights)
+
+
+if __name__ == '__main__':
+    unittest.main()
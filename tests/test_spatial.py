@@ -0,0 +1,61 @@
+'''
+Tests for openrig.shared.spatial. These only need numpy.
+'''
+import unittest
+
+import numpy
+
+# puts openrig on the path
+import helpers
+
+import openrig.shared.spatial as spatial
+
+
+def bruteForceClosest(points, queryPoints):
+    distances2 = ((queryPoints[:, None, :] - points[None, :, :]) ** 2).sum(axis=2)
+    return numpy.argmin(distances2, axis=1), numpy.sqrt(distances2.min(axis=1))
+
+
+class TestClosestPoints(unittest.TestCase):
+
+    def assertMatchesBruteForce(self, points, queryPoints):
+        indices, distances = spatial.closestPoints(points, queryPoints)
+        expected_indices, expected_distances = bruteForceClosest(points, queryPoints)
+        numpy.testing.assert_allclose(distances, expected_distances, rtol=1e-9, atol=1e-12)
+        numpy.testing.assert_array_equal(indices, expected_indices)
+
+    def test_offSurfaceQueries(self):
+        random = numpy.random.RandomState(0)
+        grid = numpy.stack(numpy.meshgrid(numpy.linspace(0, 10, 60), numpy.linspace(0, 10, 50)), axis=-1)
+        grid = grid.reshape(-1, 2)
+        query_points = numpy.column_stack([random.rand(500, 2) * 12 - 1, random.randn(500) * 3])
+
+        # flat, almost flat and a thin slab
+        for thickness in [0.0, 0.001, 0.05]:
+            points = numpy.column_stack([grid, random.rand(len(grid)) * thickness])
+            self.assertMatchesBruteForce(points, query_points)
+
+    def test_randomClouds(self):
+        random = numpy.random.RandomState(1)
+        for _ in range(50):
+            scale = random.rand(3) * 10 ** random.uniform(-4, 2, 3)
+            points = random.rand(random.randint(1, 300), 3) * scale
+            query_points = (random.rand(100, 3) - 0.5) * scale.max() * random.uniform(1, 50) + points.mean(axis=0)
+            self.assertMatchesBruteForce(points, query_points)
+
+    def test_cappedRings(self):
+        random = numpy.random.RandomState(2)
+        points = random.rand(400, 3) * [5.0, 5.0, 0.01]
+        query_points = random.randn(200, 3) * 4
+
+        max_rings = spatial.PointGrid.MAX_RINGS
+        try:
+            for rings in [0, 1]:
+                spatial.PointGrid.MAX_RINGS = rings
+                self.assertMatchesBruteForce(points, query_points)
+        finally:
+            spatial.PointGrid.MAX_RINGS = max_rings
+
+
+if __name__ == '__main__':
+    unittest.main()
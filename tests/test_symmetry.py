@@ -0,0 +1,77 @@
+'''
+Tests for openrig.maya.symmetry. Maya isn't needed, these run on the in-memory stand-in
+in maya_stand_in.py.
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+import helpers
+maya_stand_in = helpers.installMaya()
+
+import openrig.maya.symmetry as rig_symmetry
+from openrig.shared import topology
+
+
+class TestSymmetryCache(unittest.TestCase):
+
+    def setUp(self):
+        maya_stand_in.clear()
+        rig_symmetry.clearCache()
+        self.directory = tempfile.mkdtemp()
+        self.points = numpy.array([(-1, 0, 0), (0, 0, 0), (1, 0, 0), (-1, 1, 0), (0, 1, 0), (1, 1, 0)],
+                                  dtype=numpy.float64)
+        self.counts = [4, 4]
+        self.connects = [0, 1, 4, 3, 1, 2, 5, 4]
+        maya_stand_in.createMesh('body_geo', self.points, self.counts, self.connects)
+
+    def tearDown(self):
+        rig_symmetry.setCacheDirectory(None)
+        rig_symmetry.clearCache()
+        shutil.rmtree(self.directory)
+
+    def test_savedNextToTheBuildData(self):
+        rig_symmetry.setCacheDirectory(self.directory)
+        mirror_map, center_mask = rig_symmetry.getSymmetryMap('body_geo')
+        numpy.testing.assert_array_equal(mirror_map, [2, 1, 0, 5, 4, 3])
+        numpy.testing.assert_array_equal(center_mask, [False, True, False, False, True, False])
+        self.assertEqual(len([name for name in os.listdir(self.directory) if name.endswith('.npz')]), 1)
+
+        # a new session loads the map from disk instead of building it again
+        rig_symmetry.clearCache()
+        build_symmetry_map = rig_symmetry.buildSymmetryMap
+        rig_symmetry.buildSymmetryMap = None
+        try:
+            numpy.testing.assert_array_equal(rig_symmetry.getSymmetryMap('body_geo')[0], mirror_map)
+        finally:
+            rig_symmetry.buildSymmetryMap = build_symmetry_map
+
+    def test_shapeIsNotHashedAgain(self):
+        mirror_map = rig_symmetry.getSymmetryMap('body_geo')[0]
+        get_mesh_data = rig_symmetry.getMeshData
+        rig_symmetry.getMeshData = None
+        try:
+            self.assertIs(rig_symmetry.getSymmetryMap('body_geo')[0], mirror_map)
+        finally:
+            rig_symmetry.getMeshData = get_mesh_data
+
+        # a new shape with the same name is read again
+        maya_stand_in.clear()
+        maya_stand_in.createMesh('body_geo', self.points[:4], [4], [0, 1, 2, 3])
+        self.assertEqual(len(rig_symmetry.getSymmetryMap('body_geo')[0]), 4)
+
+    def test_meshHash(self):
+        mesh_hash = rig_symmetry.getMeshHash(self.points, self.counts, self.connects)
+        self.assertNotEqual(mesh_hash, topology.getTopologyHash(self.counts, self.connects))
+        # changes under the precision hash the same
+        self.assertEqual(rig_symmetry.getMeshHash(self.points + 1e-6, self.counts, self.connects), mesh_hash)
+        moved = self.points.copy()
+        moved[0, 1] += 0.1
+        self.assertNotEqual(rig_symmetry.getMeshHash(moved, self.counts, self.connects), mesh_hash)
+
+
+if __name__ == '__main__':
+    unittest.main()
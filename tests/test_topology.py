@@ -0,0 +1,104 @@
+'''
+Tests for openrig.shared.topology. These only need numpy.
+'''
+import unittest
+
+import numpy
+
+# puts openrig on the path
+import helpers
+
+import openrig.shared.topology as topology
+
+
+def makeGrid(columns, rows, seed=0):
+    '''
+    Quad grid with the vertex ids shuffled and every face starting on a random corner, so nothing
+    about the ids is symmetrical. Returns the counts, connects, the id of each (column, row) vertex
+    and the expected mirror map across the middle column.
+    '''
+    random = numpy.random.RandomState(seed)
+    point_count = (columns + 1) * (rows + 1)
+    ids = random.permutation(point_count).reshape(rows + 1, columns + 1)
+
+    counts = list()
+    connects = list()
+    for row in range(rows):
+        for column in range(columns):
+            face = [ids[row, column], ids[row, column + 1], ids[row + 1, column + 1], ids[row + 1, column]]
+            start = random.randint(4)
+            counts.append(4)
+            connects.extend(face[start:] + face[:start])
+
+    mirror_map = numpy.zeros(point_count, dtype=numpy.int64)
+    mirror_map[ids] = ids[:, ::-1]
+    return counts, connects, ids, mirror_map
+
+
+class TestTopologicalMirrorMap(unittest.TestCase):
+
+    def test_shuffledGrid(self):
+        counts, connects, ids, mirror_map = makeGrid(6, 5)
+        for center_edge in [(ids[0, 3], ids[1, 3]), (ids[4, 3], ids[3, 3])]:
+            numpy.testing.assert_array_equal(topology.getTopologicalMirrorMap(counts, connects, center_edge),
+                                             mirror_map)
+
+    def test_unreachedPointsAreMinusOne(self):
+        counts, connects, ids, mirror_map = makeGrid(4, 2)
+        result = topology.getTopologicalMirrorMap(counts, connects, (ids[0, 2], ids[1, 2]), len(mirror_map) + 1)
+        numpy.testing.assert_array_equal(result[:-1], mirror_map)
+        self.assertEqual(result[-1], -1)
+
+    def test_asymmetricGrid(self):
+        counts, connects, ids, mirror_map = makeGrid(4, 3)
+        # split the first quad into two triangles so one side has an extra edge
+        face = connects[:4]
+        counts = [3, 3] + counts[1:]
+        connects = face[:3] + [face[0], face[2], face[3]] + connects[4:]
+        with self.assertRaises(RuntimeError):
+            topology.getTopologicalMirrorMap(counts, connects, (ids[0, 2], ids[1, 2]))
+
+    def test_notAnEdge(self):
+        counts, connects, ids, mirror_map = makeGrid(2, 2)
+        with self.assertRaises(RuntimeError):
+            topology.getTopologicalMirrorMap(counts, connects, (ids[0, 0], ids[2, 2]))
+
+
+class TestSmoothValues(unittest.TestCase):
+
+    def setUp(self):
+        topology._ADJACENCY_CACHE.clear()
+        # a strip of two quads, the middle edge is shared
+        self.counts = [4, 4]
+        self.connects = [0, 1, 4, 3, 1, 2, 5, 4]
+
+    def test_vertexAdjacency(self):
+        indptr, indices = topology.getVertexAdjacency(self.counts, self.connects, pointCount=7)
+        neighbors = [sorted(indices[indptr[i]:indptr[i + 1]].tolist()) for i in range(7)]
+        self.assertEqual(neighbors, [[1, 3], [0, 2, 4], [1, 5], [0, 4], [1, 3, 5], [2, 4], []])
+        self.assertIs(topology.getVertexAdjacency(self.counts, self.connects, pointCount=7)[0], indptr)
+
+    def test_smoothValues(self):
+        indptr, indices = topology.getVertexAdjacency(self.counts, self.connects, pointCount=7)
+        values = numpy.array([0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 5.0])
+        smoothed = topology.smoothValues(values, indptr, indices, strength=0.5)
+        numpy.testing.assert_allclose(smoothed, [.25, .5, .25, 0.0, 1.0 / 6, 0.0, 5.0])
+
+        # columns are smoothed the same in 2D and when they're split into chunks
+        mask = numpy.array([1.0, 0.0, 1.0, 1.0, 1.0, 1.0, 1.0])
+        values = numpy.random.RandomState(0).rand(7, 5)
+        expected = topology.smoothValues(values, indptr, indices, iterations=3, mask=mask)
+        chunk_size = topology.SMOOTH_CHUNK_SIZE
+        try:
+            topology.SMOOTH_CHUNK_SIZE = len(indices) * 2
+            smoothed = topology.smoothValues(values, indptr, indices, iterations=3, mask=mask)
+        finally:
+            topology.SMOOTH_CHUNK_SIZE = chunk_size
+        numpy.testing.assert_allclose(smoothed, expected)
+        numpy.testing.assert_allclose(smoothed[:, 0], topology.smoothValues(values[:, 0], indptr, indices,
+                                                                             iterations=3, mask=mask))
+        numpy.testing.assert_array_equal(smoothed[1], values[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+'''
+Tests for openrig.maya.weightDiff. Maya isn't needed, these run on the in-memory stand-in
+in maya_stand_in.py.
+'''
+import os
+import gzip
+import json
+import shutil
+import tempfile
+import unittest
+
+import helpers
+maya_stand_in = helpers.installMaya()
+
+import numpy
+
+import openrig.maya.weights as rig_weights
+import openrig.maya.weightDiff as weightDiff
+import openrig.maya.weightObject as weightObject
+import openrig.maya.data.weight_data as weight_data
+
+WTS_XML = '''<?xml version="1.0"?>
+<deformerWeight>
+  <headerInfo fileName="{filename}" worldMatrix="1.0 0 0 0 0 1.0 0 0 0 0 1.0 0 0 0 0 1.0 "/>
+  <shape name="body_geoShape" group="7" stride="3" size="4" max="4"/>
+  <weights deformer="body_geo_cluster" source="body_geo_cluster" shape="body_geoShape" layer="0" defaultValue="0.000" size="2" max="3">
+    <point index="0" value="{value}"/>
+    <point index="3" value="0.500"/>
+  </weights>
+</deformerWeight>
+'''
+
+
+class TestDiffDirectories(unittest.TestCase):
+
+    def setUp(self):
+        self.directories = [tempfile.mkdtemp(), tempfile.mkdtemp()]
+
+    def tearDown(self):
+        for directory in self.directories:
+            shutil.rmtree(directory)
+
+    def _writeDirectory(self, directory, value, zipped=False):
+        # the names exportWeights gives the deformerWeights files, the published ones are zipped
+        filename = 'body_geo__body_geo_cluster.xml'
+        text = WTS_XML.format(filename=filename, value=value)
+        if zipped:
+            with gzip.open(os.path.join(directory, filename + '.gz'), 'wb') as f:
+                f.write(text)
+        else:
+            with open(os.path.join(directory, filename), 'w') as f:
+                f.write(text)
+
+        # WeightData in the binary format
+        data = weight_data.WeightData()
+        data.setData({'body_skinCluster': {'shape': 'body_geoShape',
+                                           'maps': ['joint_a', 'joint_b'],
+                                           'weights': numpy.array([[1.0, 0.5, 0.0, 0.0],
+                                                                   [0.0, 0.5, 1.0, 1.0]])}})
+        data.write(os.path.join(directory, 'body_skinCluster' + weight_data.BINARY_EXTENSION))
+
+        # the blendShape deltas and the export manifest sit next to the weights
+        with open(os.path.join(directory, 'body_geo__body_geo_blendShape.shp'), 'w') as f:
+            f.write('<?xml version="1.0"?>\n<blendShape/>\n')
+        with open(os.path.join(directory, rig_weights.WTS_MANIFEST_FILENAME), 'w') as f:
+            json.dump({filename: 'abc'}, f)
+
+    def test_mixedDirectory(self):
+        self._writeDirectory(self.directories[0], '1.000', zipped=True)
+        self._writeDirectory(self.directories[1], '0.250')
+
+        results = dict(weightDiff.iterDiffDirectories(*self.directories, threads=1))
+
+        self.assertEqual(sorted(results), ['body_geo__body_geo_cluster.xml',
+                                           'body_skinCluster' + weight_data.BINARY_EXTENSION])
+        reports = results['body_geo__body_geo_cluster.xml']
+        self.assertEqual(list(reports.keys()), ['body_geo_cluster'])
+        self.assertEqual(reports['body_geo_cluster']['status'], 'changed')
+        self.assertAlmostEqual(reports['body_geo_cluster']['maxDelta'], 0.75)
+        self.assertEqual(reports['body_geo_cluster']['changedCount'], 1)
+
+        reports = results['body_skinCluster' + weight_data.BINARY_EXTENSION]
+        self.assertEqual(reports['body_skinCluster']['status'], 'unchanged')
+
+    def test_unreadableFile(self):
+        self._writeDirectory(self.directories[0], '1.000')
+        self._writeDirectory(self.directories[1], '1.000')
+        # a json file in the weights directory that isn't WeightData
+        with open(os.path.join(self.directories[1], 'controls.json'), 'w') as f:
+            json.dump({'l_arm_ctrl': {'color': 6}}, f)
+
+        results = dict(weightDiff.iterDiffDirectories(*self.directories, threads=1))
+
+        self.assertEqual(results['controls.json']['controls.json']['status'], 'unreadable')
+        self.assertEqual(results['body_geo__body_geo_cluster.xml']['body_geo_cluster']['status'], 'unchanged')
+        self.assertIn('controls.json: unreadable', weightDiff.formatReports(results['controls.json']))
+
+    def test_isWeightFile(self):
+        self.assertTrue(weightDiff.isWeightFile('body_geo__skinCluster.xml.gz'))
+        self.assertTrue(weightDiff.isWeightFile('body_skinCluster' + weight_data.BINARY_EXTENSION))
+        self.assertFalse(weightDiff.isWeightFile('body_geo__cluster.wts'))
+        self.assertFalse(weightDiff.isWeightFile('body_geo__blendShape.shp'))
+        self.assertFalse(weightDiff.isWeightFile(rig_weights.WTS_MANIFEST_FILENAME))
+
+
+class TestWeightTable(unittest.TestCase):
+
+    def test_emptyMapKeepsItsColumn(self):
+        source = weightObject.WeightObject(maps=['joint_a', 'joint_b', 'joint_c'],
+                                           weights=[[1.0, 0.5], [], [0.0, 0.5]])
+        target = weightObject.WeightObject(maps=['joint_a', 'joint_b', 'joint_c'],
+                                           weights=[[1.0, 0.5], [], [0.0, 0.25]])
+
+        table = weightDiff.WeightTable.fromWeightObject(source)
+        self.assertEqual(table.pointCount, 2)
+        numpy.testing.assert_array_equal(table.columns, [0, 0, 2])
+
+        report = weightDiff.diffTables(table, weightDiff.WeightTable.fromWeightObject(target))
+        self.assertEqual(list(report['maps'].keys()), ['joint_c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
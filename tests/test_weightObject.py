@@ -0,0 +1,101 @@
+'''
+Tests for openrig.maya.weightObject. Maya isn't needed, these run on the in-memory stand-in
+in maya_stand_in.py.
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+import helpers
+maya_stand_in = helpers.installMaya()
+
+import openrig.maya.weightObject as weightObject
+import openrig.maya.data.weight_data as weight_data
+
+
+class TestReadOnlyWeights(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.weights = numpy.array([[.2, .2, 0.0], [.5, 0.0, 1.0]])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _readBinary(self, sparse):
+        sparse_object = weightObject.SparseWeightObject(weights=self.weights.T)
+        if sparse:
+            node_data = {'maps': ['joint_a', 'joint_b'],
+                         'pointCount': sparse_object.getPointCount(),
+                         'indptr': sparse_object.getIndptr(),
+                         'indices': sparse_object.getIndices(),
+                         'values': sparse_object.getValues()}
+        else:
+            node_data = {'maps': ['joint_a', 'joint_b'], 'weights': self.weights}
+        filepath = os.path.join(self.directory, 'skin' + weight_data.BINARY_EXTENSION)
+        data = weight_data.WeightData()
+        data.setData({'body_skinCluster': node_data})
+        data.write(filepath)
+
+        data = weight_data.WeightData()
+        data.read(filepath)
+        return data.getData()['body_skinCluster']
+
+    def test_sparseNormalize(self):
+        node_data = self._readBinary(sparse=True)
+        self.assertFalse(node_data['values'].flags.writeable)
+
+        weight_object = weightObject.SparseWeightObject(maps=node_data['maps'], indptr=node_data['indptr'],
+                                                        indices=node_data['indices'], values=node_data['values'])
+        weight_object.normalize()
+        numpy.testing.assert_allclose(weight_object.getArray(), [[2.0 / 7, 5.0 / 7], [1.0, 0.0], [0.0, 1.0]])
+
+    def test_denseNormalizeAndClamp(self):
+        node_data = self._readBinary(sparse=False)
+        weight_object = weightObject.WeightObject(maps=node_data['maps'], weights=node_data['weights'])
+        weight_object.clamp(maxValue=0.4)
+        weight_object.normalize()
+        numpy.testing.assert_allclose(weight_object.getArray(), [[1.0 / 3, 2.0 / 3], [1.0, 0.0], [0.0, 1.0]])
+
+
+class TestWeightObject(unittest.TestCase):
+
+    def test_noMaps(self):
+        weight_object = weightObject.WeightObject()
+        self.assertEqual(weight_object.getArray().shape, (0, 0))
+        weight_object.normalize()
+        weight_object.clamp()
+        weight_object.scale([], 2.0)
+
+    def test_raggedMapsArePadded(self):
+        weight_object = weightObject.WeightObject(maps=['joint_a', 'joint_b'],
+                                                  weights=[numpy.array([.5, 1.0]), numpy.array([2.0])])
+        numpy.testing.assert_allclose(weight_object.getArray(), [[.5, 2.0], [1.0, 0.0]])
+        weight_object.normalize()
+        numpy.testing.assert_allclose(weight_object.getArray(), [[.2, .8], [1.0, 0.0]])
+
+
+class TestSparseWeightObject(unittest.TestCase):
+
+    def test_singleMapNormalizeClamps(self):
+        weights = [numpy.array([.25, 1.5, 0.0, -.5])]
+        sparse_object = weightObject.SparseWeightObject(maps=['cluster'], weights=weights)
+        dense_object = weightObject.WeightObject(maps=['cluster'], weights=[weights[0].copy()])
+        sparse_object.normalize()
+        dense_object.normalize()
+        numpy.testing.assert_allclose(sparse_object.getArray(), [[.25], [1.0], [0.0], [0.0]])
+        numpy.testing.assert_allclose(sparse_object.getArray(), dense_object.getArray())
+
+    def test_emptyWeightsKeepTheirColumn(self):
+        weights = [numpy.array([.5, 1.0]), numpy.array([]), numpy.array([.5, 0.0])]
+        sparse_object = weightObject.SparseWeightObject(maps=['joint_a', 'joint_b', 'joint_c'], weights=weights)
+        self.assertEqual(sparse_object.getColumnCount(), 3)
+        numpy.testing.assert_allclose(sparse_object.getWeights('joint_c')[0], [.5, 0.0])
+        numpy.testing.assert_allclose(sparse_object.getArray(), [[.5, 0.0, .5], [1.0, 0.0, 0.0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
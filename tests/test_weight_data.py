@@ -0,0 +1,94 @@
+'''
+Tests for openrig.maya.data.weight_data. Maya isn't needed, these run on the in-memory stand-in
+in maya_stand_in.py.
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+import helpers
+maya_stand_in = helpers.installMaya()
+
+import openrig.maya.weightObject as weightObject
+import openrig.maya.data.weight_data as weight_data
+
+
+class TestBinaryWrite(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.directory, 'skin' + weight_data.BINARY_EXTENSION)
+        self.weights = numpy.array([[.2, .2, 0.0], [.8, .8, 1.0]])
+        data = weight_data.WeightData()
+        data.setData({'body_skinCluster': {'maps': ['joint_a', 'joint_b'], 'weights': self.weights}})
+        data.write(self.filepath)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_overwriteMappedFile(self):
+        # another reader still has the file mapped
+        other = weight_data.WeightData()
+        other.read(self.filepath)
+        other_weights = other.getData()['body_skinCluster']['weights']
+
+        data = weight_data.WeightData()
+        data.read(self.filepath)
+        node_data = data.getData()['body_skinCluster']
+        node_data['maps'].append('joint_c')
+        node_data['weights'] = list(node_data['weights'])[::-1] + [numpy.zeros(3)]
+        # the same file written another way
+        data.write(os.path.join(self.directory, '.', os.path.basename(self.filepath)))
+
+        numpy.testing.assert_array_equal(numpy.array(other_weights), self.weights)
+        self.assertEqual(os.listdir(self.directory), [os.path.basename(self.filepath)])
+
+        data = weight_data.WeightData()
+        data.read(self.filepath)
+        numpy.testing.assert_array_equal(numpy.array(data.getData()['body_skinCluster']['weights']),
+                                         numpy.vstack([self.weights[::-1], numpy.zeros(3)]))
+
+    def test_objectArrayIsRefused(self):
+        data = weight_data.WeightData()
+        data.setData({'body_cluster': {'maps': ['a', 'b'], 'weights': [numpy.ones(3), numpy.ones(2)]}})
+        with self.assertRaises(TypeError):
+            data.write(self.filepath)
+        # the file that was there is left alone
+        data = weight_data.WeightData()
+        data.read(self.filepath)
+        numpy.testing.assert_array_equal(numpy.array(data.getData()['body_skinCluster']['weights']), self.weights)
+
+    def test_gatherData(self):
+        maya_stand_in.clear()
+        shape = maya_stand_in.createMesh('body_geo', [(0, 0, 0), (1, 0, 0), (0, 1, 0)], [3], [0, 1, 2])
+        for name in ['joint_a', 'joint_b']:
+            maya_stand_in.Joint(name)
+        maya_stand_in.SkinCluster('body_skinCluster', shape.name, ['joint_a', 'joint_b'],
+                                  [[1.0, 0.0], [0.5, 0.5], [0.0, 1.0]])
+        data = weight_data.WeightData()
+        data.gatherData('body_skinCluster')
+        weights = data.getData()['body_skinCluster']['weights']
+        self.assertEqual(weights.dtype, numpy.float64)
+        numpy.testing.assert_allclose(weights, [[1.0, 0.5, 0.0], [0.0, 0.5, 1.0]])
+
+        # maps that are shorter than the others are padded so the file can still be written
+        ragged = weightObject.WeightObject(maps=['joint_a', 'joint_b'], weights=[numpy.ones(3), numpy.ones(2)])
+        getWeightsBatch = weight_data.weights.getWeightsBatch
+        weight_data.weights.getWeightsBatch = lambda items, cache=None: [ragged]
+        try:
+            data.gatherData('body_skinCluster')
+        finally:
+            weight_data.weights.getWeightsBatch = getWeightsBatch
+        numpy.testing.assert_allclose(data.getData()['body_skinCluster']['weights'], [[1, 1, 1], [1, 1, 0]])
+        data.write(self.filepath)
+
+    def test_isSameFile(self):
+        self.assertTrue(weight_data._isSameFile(self.filepath, os.path.join(self.directory, '.', 'skin.wtsb')))
+        self.assertFalse(weight_data._isSameFile(self.filepath, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
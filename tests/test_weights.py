@@ -0,0 +1,232 @@
+'''
+Tests for openrig.maya.weights. Maya isn't needed, these run on the in-memory stand-in
+in maya_stand_in.py.
+'''
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+import helpers
+maya_stand_in = helpers.installMaya()
+
+import maya.cmds as mc
+import openrig.maya.weights as rig_weights
+
+
+class TestWeightsHash(unittest.TestCase):
+
+    def setUp(self):
+        maya_stand_in.clear()
+        points = [(0, 0, 0), (1, 0, 0), (0, 1, 0), (1, 1, 0)]
+        self.shape = maya_stand_in.createMesh('body_geo', points, [4], [0, 1, 3, 2])
+        maya_stand_in.BlendShape('body_blendShape', self.shape, ['smile', 'blink'])
+
+    def test_targetWeightsChangeHash(self):
+        weights_hash = rig_weights.getWeightsHash('body_blendShape', 'body_geo')
+        mc.setAttr('body_blendShape.it[0].itg[1].tw[2]', 0.5)
+        self.assertNotEqual(rig_weights.getWeightsHash('body_blendShape', 'body_geo'), weights_hash)
+
+    def test_baseWeightsChangeHash(self):
+        weights_hash = rig_weights.getWeightsHash('body_blendShape', 'body_geo')
+        self.assertEqual(rig_weights.getWeightsHash('body_blendShape', 'body_geo'), weights_hash)
+
+        mc.setAttr('body_blendShape.it[0].bw[3]', 0.25)
+        self.assertNotEqual(rig_weights.getWeightsHash('body_blendShape', 'body_geo'), weights_hash)
+
+
+class TestTransferWeights(unittest.TestCase):
+
+    def setUp(self):
+        maya_stand_in.clear()
+        # one quad split into the triangles (0, 1, 3) and (0, 3, 2)
+        points = [(0, 0, 0), (2, 0, 0), (0, 2, 0), (2, 2, 0)]
+        source = maya_stand_in.createMesh('body_geo', points, [4], [0, 1, 3, 2])
+        # off the surface above, below and outside of the quad
+        target_points = [(1.5, 0.5, 0.3), (0.5, 1.5, -0.4), (3.0, 1.0, 0.0)]
+        target = maya_stand_in.createMesh('body_proxy', target_points, [3], [0, 1, 2])
+        self.sourceWeights = numpy.array([[0.0, 1.0], [1.0, 0.0], [0.5, 0.5], [0.2, 0.8]])
+        for name in ['joint_a', 'joint_b']:
+            maya_stand_in.Joint(name)
+        maya_stand_in.SkinCluster('body_skinCluster', source, ['joint_a', 'joint_b'], self.sourceWeights)
+        maya_stand_in.SkinCluster('proxy_skinCluster', target, ['joint_a'], [[1.0]] * 3)
+        # barycentric weights of each target point on the source vertices
+        self.expected = numpy.array([[0.25, 0.5, 0.0, 0.25],
+                                     [0.25, 0.0, 0.5, 0.25],
+                                     [0.0, 0.5, 0.0, 0.5]])
+
+    def test_getTransferMap(self):
+        transfer_map = rig_weights.getTransferMap('body_geo', 'body_proxy')
+        numpy.testing.assert_allclose(transfer_map.apply(numpy.eye(4)), self.expected, atol=1e-12)
+        numpy.testing.assert_allclose(transfer_map.getDistances(), [0.3, 0.4, 1.0])
+
+    def test_transferWeights(self):
+        rig_weights.transferWeights('body_skinCluster', 'proxy_skinCluster', 'body_geo', 'body_proxy')
+
+        # the missing influence is added and the weights are set on the right columns
+        self.assertEqual(mc.skinCluster('proxy_skinCluster', q=True, inf=True), ['joint_a', 'joint_b'])
+        numpy.testing.assert_allclose(maya_stand_in.SCENE['proxy_skinCluster'].weights,
+                                      self.expected.dot(self.sourceWeights), atol=1e-12)
+
+
+class TestIncrementalExport(unittest.TestCase):
+
+    def setUp(self):
+        maya_stand_in.clear()
+        self.directory = tempfile.mkdtemp()
+        shape = maya_stand_in.createMesh('body_geo', [(0, 0, 0), (1, 0, 0), (0, 1, 0)], [3], [0, 1, 2])
+        for name in ['joint_a', 'joint_b']:
+            maya_stand_in.Joint(name)
+        self.skinCluster = maya_stand_in.SkinCluster('body_skinCluster', shape.name, ['joint_a', 'joint_b'],
+                                                     [[1.0, 0.0], [0.5, 0.5], [0.0, 1.0]])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_fullExportDropsTheHash(self):
+        filepath = '{}/body_geo__body_skinCluster.xml'.format(self.directory)
+        self.assertEqual(rig_weights.exportWeights('body_geo', 'body_skinCluster', self.directory, incremental=True),
+                         [filepath])
+        self.assertEqual(rig_weights.exportWeights('body_geo', 'body_skinCluster', self.directory, incremental=True),
+                         [])
+
+        # a full export of different weights, then the weights go back to what was hashed
+        original = self.skinCluster.weights.copy()
+        self.skinCluster.weights = original[:, ::-1].copy()
+        self.assertEqual(rig_weights.exportWeights('body_geo', 'body_skinCluster', self.directory), [filepath])
+        self.skinCluster.weights = original
+        self.assertEqual(rig_weights.exportWeights('body_geo', 'body_skinCluster', self.directory, incremental=True),
+                         [filepath])
+
+    def test_alwaysReturnsAList(self):
+        self.assertEqual(rig_weights.exportWeights('body_geo', list(), self.directory), [])
+        self.assertEqual(rig_weights.exportWeights('body_geo', list(), self.directory, incremental=True), [])
+
+
+class TestImportWeights(unittest.TestCase):
+
+    def setUp(self):
+        maya_stand_in.clear()
+        self.directory = tempfile.mkdtemp()
+        shape = maya_stand_in.createMesh('body_geo', [(0, 0, 0), (1, 0, 0), (0, 1, 0)], [3], [0, 1, 2])
+        for name in ['joint_a', 'joint_b']:
+            maya_stand_in.Joint(name)
+        self.skinCluster = maya_stand_in.SkinCluster('body_skinCluster', shape.name, ['joint_a', 'joint_b'],
+                                                     [[1.0, 0.0], [0.5, 0.5], [0.0, 1.0]])
+        self.cluster = maya_stand_in.Cluster('body_cluster', shape.name)
+        self.blendShape = maya_stand_in.BlendShape('body_blendShape', shape.name, ['smile', 'blink'])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def zipFile(self, filepath):
+        with open(filepath, 'rb') as f:
+            with gzip.open(filepath + '.gz', 'wb') as g:
+                shutil.copyfileobj(f, g)
+        os.remove(filepath)
+        return filepath + '.gz'
+
+    def test_skinClusterBlendWeights(self):
+        self.skinCluster.attrs['blendWeights'][:] = [0.25, 0.5, 1.0]
+        filepath = rig_weights.exportWeights('body_geo', 'body_skinCluster', self.directory)[0]
+        self.skinCluster.attrs['blendWeights'][:] = 0.0
+        self.skinCluster.weights[:] = 0.0
+
+        # the blend weights are set through the api, not with one setAttr per point
+        set_attrs = list()
+        set_attr = mc.setAttr
+        mc.setAttr = lambda name, *args, **kwargs: (set_attrs.append(name), set_attr(name, *args, **kwargs))
+        try:
+            self.assertTrue(rig_weights.importWeights('body_geo', 'body_skinCluster', filepath))
+        finally:
+            del mc.setAttr
+        self.assertFalse([name for name in set_attrs if rig_weights.BLENDWEIGHTS_ATTR in name])
+        numpy.testing.assert_allclose(self.skinCluster.attrs['blendWeights'], [0.25, 0.5, 1.0])
+        numpy.testing.assert_allclose(self.skinCluster.weights, [[1.0, 0.0], [0.5, 0.5], [0.0, 1.0]])
+
+    def test_zippedBlendShapeWeights(self):
+        self.blendShape.baseWeights = numpy.array([1.0, 0.5, 0.0])
+        self.blendShape.targetWeights[1] = numpy.array([0.0, 0.25, 1.0])
+        filepath = self.zipFile(rig_weights.exportWeights('body_geo', 'body_blendShape', self.directory)[0])
+        self.blendShape.baseWeights = None
+        self.blendShape.targetWeights[1] = None
+
+        # the .gz is read directly, nothing is unzipped for deformerWeights
+        calls = list()
+        mc.deformerWeights = lambda *args, **kwargs: calls.append((args, kwargs))
+        try:
+            self.assertTrue(rig_weights.importWeights('body_geo', 'body_blendShape', filepath))
+        finally:
+            del mc.deformerWeights
+        self.assertFalse(calls)
+        numpy.testing.assert_allclose(self.blendShape.baseWeights, [1.0, 0.5, 0.0])
+        numpy.testing.assert_allclose(self.blendShape.targetWeights[0], [1.0, 1.0, 1.0])
+        numpy.testing.assert_allclose(self.blendShape.targetWeights[1], [0.0, 0.25, 1.0])
+
+    def test_multipleMaps(self):
+        filepath = os.path.join(self.directory, 'body_geo__body_cluster.xml')
+        with open(filepath, 'w') as f:
+            f.write('<?xml version="1.0"?>\n<deformerWeight>\n'
+                    '  <weights deformer="body_cluster" source="body_cluster" shape="body_geoShape" layer="0">\n'
+                    '    <point index="0" value="0.5"/>\n  </weights>\n'
+                    '  <weights deformer="body_cluster" source="other_map" shape="body_geoShape" layer="1">\n'
+                    '    <point index="1" value="0.5"/>\n  </weights>\n</deformerWeight>\n')
+        filepath = self.zipFile(filepath)
+
+        calls = list()
+        mc.deformerWeights = lambda *args, **kwargs: calls.append((args, kwargs))
+        try:
+            self.assertTrue(rig_weights.importWeights('body_geo', 'body_cluster', filepath))
+        finally:
+            del mc.deformerWeights
+        self.assertFalse(calls)
+        numpy.testing.assert_allclose(self.cluster.weightList[0], [0.5, 0.0, 0.0])
+
+
+class TestUnzipWts(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.directory, 'body_geo__body_cluster.xml')
+        self.writeZip('zipped')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def writeZip(self, text, mtime=1000.0):
+        with gzip.open(self.filepath + '.gz', 'wb') as f:
+            f.write(text)
+        os.utime(self.filepath + '.gz', (mtime, mtime))
+
+    def read(self):
+        with open(self.filepath) as f:
+            return f.read()
+
+    def test_unzip(self):
+        rig_weights.unzipWts(self.filepath + '.gz')
+        self.assertEqual(self.read(), 'zipped')
+        self.assertEqual(os.stat(self.filepath).st_mtime, 1000.0)
+        self.assertFalse(os.path.exists(self.filepath + '.tmp'))
+        # the unzipped file is what the loaders read now
+        self.assertEqual(rig_weights.getWtsFilepath(self.filepath), self.filepath)
+
+    def test_zipIsNewer(self):
+        rig_weights.unzipWts(self.filepath + '.gz')
+        # a few seconds newer is enough
+        self.writeZip('rezipped', mtime=1002.0)
+        rig_weights.unzipWts(self.filepath + '.gz')
+        self.assertEqual(self.read(), 'rezipped')
+
+    def test_editedFileIsKept(self):
+        with open(self.filepath, 'w') as f:
+            f.write('edited')
+        os.utime(self.filepath, (1001.0, 1001.0))
+        rig_weights.unzipWts(self.filepath + '.gz')
+        self.assertEqual(self.read(), 'edited')
+
+
+if __name__ == '__main__':
+    unittest.main()